@@ -208,12 +208,15 @@ WSGI_APPLICATION = 'config.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',),
     'DEFAULT_RENDERER_CLASSES': (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
+        'tradingdb.restapi.renderers.CamelCaseJSONRenderer',
+        'tradingdb.restapi.renderers.MessagePackRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'PAGE_SIZE': 100,
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
 }
+# Seconds a response is kept in cache, responses are invalidated when a new block is processed. 0 disables it
+REST_API_CACHE_TIMEOUT = env.int('REST_API_CACHE_TIMEOUT', default=300)
 
 # ------------------------------------------------------------------------------
 # Celery
@@ -248,3 +251,7 @@ ETHEREUM_MAX_BATCH_REQUESTS = env.int('ETHEREUM_MAX_BATCH_REQUESTS', default=500
 IPFS_HOST = env('IPFS_HOST', default='ipfs.infura.io')
 IPFS_PORT = env('IPFS_PORT', default=5001)
 IPFS_TIMEOUT = env('IPFS_TIMEOUT', default=120)
+IPFS_PREFETCH_WORKERS = env.int('IPFS_PREFETCH_WORKERS', default=10)
+# Local cache for IPFS objects, disabled if IPFS_CACHE_DIR is not set
+IPFS_CACHE_DIR = env('IPFS_CACHE_DIR', default=None)
+IPFS_CACHE_MAX_SIZE = env.int('IPFS_CACHE_MAX_SIZE', default=100 * 1024 * 1024)  # bytes
@@ -5,6 +5,8 @@ from .local import *
 
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
+REST_API_CACHE_TIMEOUT = 0
+
 
 if 'TRAVIS' in os.environ:
     DATABASES = {
@@ -1,11 +1,169 @@
-from typing import List
+import threading
+from typing import Dict, List, Optional
 
-from django.core.exceptions import ObjectDoesNotExist
+from celery.signals import task_prerun
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django_eth_events.chainevents import AbstractAddressesGetter
 
-from tradingdb.relationaldb.models import (CentralizedOracle, Contract, Event,
+from tradingdb.relationaldb.models import (AddressRegistryVersion,
+                                           CentralizedOracle, Contract, Event,
                                            Market, OutcomeToken)
 
+# Models whose addresses are watched by the event listener (subclasses included)
+REGISTRY_MODELS = (CentralizedOracle, Event, Market, OutcomeToken)
+
+_versions_lock = threading.Lock()
+_versions: Optional[Dict[str, int]] = None  # model label -> version, read once per task
+
+
+def get_registry_versions() -> Dict[str, int]:
+    """
+    :return: dictionary model label -> version of its addresses. Versions are read with only one query the first
+    time they are needed in a task (or after `expire_registry_versions`), not on every address check
+    """
+    global _versions
+    with _versions_lock:
+        if _versions is None:
+            _versions = dict(AddressRegistryVersion.objects.values_list('model', 'version'))
+        return _versions
+
+
+@task_prerun.connect
+def expire_registry_versions(**kwargs):
+    """Makes the registries check the versions again, so contracts committed by other processes are loaded"""
+    global _versions
+    with _versions_lock:
+        _versions = None
+
+
+class AddressRegistry:
+    """
+    Set with the addresses of a Contract model, kept by every process. Addresses are loaded from database the first
+    time they are needed. Every creation or deletion increments the `AddressRegistryVersion` of the model in the
+    same transaction, and the addresses are loaded again when the version read at the start of the next task is not
+    the loaded one, so contracts created by other Celery worker processes are not missed. Changes committed by this
+    process are applied in memory without loading the addresses again
+    """
+    def __init__(self, model):
+        self.model = model
+        self.label = model._meta.label_lower
+        self._addresses = None  # Dict used as an ordered set
+        self._version = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._addresses is not None
+
+    def _load(self):
+        # Version is read before the addresses, so changes committed meanwhile are loaded next time
+        version = get_registry_versions().get(self.label, 0)
+        with self._lock:
+            if self._addresses is None or version != self._version:
+                self._addresses = dict.fromkeys(self.model.objects.values_list('address', flat=True))
+                self._version = version
+            return self._addresses
+
+    def get_addresses(self) -> List[str]:
+        return list(self._load())
+
+    def __contains__(self, address) -> bool:
+        return address in self._load()
+
+    def add(self, address: str):
+        with self._lock:
+            if self._addresses is not None:
+                self._addresses[address] = None
+
+    def discard(self, address: str):
+        with self._lock:
+            if self._addresses is not None:
+                self._addresses.pop(address, None)
+
+    def apply_change(self, address: str, created: bool, version: int):
+        """
+        Applies a change committed by this process. The loaded addresses are kept up to date only if no other
+        process changed them since they were loaded, they are loaded again otherwise
+        """
+        global _versions
+        with self._lock:
+            if self._addresses is None:
+                return
+            if created:
+                self.add(address)
+            else:
+                self.discard(address)
+            if self._version == version - 1:
+                self._version = version
+                with _versions_lock:
+                    if _versions is not None and _versions.get(self.label, 0) == version - 1:
+                        _versions[self.label] = version
+
+    def reset(self):
+        """Forces reloading the addresses from database next time they are needed"""
+        with self._lock:
+            self._addresses = None
+
+
+_registries: Dict[type, AddressRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_address_registry(model) -> AddressRegistry:
+    with _registries_lock:
+        if model not in _registries:
+            _registries[model] = AddressRegistry(model)
+        return _registries[model]
+
+
+def reset_address_registries():
+    for registry in list(_registries.values()):
+        registry.reset()
+    expire_registry_versions()
+
+
+def _change_address(model, instance: Contract, created: bool):
+    """
+    Increments the version of the model and its parents in the transaction of the change, the registries of this
+    process are updated once it is committed
+    """
+    versions = {registry_model._meta.label_lower: AddressRegistryVersion.objects.increment(
+        registry_model._meta.label_lower) for registry_model in [model] + model._meta.get_parent_list()
+        if issubclass(registry_model, REGISTRY_MODELS)}
+
+    def change():
+        # Subclasses (e.g. ScalarEvent) must update the registry of their parent model too
+        for registry_model, registry in list(_registries.items()):
+            label = registry_model._meta.label_lower
+            if label in versions:
+                registry.apply_change(instance.address, created, versions[label])
+    transaction.on_commit(change)
+
+
+def _add_to_address_registries(sender, instance, created, **kwargs):
+    if created:
+        _change_address(sender, instance, True)
+
+
+def _remove_from_address_registries(sender, instance, **kwargs):
+    # Addresses are not removed if the deletion is rolled back
+    _change_address(sender, instance, False)
+
+
+def connect_address_registries():
+    """
+    Connects the signals keeping the registries updated, only for the registry models so the rest of models
+    keep their fast deletes
+    """
+    for model in apps.get_models():
+        if issubclass(model, REGISTRY_MODELS):
+            post_save.connect(_add_to_address_registries, sender=model,
+                              dispatch_uid='address_registry_post_save_{}'.format(model._meta.label_lower))
+            post_delete.connect(_remove_from_address_registries, sender=model,
+                                dispatch_uid='address_registry_post_delete_{}'.format(model._meta.label_lower))
+
 
 class ContractAddressGetter(AbstractAddressesGetter):
     """
@@ -14,12 +172,16 @@ class ContractAddressGetter(AbstractAddressesGetter):
     class Meta:
         model = Contract
 
+    @property
+    def registry(self) -> AddressRegistry:
+        return get_address_registry(self.Meta.model)
+
     def get_addresses(self) -> List[str]:
         """
         Returns list of ethereum addresses
         :return: [address]
         """
-        return list(self.Meta.model.objects.values_list('address', flat=True))
+        return self.registry.get_addresses()
 
     def __contains__(self, address):
         """
@@ -27,11 +189,7 @@ class ContractAddressGetter(AbstractAddressesGetter):
         :param address: ethereum address string
         :return: Boolean
         """
-        try:
-            self.Meta.model.objects.get(address=address)
-            return True
-        except ObjectDoesNotExist:
-            return False
+        return address in self.registry
 
 
 class MarketAddressGetter(ContractAddressGetter):
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ChainEventsConfig(AppConfig):
     name = 'tradingdb.chainevents'
+
+    def ready(self):
+        from .address_getters import connect_address_registries
+        connect_address_registries()
@@ -1,9 +1,25 @@
+from contextlib import contextmanager
 from json import dumps
+from typing import Any, Dict, Iterable, List, Optional
 
+from celery.signals import task_postrun
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django_eth_events.chainevents import AbstractEventReceiver
 from django_eth_events.utils import JsonBytesEncoder
-
+from django_eth_events.web3_service import Web3ServiceProvider
+from rest_framework.serializers import ValidationError
+
+from tradingdb.chainevents.abis import abi_file_path, load_json_file
+from tradingdb.ipfs.prefetch import IpfsPrefetcher
+from tradingdb.relationaldb.delta_sync import (block_stamping, count_rollback,
+                                                end_block_stamping)
+from tradingdb.relationaldb.models import EventDescription
+from tradingdb.relationaldb.entity_cache import (block_unit_of_work,
+                                                 end_block_unit_of_work,
+                                                 get_active_cache, get_entity)
+from tradingdb.relationaldb.journal import (block_journaling,
+                                            end_block_journaling, revert_block)
 from tradingdb.relationaldb.serializers import (CategoricalEventSerializer,
                                                 CentralizedOracleSerializer,
                                                 FeeWithdrawalSerializer,
@@ -25,10 +41,132 @@ from tradingdb.relationaldb.serializers import (CategoricalEventSerializer,
                                                 TournamentTokenIssuanceSerializer,
                                                 TournamentTokenTransferSerializer,
                                                 UportTournamentParticipantSerializerEventSerializerTimestamped,
-                                                WinningsRedemptionSerializer)
+                                                WinningsRedemptionSerializer,
+                                                create_event_description)
 
 logger = get_task_logger(__name__)
 
+CENTRALIZED_ORACLE_FACTORY_ABI = load_json_file(abi_file_path('CentralizedOracleFactory.json'))
+
+
+def get_block_number(block_info: Optional[Dict[str, Any]]) -> Optional[int]:
+    return block_info['number'] if block_info else None
+
+
+@contextmanager
+def saving_block(block_info: Optional[Dict[str, Any]]):
+    """
+    Saves a log of the block with the `EntityCache` and the journal of the block. The event listener saves the logs
+    one by one, the cache, the journal and the change block are kept between the logs of the same block so every
+    row is loaded and journaled only once per block
+    """
+    block_number = get_block_number(block_info)
+    block_hash = block_info.get('hash') if block_info else None
+    block_key = (block_number, block_hash) if block_number is not None else None
+    with block_unit_of_work(block_key), block_journaling(block_number, block_hash), block_stamping(block_key):
+        yield
+
+
+@task_postrun.connect
+def end_saving_block(**kwargs):
+    """Forgets the cache, the journal and the change block when the listener task ends, or before a rollback"""
+    end_block_unit_of_work()
+    end_block_journaling()
+    end_block_stamping()
+
+
+def revert_journaled_block(block_info: Optional[Dict[str, Any]]) -> bool:
+    """
+    Reverts the block replaying its journal, the `EntityCache` is flushed before and emptied after as
+    rows are changed directly in database
+    :return: `True` if the block was journaled and is reverted, `False` if serializers must revert the logs
+    """
+    block_number = get_block_number(block_info)
+    if block_number is None:
+        return False
+
+    cache = get_active_cache()
+    if cache:
+        cache.flush()
+    reverted = revert_block(block_number)
+    if cache and reverted:
+        cache.clear()
+    return reverted
+
+
+def get_ipfs_hash(decoded_event: Dict[str, Any]) -> Optional[str]:
+    """
+    :return: IPFS hash of a CentralizedOracleCreation log, `None` for logs of other events
+    """
+    if decoded_event.get('name') == 'CentralizedOracleCreation':
+        ipfs_hash = next((param.get('value') for param in decoded_event.get('params')
+                          if param.get('name') == 'ipfsHash'), None)
+        if ipfs_hash:
+            # Ipfs hash is returned as bytes
+            return ipfs_hash.decode() if isinstance(ipfs_hash, bytes) else ipfs_hash
+
+
+def prefetch_ipfs_hashes(ipfs_hashes: Iterable[str]):
+    """
+    Fetches in parallel the IPFS event descriptions not stored yet, and stores them so `IpfsHashField` finds them
+    in database
+    """
+    ipfs_hashes = list(ipfs_hashes)
+    if ipfs_hashes:
+        stored_hashes = set(EventDescription.objects.filter(ipfs_hash__in=ipfs_hashes
+                                                            ).values_list('ipfs_hash', flat=True))
+        ipfs_objects = IpfsPrefetcher().fetch(ipfs_hash for ipfs_hash in ipfs_hashes
+                                              if ipfs_hash not in stored_hashes)
+        for ipfs_hash, event_description_json in ipfs_objects.items():
+            try:
+                create_event_description(ipfs_hash, event_description_json)
+            except ValidationError as e:
+                # Serializer will fetch it again and report the error
+                logger.warning('Prefetched IPFS hash %s is not a valid event description: %s', ipfs_hash, e)
+
+
+def get_factory_ipfs_hashes(factory_address: str, from_block: int, to_block: int) -> List[str]:
+    """
+    :return: IPFS hashes of the CentralizedOracleCreation logs of the factory between both blocks (included),
+    requested to the Ethereum node
+    """
+    web3_service = Web3ServiceProvider()
+    web3 = web3_service.web3
+    to_block = min(to_block, web3.eth.blockNumber)
+    factory_contract = web3.eth.contract(abi=CENTRALIZED_ORACLE_FACTORY_ABI,
+                                         address=web3_service.make_sure_cheksumed_address(factory_address))
+    logs = factory_contract.events.CentralizedOracleCreation.getLogs(fromBlock=from_block, toBlock=to_block)
+    return [log['args']['ipfsHash'].decode() for log in logs]
+
+
+# Last block whose CentralizedOracleCreation logs were prefetched, by factory address
+_prefetched_blocks: Dict[str, int] = {}
+
+
+def prefetch_next_event_descriptions(decoded_event: Dict[str, Any], block_info: Optional[Dict[str, Any]]):
+    """
+    The event listener saves the logs one by one, so descriptions can't be prefetched for all the logs of a block.
+    When the event description of a CentralizedOracleCreation log is not stored, the logs of its factory in the next
+    `ETH_PROCESS_BLOCKS` blocks are requested to the node, and their event descriptions are fetched in parallel with
+    the one of the log. Following logs find them in database instead of waiting for IPFS one by one
+    """
+    ipfs_hash = get_ipfs_hash(decoded_event)
+    if not ipfs_hash or EventDescription.objects.filter(ipfs_hash=ipfs_hash).exists():
+        return
+
+    ipfs_hashes = [ipfs_hash]
+    block_number = get_block_number(block_info)
+    factory_address = decoded_event.get('address')
+    if block_number is not None and factory_address and _prefetched_blocks.get(factory_address, -1) < block_number:
+        to_block = block_number + settings.ETH_PROCESS_BLOCKS
+        try:
+            ipfs_hashes.extend(get_factory_ipfs_hashes(factory_address, block_number, to_block))
+            _prefetched_blocks[factory_address] = to_block
+        except Exception as e:
+            logger.warning('Cannot get the CentralizedOracleCreation logs of factory %s from block %d: %s',
+                           factory_address, block_number, e)
+    prefetch_ipfs_hashes(ipfs_hashes)
+
 
 class EventReceiverSerializer(AbstractEventReceiver):
 
@@ -36,35 +174,57 @@ class EventReceiverSerializer(AbstractEventReceiver):
         events = {}
         primary_key_name = 'address'
 
-    def save(self, decoded_event, block_info=None):
+    def get_serializer(self, decoded_event, block_info=None):
+        """
+        :return: serializer for the decoded event, `None` if the receiver does not handle the event
+        """
         # Get serializer based on Event Name and saved serializers in Meta.events dictionary
-        event_name = decoded_event.get('name')
-        if self.Meta.events.get(event_name):
+        serializer_class = self.Meta.events.get(decoded_event.get('name'))
+        if serializer_class:
             # Block info is optional, only models that inherit from ContractCreatedByFactory need it
             if block_info:
-                serializer = self.Meta.events.get(event_name)(data=decoded_event, block=block_info)
+                return serializer_class(data=decoded_event, block=block_info)
             else:
-                serializer = self.Meta.events.get(event_name)(data=decoded_event)
+                return serializer_class(data=decoded_event)
+
+    def log_saved(self, decoded_event):
+        logger.info('Event Receiver {} added: {}'.format(self.__class__.__name__,
+                                                         dumps(decoded_event,
+                                                               sort_keys=True,
+                                                               indent=4,
+                                                               cls=JsonBytesEncoder)))
 
+    def log_invalid(self, decoded_event, serializer):
+        logger.warning('INVALID Data for Event Receiver {} save: {}'.format(self.__class__.__name__,
+                                                                            dumps(decoded_event,
+                                                                                  sort_keys=True,
+                                                                                  indent=4,
+                                                                                  cls=JsonBytesEncoder)))
+        logger.warning(serializer.errors)
+
+    def save(self, decoded_event, block_info=None):
+        serializer = self.get_serializer(decoded_event, block_info)
+        if serializer:
             # Only valid data goes forward, non valid data is logged
             if serializer.is_valid():
-                instance = serializer.save()
-                logger.info('Event Receiver {} added: {}'.format(self.__class__.__name__,
-                                                                 dumps(decoded_event,
-                                                                       sort_keys=True,
-                                                                       indent=4,
-                                                                       cls=JsonBytesEncoder)))
+                # Changes are journaled so the block can be reverted without the serializers
+                with saving_block(block_info):
+                    instance = serializer.save()
+                self.log_saved(decoded_event)
                 # serializer model instance is returned in order to django-eth-events know it was a valid event
                 return instance
             else:
-                logger.warning('INVALID Data for Event Receiver {} save: {}'.format(self.__class__.__name__,
-                                                                                    dumps(decoded_event,
-                                                                                          sort_keys=True,
-                                                                                          indent=4,
-                                                                                          cls=JsonBytesEncoder)))
-                logger.warning(serializer.errors)
+                self.log_invalid(decoded_event, serializer)
 
     def rollback(self, decoded_event, block_info=None):
+        # Rows are changed in database, they must be loaded again by the following logs
+        end_saving_block()
+        # Responses cached for the current block number are not valid anymore, and clients that synced it must get
+        # the changes of the rollback
+        count_rollback(get_block_number(block_info))
+        if revert_journaled_block(block_info):
+            return
+
         event_name = decoded_event.get('name')
         serializer_class = self.Meta.events.get(event_name)
         # Get primary key name from Meta.primary_key_name, it can be the same for all Events (string) or different for
@@ -77,9 +237,7 @@ class EventReceiverSerializer(AbstractEventReceiver):
                                   decoded_event.get('params'))).get('value')
 
         # Find instance to update/delete
-        instance = serializer_class.Meta.model.objects.get(
-            address=primary_key
-        )
+        instance = get_entity(serializer_class.Meta.model, address=primary_key)
 
         serializer = serializer_class(instance, data=decoded_event, block=block_info)
         if serializer.is_valid():
@@ -105,6 +263,10 @@ class CentralizedOracleFactoryReceiver(EventReceiverSerializer):
         }
         primary_key_name = 'centralizedOracle'
 
+    def save(self, decoded_event, block_info=None):
+        prefetch_next_event_descriptions(decoded_event, block_info)
+        return super().save(decoded_event, block_info)
+
 
 class EventFactoryReceiver(EventReceiverSerializer):
 
@@ -143,6 +305,14 @@ class BaseInstanceEventReceiver(EventReceiverSerializer):
         primary_key_name = {}
 
     def rollback(self, decoded_event, block_info=None):
+        # Rows are changed in database, they must be loaded again by the following logs
+        end_saving_block()
+        # Responses cached for the current block number are not valid anymore, and clients that synced it must get
+        # the changes of the rollback
+        count_rollback(get_block_number(block_info))
+        if revert_journaled_block(block_info):
+            return
+
         event_name = decoded_event.get('name')
         serializer_class = self.Meta.events.get(event_name)
 
@@ -160,9 +330,7 @@ class BaseInstanceEventReceiver(EventReceiverSerializer):
                 else:
                     filter_dict[pk_model] = decoded_event.get(pk_event)
 
-        instance = serializer_class.Meta.model.objects.get(
-            **filter_dict
-        )
+        instance = get_entity(serializer_class.Meta.model, **filter_dict)
 
         if block_info:
             serializer = serializer_class(instance, data=decoded_event, block=block_info)
@@ -308,38 +476,47 @@ class TournamentTokenReceiver(BaseInstanceEventReceiver):
         event_name = decoded_event.get('name')
         if event_name == 'Issuance':
             super().rollback(decoded_event, block_info)
-        else:
-            serializer_class = self.Meta.events.get(event_name)
-            if serializer_class is not None:
-                serializer_model = serializer_class.Meta.model
-                from_participant = next(filter(lambda x: x.get('name') == 'from',
-                                               decoded_event.get('params'))).get('value')
-                to_participant = next(filter(lambda x: x.get('name') == 'to',
-                                             decoded_event.get('params'))).get('value')
-                participants = (serializer_model.objects.filter(participant=from_participant) |
-                                serializer_model.objects.filter(participant=to_participant))
-                if participants.count():
-                    instance = participants.first()
-                    serializer = serializer_class(instance, data=decoded_event)
-
-                    if serializer.is_valid():
-                        serializer.rollback()
-                        logger.info('Event Receiver {} reverted: {}'.format(self.__class__.__name__,
-                                                                            dumps(decoded_event,
-                                                                                  sort_keys=True,
-                                                                                  indent=4,
-                                                                                  cls=JsonBytesEncoder
-                                                                                  )
-                                                                            )
-                                    )
-                    else:
-                        logger.warning(
-                            'INVALID Data for Event Receiver {} rollback: {}'.format(
-                                self.__class__.__name__, dumps(decoded_event,
-                                                               sort_keys=True,
-                                                               indent=4,
-                                                               cls=JsonBytesEncoder
-                                                               )
-                            )
+            return
+
+        # Rows are changed in database, they must be loaded again by the following logs
+        end_saving_block()
+        # Responses cached for the current block number are not valid anymore, and clients that synced it must get
+        # the changes of the rollback
+        count_rollback(get_block_number(block_info))
+        if revert_journaled_block(block_info):
+            return
+
+        serializer_class = self.Meta.events.get(event_name)
+        if serializer_class is not None:
+            serializer_model = serializer_class.Meta.model
+            from_participant = next(filter(lambda x: x.get('name') == 'from',
+                                           decoded_event.get('params'))).get('value')
+            to_participant = next(filter(lambda x: x.get('name') == 'to',
+                                         decoded_event.get('params'))).get('value')
+            participants = (serializer_model.objects.filter(participant=from_participant) |
+                            serializer_model.objects.filter(participant=to_participant))
+            if participants.count():
+                instance = participants.first()
+                serializer = serializer_class(instance, data=decoded_event)
+
+                if serializer.is_valid():
+                    serializer.rollback()
+                    logger.info('Event Receiver {} reverted: {}'.format(self.__class__.__name__,
+                                                                        dumps(decoded_event,
+                                                                              sort_keys=True,
+                                                                              indent=4,
+                                                                              cls=JsonBytesEncoder
+                                                                              )
+                                                                        )
+                                )
+                else:
+                    logger.warning(
+                        'INVALID Data for Event Receiver {} rollback: {}'.format(
+                            self.__class__.__name__, dumps(decoded_event,
+                                                           sort_keys=True,
+                                                           indent=4,
+                                                           cls=JsonBytesEncoder
+                                                           )
                         )
-                        logger.warning(serializer.errors)
+                    )
+                    logger.warning(serializer.errors)
@@ -1,11 +1,21 @@
-from django.test import TestCase
+from django.test import TransactionTestCase
 
-from tradingdb.relationaldb.tests.factories import EventFactory, MarketFactory
+from tradingdb.relationaldb.models import AddressRegistryVersion
+from tradingdb.relationaldb.tests.factories import (CategoricalEventFactory,
+                                                    EventFactory, MarketFactory,
+                                                    ScalarEventFactory)
 
-from ..address_getters import EventAddressGetter, MarketAddressGetter
+from ..address_getters import (EventAddressGetter, MarketAddressGetter,
+                               expire_registry_versions,
+                               reset_address_registries)
 
 
-class TestAddressGetters(TestCase):
+class TestAddressGetters(TransactionTestCase):
+    # Registries are updated when transactions are committed
+    def setUp(self):
+        # Registries are process-local, they can keep addresses from previous tests
+        reset_address_registries()
+
     def test_market_address_getter(self):
         getter = MarketAddressGetter()
         self.assertListEqual([], getter.get_addresses())
@@ -25,3 +35,50 @@ class TestAddressGetters(TestCase):
         self.assertListEqual([event.address], getter.get_addresses())
         event2 = EventFactory.create()
         self.assertListEqual([event.address, event2.address], getter.get_addresses())
+
+    def test_address_getter_cache(self):
+        getter = MarketAddressGetter()
+        market = MarketFactory.create()
+        # Versions and addresses
+        with self.assertNumQueries(2):
+            self.assertListEqual([market.address], getter.get_addresses())
+            self.assertIn(market.address, getter)
+            self.assertNotIn('0' * 40, getter)
+            self.assertListEqual([market.address], MarketAddressGetter().get_addresses())
+
+        # Addresses committed by this process are added without loading them again
+        market2 = MarketFactory.create()
+        with self.assertNumQueries(0):
+            self.assertListEqual([market.address, market2.address], getter.get_addresses())
+
+        # Versions are read again in the next task only
+        expire_registry_versions()
+        with self.assertNumQueries(1):
+            self.assertListEqual([market.address, market2.address], getter.get_addresses())
+            self.assertIn(market2.address, getter)
+
+        getter.registry.discard(market.address)
+        self.assertListEqual([market2.address], getter.get_addresses())
+
+    def test_address_getter_other_process(self):
+        getter = MarketAddressGetter()
+        market = MarketFactory.create()
+        self.assertListEqual([market.address], getter.get_addresses())
+
+        # Another process changing the version makes the registry load the addresses again in the next task
+        getter.registry.discard(market.address)
+        self.assertListEqual([], getter.get_addresses())
+        AddressRegistryVersion.objects.increment(getter.registry.label)
+        self.assertListEqual([], getter.get_addresses())
+        expire_registry_versions()
+        self.assertListEqual([market.address], getter.get_addresses())
+
+        market.delete()
+        self.assertListEqual([], getter.get_addresses())
+
+    def test_event_address_getter_subclasses(self):
+        getter = EventAddressGetter()
+        self.assertListEqual([], getter.get_addresses())
+        scalar_event = ScalarEventFactory.create()
+        categorical_event = CategoricalEventFactory.create()
+        self.assertListEqual([scalar_event.address, categorical_event.address], getter.get_addresses())
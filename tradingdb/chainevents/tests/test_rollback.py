@@ -7,8 +7,9 @@ from django.utils import timezone
 from django_eth_events.utils import normalize_address_without_0x
 
 from ipfs.ipfs import Ipfs
+from tradingdb.relationaldb.delta_sync import get_tombstones
 from tradingdb.relationaldb.models import (BuyOrder, CategoricalEvent,
-                                           CentralizedOracle, Market,
+                                           CentralizedOracle, Market, Order,
                                            OutcomeTokenBalance, ScalarEvent,
                                            SellOrder, TournamentParticipant,
                                            TournamentParticipantBalance)
@@ -336,10 +337,15 @@ class TestRollback(TestCase):
         # Also double-check by querying with transaction_hash
         orders_before_rollback = BuyOrder.objects.filter(transaction_hash=outcome_token_purchase_event['transaction_hash'])
         self.assertEqual(len(orders_before_rollback), 1)
+        self.assertEqual(Market.objects.get(event=event_factory.address).last_modified_block, block.get('number'))
 
         # Outcome token purchase rollback
         MarketInstanceReceiver().rollback(outcome_token_purchase_event, block)
         market_with_rollback = Market.objects.get(event=event_factory.address)
+        # Clients that synced the block see the market changed again and the order deleted
+        self.assertEqual(market_with_rollback.last_modified_block, block.get('number') + 1)
+        self.assertEqual(get_tombstones(Order, block.get('number')),
+                         [{'transaction_hash': outcome_token_purchase_event['transaction_hash']}])
         orders_after_rollback = BuyOrder.objects.filter(
             creation_block=block.get('number'),
             sender=buyer_address,
@@ -351,6 +357,13 @@ class TestRollback(TestCase):
         orders_after_rollback = BuyOrder.objects.filter(transaction_hash=outcome_token_purchase_event['transaction_hash'])
         self.assertEqual(len(orders_after_rollback), 0)
 
+        # Logs saved again for the rolled back block are stamped after it too
+        MarketInstanceReceiver().save(outcome_token_purchase_event, block)
+        order = BuyOrder.objects.get(transaction_hash=outcome_token_purchase_event['transaction_hash'])
+        self.assertEqual(order.last_modified_block, block.get('number') + 1)
+        self.assertEqual(Market.objects.get(event=event_factory.address).last_modified_block,
+                         block.get('number') + 1)
+
     def test_market_outcome_token_sale_rollback(self):
         categorical_event = CategoricalEventFactory()
         outcome_token = OutcomeTokenFactory(event=categorical_event, index=0)
@@ -1,20 +1,27 @@
 from cProfile import Profile
 from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 from operator import itemgetter
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.models import Count, F
+from django.db import connection, transaction
+from django.db.models import Count
 from django.utils import timezone
 from django_eth_events.utils import normalize_address_without_0x
 
-from tradingdb.relationaldb.models import (Event, Market, Order,
-                                           OutcomeTokenBalance,
+from tradingdb.relationaldb.delta_sync import get_next_change_block
+from tradingdb.relationaldb.models import (ADDRESS_LENGTH,
+                                           DirtyTournamentParticipant, Event,
+                                           Market, Order, OutcomeToken,
+                                           OutcomeTokenBalance, ScalarEvent,
                                            TournamentParticipant,
                                            TournamentWhitelistedCreator)
 
 OUTCOME_RANGE = 1000000
+STAGING_TABLE = 'scoreboard_staging'
+# Transaction advisory lock held by the full and the incremental scoreboard while calculating and storing
+SCOREBOARD_LOCK_ID = 7337001
 
 
 class Command(BaseCommand):
@@ -27,6 +34,12 @@ class Command(BaseCommand):
             dest='profile',
             help='Show cProfile information',
         )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            dest='incremental',
+            help='Only recalculate the participants marked as dirty and update the rankings',
+        )
 
     def __init__(self, *args, **kwargs):
         super().__init__(args, kwargs)
@@ -42,47 +55,117 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS('Reset TournamentParticipant data'))
 
+    @staticmethod
+    def copy_to_staging_table(cursor, users_predicted_values):
+        """
+        Copies the users values to a temporary table with only one `COPY`, `current_rank` is the position of the
+        user in `users_predicted_values`. The table is dropped when the transaction commits
+        """
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(STAGING_TABLE))
+        cursor.execute('CREATE TEMPORARY TABLE {} (address varchar({}) PRIMARY KEY, predicted_profit numeric(80, 0), '
+                       'predictions integer, score numeric(80, 0), current_rank integer) '
+                       'ON COMMIT DROP'.format(STAGING_TABLE, ADDRESS_LENGTH))
+
+        # Values are rounded like Django does when saving the fields
+        predicted_profit_field = TournamentParticipant._meta.get_field('predicted_profit')
+        score_field = TournamentParticipant._meta.get_field('score')
+        rows = StringIO()
+        for index, user_predicted_value in enumerate(users_predicted_values):
+            rows.write('{}\t{}\t{}\t{}\t{}\n'.format(
+                user_predicted_value['address'],
+                predicted_profit_field.get_db_prep_save(user_predicted_value['predicted_profit'], connection),
+                user_predicted_value['predictions'],
+                score_field.get_db_prep_save(user_predicted_value['score'], connection),
+                index + 1,
+            ))
+        rows.seek(0)
+        cursor.copy_from(rows, STAGING_TABLE, columns=('address', 'predicted_profit', 'predictions', 'score',
+                                                       'current_rank'))
+
     def store_scoreboard(self, users_predicted_values):
-        """Updates the all the users values and calculates the scoreboard (rankings)"""
+        """
+        Updates all the users values and the scoreboard (rankings). Values are copied to a staging table and
+        applied with only one UPDATE, that also moves the current rank to the past rank. Rows that would not
+        change are not written, the changed ones are stamped with the next change block for the delta sync
+        """
         self.stdout.write(self.style.SUCCESS('Starting updating users values {}'.format(timezone.now().strftime("%Y-%m-%d %H:%M:%S"))))
-        with transaction.atomic():
-            for index, user_predicted_value in enumerate(users_predicted_values):
-                try:
-                    current_rank = index + 1
-                    TournamentParticipant.objects.filter(address=user_predicted_value['address']).update(
-                        past_rank=F('current_rank'),
-                        predicted_profit=user_predicted_value['predicted_profit'],
-                        predictions=user_predicted_value['predictions'],
-                        score=user_predicted_value['score'],
-                        current_rank=current_rank,
-                        diff_rank=F('current_rank') - current_rank,
-                    )
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR('Scoreboard Error: Was not possible updating user {} due to: {}'.format(user_predicted_value['address'],
-                                                                                                                               e)))
-        self.stdout.write(self.style.SUCCESS('Users updated successfully'))
+        table = connection.ops.quote_name(TournamentParticipant._meta.db_table)
+        query = ('UPDATE {table} SET past_rank = {table}.current_rank, current_rank = staging.current_rank, '
+                 'diff_rank = {table}.current_rank - staging.current_rank, '
+                 'predicted_profit = staging.predicted_profit, predictions = staging.predictions, '
+                 'score = staging.score, last_modified_block = %s '
+                 'FROM {staging} staging WHERE {table}.address = staging.address '
+                 'AND ({table}.past_rank, {table}.current_rank, {table}.diff_rank, {table}.predicted_profit, '
+                 '{table}.predictions, {table}.score) IS DISTINCT FROM ({table}.current_rank, staging.current_rank, '
+                 '{table}.current_rank - staging.current_rank, staging.predicted_profit, staging.predictions, '
+                 'staging.score)').format(table=table, staging=STAGING_TABLE)
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.copy_to_staging_table(cursor, users_predicted_values)
+            cursor.execute(query, [get_next_change_block()])
+            updated = cursor.rowcount
+        self.stdout.write(self.style.SUCCESS('{} users updated successfully'.format(updated)))
+
+    def store_users_values(self, users_predicted_values):
+        """
+        Updates the values of the given users with only one UPDATE, without changing the rankings. The changed
+        rows are stamped with the next change block for the delta sync
+        """
+        table = connection.ops.quote_name(TournamentParticipant._meta.db_table)
+        query = ('UPDATE {table} SET predicted_profit = staging.predicted_profit, '
+                 'predictions = staging.predictions, score = staging.score, last_modified_block = %s '
+                 'FROM {staging} staging WHERE {table}.address = staging.address '
+                 'AND ({table}.predicted_profit, {table}.predictions, {table}.score) IS DISTINCT FROM '
+                 '(staging.predicted_profit, staging.predictions, staging.score)').format(table=table,
+                                                                                         staging=STAGING_TABLE)
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.copy_to_staging_table(cursor, users_predicted_values)
+            cursor.execute(query, [get_next_change_block()])
+
+    @staticmethod
+    def lock_scoreboard():
+        """
+        Waits until no other scoreboard calculation is running, so a full run calculated from an older snapshot
+        doesn't overwrite the values stored by an incremental run (and the other way around). The lock is released
+        when the transaction ends
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SCOREBOARD_LOCK_ID])
 
     @staticmethod
-    def calculate_scalar_event_value(event, outcome_token_balance):
-        lower_bound = event.scalarevent.lower_bound
-        upper_bound = event.scalarevent.upper_bound
-        if event.outcome < 0:
+    def update_ranks(created_before) -> int:
+        """
+        Ranks the participants created before `created_before` by score with only one UPDATE. Rows keeping their
+        rank are not written, participants with the same score keep their previous order. `past_rank` is only
+        moved by the full scoreboard, `diff_rank` is the difference between it and the new rank. Changed rows are
+        stamped with the next change block for the delta sync
+        :return: number of participants whose rank changed
+        """
+        table = connection.ops.quote_name(TournamentParticipant._meta.db_table)
+        query = ('UPDATE {table} SET current_rank = ranking.rank, diff_rank = {table}.past_rank - ranking.rank, '
+                 'last_modified_block = %s '
+                 'FROM (SELECT address, ROW_NUMBER() OVER (ORDER BY score DESC, current_rank) AS rank '
+                 'FROM {table} WHERE created <= %s) ranking '
+                 'WHERE {table}.address = ranking.address AND {table}.current_rank <> ranking.rank').format(table=table)
+        with connection.cursor() as cursor:
+            cursor.execute(query, [get_next_change_block(), created_before])
+            return cursor.rowcount
+
+    @staticmethod
+    def calculate_scalar_event_factors(outcome, lower_bound, upper_bound):
+        """
+        :return: tuple with the factors (multiplied by `OUTCOME_RANGE`) paid for the short and long outcome tokens
+        of a resolved scalar event
+        """
+        if outcome < 0:
             converted_winning_outcome = 0
-        elif event.outcome > upper_bound:
+        elif outcome > upper_bound:
             converted_winning_outcome = OUTCOME_RANGE
         else:
-            converted_winning_outcome = OUTCOME_RANGE * (event.outcome - lower_bound) / (upper_bound - lower_bound)
+            converted_winning_outcome = OUTCOME_RANGE * (outcome - lower_bound) / (upper_bound - lower_bound)
 
         factor_short = OUTCOME_RANGE - converted_winning_outcome
         factor_long = OUTCOME_RANGE - factor_short
-
-        outcome_token_index = outcome_token_balance.outcome_token.index
-        if outcome_token_index == 0:
-            return outcome_token_balance.balance * factor_short / OUTCOME_RANGE
-        elif outcome_token_index == 1:
-            return outcome_token_balance.balance * factor_long / OUTCOME_RANGE
-        else:
-            return 0
+        return factor_short, factor_long
 
     def handle(self, *args, **options):
         """Command entrypoint"""
@@ -94,109 +177,161 @@ class Command(BaseCommand):
         else:
             self._handle(*args, **options)
 
+    @staticmethod
+    def get_users(created_before):
+        return TournamentParticipant.objects.filter(created__lte=created_before)
+
+    def calculate_users_predicted_values(self, users):
+        """
+        Values the outcome tokens of the users column by column: every table is loaded with only one query into
+        plain tuples, the price paid for every outcome token is calculated once per event and market, and balances
+        are valued with dictionary lookups and added up per user.
+        Resolved categorical events pay 1 for the winning outcome token, resolved scalar events pay short and long
+        tokens proportionally to the outcome. Tokens of unresolved events are valued with the marginal price of
+        the latest order of the user in the market, or the initial marginal price if there's no order
+        :param users: queryset of the participants to calculate
+        :return: list of dictionaries with the balance, predicted profit, predictions and score of every user
+        """
+        # Get the whitelisted markets creators
+        whitelisted_creators = TournamentWhitelistedCreator.objects.filter(enabled=True).values_list('address',
+                                                                                                     flat=True)
+        # Get the whitelisted event addresses
+        event_addresses = Event.objects.filter(creator__in=whitelisted_creators).values_list('address', flat=True)
+        users_addresses = users.values_list('address', flat=True)
+
+        # Events columns
+        events = list(Event.objects.filter(address__in=event_addresses).values_list(
+            'address', 'event_type', 'is_winning_outcome_set', 'outcome'))
+        scalar_event_bounds = {address: (lower_bound, upper_bound)
+                               for address, lower_bound, upper_bound in ScalarEvent.objects.filter(
+                                   address__in=event_addresses).values_list('address', 'lower_bound', 'upper_bound')}
+        # First market of every event (by address)
+        event_markets = {}
+        for event_address, market_address in Market.objects.filter(event__in=event_addresses).order_by(
+                '-address').values_list('event', 'address'):
+            event_markets[event_address] = market_address
+        outcome_token_counts = dict(OutcomeToken.objects.filter(event__in=event_addresses).values(
+            'event').annotate(count=Count('address')).values_list('event', 'count'))
+
+        # Payout of every outcome token index for resolved events, and price if the user has no orders
+        # for unresolved ones
+        resolved_payouts = {}  # event -> {outcome token index: payout multiplied by `OUTCOME_RANGE`}
+        default_prices = {}  # event -> marginal price
+        for event_address, event_type, is_winning_outcome_set, outcome in events:
+            if is_winning_outcome_set:
+                if event_type == 'CATEGORICAL':
+                    resolved_payouts[event_address] = {int(outcome): OUTCOME_RANGE} if outcome is not None else {}
+                elif event_address in scalar_event_bounds:
+                    factor_short, factor_long = self.calculate_scalar_event_factors(
+                        outcome, *scalar_event_bounds[event_address])
+                    resolved_payouts[event_address] = {0: factor_short, 1: factor_long}
+                else:
+                    resolved_payouts[event_address] = {}
+            elif event_type == 'CATEGORICAL':
+                # Bought all outcomes
+                if outcome_token_counts.get(event_address):
+                    default_prices[event_address] = Decimal(1 / outcome_token_counts[event_address])
+            elif event_address in scalar_event_bounds:
+                default_prices[event_address] = Decimal(0.5)
+
+        all_orders = Order.objects.filter(
+            sender__in=users_addresses,
+            market__event__in=event_addresses,
+        )
+
+        # Participations of user in different markets
+        user_with_participations = dict(all_orders.values('sender').annotate(
+            number_predictions=Count('market', distinct=True)).values_list('sender', 'number_predictions'))
+
+        # Marginal price of the latest order of every user in every market
+        latest_prices = {}  # (sender, market) -> marginal price
+        for sender, market_address, marginal_prices, outcome_token_index in all_orders.distinct(
+                'market', 'sender').order_by('market', 'sender', '-creation_date_time').values_list(
+                'sender', 'market', 'marginal_prices', 'outcome_token__index'):
+            if outcome_token_index is not None:
+                latest_prices[(sender, market_address)] = marginal_prices[outcome_token_index]
+
+        # Balances columns, valued and added up per user
+        predicted_values = {}
+        for owner, balance, outcome_token_index, event_address in OutcomeTokenBalance.objects.filter(
+            owner__in=users_addresses,
+            outcome_token__event__in=event_addresses,
+            balance__gt=0
+        ).values_list('owner', 'balance', 'outcome_token__index', 'outcome_token__event'):
+            payouts = resolved_payouts.get(event_address)
+            if payouts is not None:
+                payout = payouts.get(outcome_token_index)
+                if not payout:
+                    continue
+                value = balance if payout == OUTCOME_RANGE else balance * payout / OUTCOME_RANGE
+            else:
+                marginal_price = latest_prices.get((owner, event_markets.get(event_address)))
+                if marginal_price is None:
+                    marginal_price = default_prices.get(event_address)
+                    if marginal_price is None:
+                        raise ValueError('Event is neither categorical nor scalar')
+                value = balance * marginal_price
+            predicted_values[owner] = predicted_values.get(owner, 0) + value
+
+        users_predicted_values = []
+        for address, balance in users.values_list('address', 'tournament_balance__balance'):
+            user_address = normalize_address_without_0x(address.lower())
+            predicted_value = predicted_values.get(user_address, 0)
+            balance = balance or 0
+            users_predicted_values.append({
+                'balance': balance,
+                'predicted_profit': predicted_value,
+                # Number of markets the user is participating in
+                'predictions': user_with_participations.get(user_address, 0),
+                'score': predicted_value + balance,
+                'address': address
+            })
+        return users_predicted_values
+
+    def calculate_scoreboard(self, created_before):
+        """Recalculates every participant and rewrites the whole scoreboard"""
+        with transaction.atomic():
+            self.lock_scoreboard()
+            marked_before = timezone.now()
+            users = self.get_users(created_before)
+            users_predicted_values = self.calculate_users_predicted_values(users)
+            sorted_scoreboard = sorted(users_predicted_values, key=itemgetter('score'), reverse=True)
+            # Store scoreboard
+            self.store_scoreboard(sorted_scoreboard)
+            DirtyTournamentParticipant.objects.filter(marked__lte=marked_before,
+                                                      participant__in=users.values('address')).delete()
+
+    def calculate_incremental_scoreboard(self, created_before):
+        """Recalculates only the participants marked as dirty and updates the rankings"""
+        with transaction.atomic():
+            self.lock_scoreboard()
+            marked_before = timezone.now()
+            dirty_participants = DirtyTournamentParticipant.objects.filter(marked__lte=marked_before)
+            users = self.get_users(created_before).filter(address__in=dirty_participants.values('participant'))
+            users_predicted_values = self.calculate_users_predicted_values(users)
+            if not users_predicted_values:
+                self.stdout.write(self.style.SUCCESS('No users to update'))
+                return
+
+            self.store_users_values(users_predicted_values)
+            updated_ranks = self.update_ranks(created_before)
+            # Participants marked again while calculating keep their mark
+            dirty_participants.filter(participant__in=[user_predicted_value['address']
+                                                       for user_predicted_value in users_predicted_values]).delete()
+        self.stdout.write(self.style.SUCCESS('Updated {} users, {} rankings changed'.format(len(users_predicted_values),
+                                                                                         updated_ranks)))
+
     def _handle(self, *args, **options):
         start_time = timezone.now()
         self.stdout.write(self.style.SUCCESS('Starting Scoreboard process, {}'.format(start_time.strftime("%Y-%m-%d %H:%M:%S"))))
 
         try:
-            # Get the whitelisted markets creators
-            whitelisted_creators = TournamentWhitelistedCreator.objects.filter(enabled=True).values_list('address',
-                                                                                                         flat=True)
-            # Get the whitelisted event addresses
-            event_addresses = Event.objects.filter(creator__in=whitelisted_creators).values_list('address', flat=True)
-
-            # Get the market addresses for the whitelisted events
-            market_addresses = Market.objects.filter(event__in=event_addresses).values_list('address', flat=True)
-
             # Get users created until the last minute (to prevent reorgs)
-            users = TournamentParticipant.objects.filter(
-                created__lte=timezone.now() - timedelta(minutes=1)
-            ).select_related('tournament_balance')
-
-            users_addresses = users.values_list('address', flat=True)
-
-            all_outcome_token_balances = OutcomeTokenBalance.objects.filter(
-                owner__in=users_addresses,
-                outcome_token__event__address__in=event_addresses,
-                balance__gt=0
-            ).select_related(
-                'outcome_token__event__categoricalevent',
-                'outcome_token__event__scalarevent',
-            ).prefetch_related('outcome_token__event__markets')
-
-            all_outcome_token_balances_dict = {}
-            for outcome_token_balance in all_outcome_token_balances:
-                all_outcome_token_balances_dict.setdefault(outcome_token_balance.owner, []).append(outcome_token_balance)
-
-            all_orders = Order.objects.filter(
-                sender__in=users_addresses,
-                market__in=market_addresses,
-            ).prefetch_related('market')
-
-            # Participations of user in different markets
-            distinct_participations = all_orders.values('sender').annotate(number_predictions=Count('market',
-                                                                                                    distinct=True))
-            # Get orders for every user, if there's more than one for a market just the latest one
-            latest_orders = all_orders.distinct('market', 'sender').order_by('market', 'sender', '-creation_date_time')
-
-            latest_orders_dict = {}
-            for latest_order in latest_orders:
-                latest_orders_dict.setdefault(latest_order.sender, []).append(latest_order)
-
-            user_with_participations = {}
-            for participation in distinct_participations:
-                user_with_participations[participation['sender']] = participation['number_predictions']
-
-            users_predicted_values = []
-            for user in users:
-                # Get balance
-                user_address = normalize_address_without_0x(user.address.lower())
-                balance = user.tournament_balance.balance
-
-                # Number of markets the user is participating in
-                predictions = user_with_participations.get(user_address, 0)
-
-                user_outcome_token_balances = all_outcome_token_balances_dict.get(user_address, [])
-
-                predicted_value = 0
-                for outcome_token_balance in user_outcome_token_balances:
-                    market = outcome_token_balance.outcome_token.event.markets.first()
-                    event = outcome_token_balance.outcome_token.event
-                    if event.is_winning_outcome_set:
-                        outcome_token_index = outcome_token_balance.outcome_token.index
-                        if event.is_categorical() and outcome_token_index == event.outcome:
-                            predicted_value += outcome_token_balance.balance
-                        elif event.is_scalar():
-                            predicted_value += self.calculate_scalar_event_value(event, outcome_token_balance)
-
-                    else:
-                        try:
-                            order = next(user_market_order for user_market_order in latest_orders_dict.get(user_address)
-                                         if user_market_order.market_id == market.address)
-                            outcome_token_index = order.outcome_token.index
-                            marginal_price = order.marginal_prices[outcome_token_index]
-                            predicted_value += (outcome_token_balance.balance * marginal_price)
-                        except StopIteration:
-                            # Bought all outcomes
-                            if event.is_categorical():
-                                marginal_price = Decimal(1 / event.outcome_tokens.count())
-                            elif event.is_scalar():
-                                marginal_price = Decimal(0.5)
-                            else:
-                                raise ValueError('Event is neither categorical nor scalar')
-                            predicted_value += outcome_token_balance.balance * marginal_price
-
-                users_predicted_values.append({
-                    'balance': balance,
-                    'predicted_profit': predicted_value,
-                    'predictions': predictions,
-                    'score': predicted_value + balance,
-                    'address': user.address
-                })
-
-            sorted_scoreboard = sorted(users_predicted_values, key=itemgetter('score'), reverse=True)
-            # Store scoreboard
-            self.store_scoreboard(sorted_scoreboard)
+            created_before = timezone.now() - timedelta(minutes=1)
+            if options['incremental']:
+                self.calculate_incremental_scoreboard(created_before)
+            else:
+                self.calculate_scoreboard(created_before)
         except Exception as e:
             self.stdout.write(self.style.ERROR("Scoreboard Error: {}".format(e)))
             raise e
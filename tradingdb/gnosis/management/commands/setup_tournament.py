@@ -20,6 +20,7 @@ class Command(BaseCommand):
         PeriodicTask.objects.filter(task__in=[
             'django_eth_events.tasks.event_listener',
             'tradingdb.relationaldb.tasks.calculate_scoreboard',
+            'tradingdb.relationaldb.tasks.calculate_incremental_scoreboard',
             'tradingdb.relationaldb.tasks.issue_tokens',
             'tradingdb.relationaldb.tasks.clear_issued_tokens_flag',
         ]).delete()
@@ -68,6 +69,13 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS('Created Periodic Task for Scoreboard every 10 minutes'))
 
+        PeriodicTask.objects.create(
+            name='Incremental Scoreboard Calculation',
+            task='tradingdb.relationaldb.tasks.calculate_incremental_scoreboard',
+            interval=one_minute_interval,
+        )
+        self.stdout.write(self.style.SUCCESS('Created Periodic Task for Incremental Scoreboard every minute'))
+
         PeriodicTask.objects.create(
             name='Token issuance',
             task='tradingdb.relationaldb.tasks.issue_tokens',
@@ -9,7 +9,7 @@ from tradingdb.relationaldb.models import (TournamentParticipant,
 
 
 class Command(BaseCommand):
-    help = 'Synchronizes balance from database and blockchain, hotfix for concurrency issue with user balance'
+    help = 'Synchronizes tournament balances in database with the blockchain balances'
 
     def handle(self, *args, **options):
         users = TournamentParticipant.objects.all()
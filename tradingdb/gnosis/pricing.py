@@ -0,0 +1,57 @@
+import math
+from decimal import Decimal
+from typing import List, Sequence
+
+from mpmath import mp, mpf
+
+# Doubles carry 52 bits of mantissa, exponents bigger than this lose more than
+# 1e-9 of absolute precision in `q / b` and prices are not reliable anymore
+MAX_FLOAT_EXPONENT = 1e-9 * 2 ** 52
+# Decimal digits used by mpmath when float math is not precise enough, set locally to not depend on `mp.dps`
+MP_DPS = 100
+
+
+def _calc_float_marginal_prices(net_outcome_tokens_sold: Sequence[int], funding) -> List[float]:
+    log_n = math.log(len(net_outcome_tokens_sold))
+    funding = float(funding)
+    exponents = [float(share_count) * log_n / funding for share_count in net_outcome_tokens_sold]
+    max_exponent = max(exponents)
+    if max(abs(max_exponent), abs(min(exponents))) > MAX_FLOAT_EXPONENT:
+        raise OverflowError('LMSR exponents too big for float precision')
+
+    exps = [math.exp(exponent - max_exponent) for exponent in exponents]
+    exps_sum = math.fsum(exps)
+    return [exp / exps_sum for exp in exps]
+
+
+def _calc_mp_marginal_prices(net_outcome_tokens_sold: Sequence[int], funding) -> List[float]:
+    with mp.workdps(MP_DPS):
+        b = mpf(funding) / mp.log(len(net_outcome_tokens_sold))
+        exponents = [mpf(share_count) / b for share_count in net_outcome_tokens_sold]
+        max_exponent = max(exponents)
+        exps = [mp.exp(exponent - max_exponent) for exponent in exponents]
+        exps_sum = mp.fsum(exps)
+        return [float(exp / exps_sum) for exp in exps]
+
+
+def calc_lmsr_marginal_prices(net_outcome_tokens_sold: Sequence[int], funding) -> List[float]:
+    """
+    Calculates the LMSR marginal price of every outcome in a single log-sum-exp pass.
+    Float math is used when it is precise enough, mpmath with `MP_DPS` digits otherwise
+    :param net_outcome_tokens_sold: list with the net amount of outcome tokens sold for every outcome
+    :param funding: market funding
+    :return: list of marginal prices
+    """
+    try:
+        return _calc_float_marginal_prices(net_outcome_tokens_sold, funding)
+    except OverflowError:
+        return _calc_mp_marginal_prices(net_outcome_tokens_sold, funding)
+
+
+def calc_initial_marginal_prices(n_outcomes: int) -> List[Decimal]:
+    """
+    Marginal prices of a market without trades, every outcome has the same price
+    :param n_outcomes: number of outcomes of the event
+    :return: list of marginal prices
+    """
+    return [Decimal(str(1.0 / n_outcomes))] * n_outcomes
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django_eth_events.models import Daemon
+
+from tradingdb.relationaldb.models import (DirtyTournamentParticipant,
+                                           TournamentParticipant,
+                                           TournamentParticipantBalance,
+                                           TournamentWhitelistedCreator)
+from tradingdb.relationaldb.tests.factories import (
+    BuyOrderFactory, CategoricalEventFactory, MarketFactory,
+    OutcomeTokenBalanceFactory, OutcomeTokenFactory, ScalarEventFactory,
+    TournamentParticipantBalanceFactory)
+
+
+class TestCalculateScoreboard(TestCase):
+
+    def test_incremental_scoreboard(self):
+        created = timezone.now() - timedelta(minutes=5)
+        balances = [TournamentParticipantBalanceFactory(balance=balance, participant__created=created,
+                                                        participant__current_rank=index + 1, participant__score=0)
+                    for index, balance in enumerate([100, 200, 300])]
+        call_command('calculate_scoreboard', stdout=StringIO())
+        ranks = dict(TournamentParticipant.objects.values_list('address', 'current_rank'))
+        self.assertEqual([ranks[balance.participant.address] for balance in balances], [3, 2, 1])
+
+        # Changes are not seen until the participant is marked as dirty
+        last_participant = balances[0].participant
+        TournamentParticipantBalance.objects.filter(participant=last_participant).update(balance=1000)
+        call_command('calculate_scoreboard', incremental=True, stdout=StringIO())
+        self.assertEqual(TournamentParticipant.objects.get(address=last_participant.address).current_rank, 3)
+
+        DirtyTournamentParticipant.objects.mark(TournamentParticipant.objects.filter(address=last_participant.address),
+                                                timezone.now())
+        daemon = Daemon.get_solo()
+        daemon.block_number = 10
+        daemon.save()
+        call_command('calculate_scoreboard', incremental=True, stdout=StringIO())
+        participant = TournamentParticipant.objects.get(address=last_participant.address)
+        self.assertEqual(participant.score, 1000)
+        # Changed rows are stamped after the last block processed, so clients that synced it get them
+        self.assertEqual(participant.last_modified_block, 11)
+        self.assertEqual(participant.current_rank, 1)
+        # Past ranks are only moved by the full scoreboard
+        self.assertEqual(participant.past_rank, 1)
+        self.assertEqual(participant.diff_rank, 0)
+        first_participant = TournamentParticipant.objects.get(address=balances[2].participant.address)
+        self.assertEqual(first_participant.current_rank, 2)
+        self.assertEqual(first_participant.past_rank, 3)
+        self.assertEqual(first_participant.diff_rank, 1)
+        self.assertEqual(first_participant.last_modified_block, 11)
+        self.assertFalse(DirtyTournamentParticipant.objects.exists())
+
+    def test_predicted_profit(self):
+        creator = '{:040x}'.format(999)
+        TournamentWhitelistedCreator.objects.create(address=creator)
+        participant = TournamentParticipantBalanceFactory(balance=0, participant__created=timezone.now() -
+                                                          timedelta(minutes=5)).participant
+
+        def create_balance(event, index, balance):
+            return OutcomeTokenBalanceFactory(owner=participant.address, balance=balance,
+                                              outcome_token=OutcomeTokenFactory(event=event, index=index))
+
+        # Winning outcome token pays 1, the other nothing
+        categorical_event = CategoricalEventFactory(creator=creator, is_winning_outcome_set=True, outcome=1)
+        create_balance(categorical_event, 0, 5)
+        create_balance(categorical_event, 1, 10)
+
+        # Short and long tokens are paid proportionally to the outcome
+        scalar_event = ScalarEventFactory(creator=creator, is_winning_outcome_set=True, outcome=25, lower_bound=0,
+                                          upper_bound=100)
+        create_balance(scalar_event, 0, 100)
+        create_balance(scalar_event, 1, 100)
+
+        # Tokens of unresolved events are valued with the price of the latest order
+        unresolved_event = CategoricalEventFactory(creator=creator)
+        outcome_token_balance = create_balance(unresolved_event, 0, 40)
+        BuyOrderFactory(market=MarketFactory(event=unresolved_event), sender=participant.address,
+                        outcome_token=outcome_token_balance.outcome_token, marginal_prices=['0.2500', '0.7500'])
+
+        # Events not created by whitelisted creators are ignored
+        create_balance(CategoricalEventFactory(is_winning_outcome_set=True, outcome=0), 0, 1000)
+
+        call_command('calculate_scoreboard', stdout=StringIO())
+        participant = TournamentParticipant.objects.get(address=participant.address)
+        self.assertEqual(participant.predicted_profit, 10 + 75 + 25 + 10)
+        self.assertEqual(participant.score, participant.predicted_profit)
+        self.assertEqual(participant.predictions, 1)
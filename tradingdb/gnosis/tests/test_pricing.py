@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from ..pricing import (_calc_mp_marginal_prices, calc_initial_marginal_prices,
+                       calc_lmsr_marginal_prices)
+from ..utils import calc_lmsr_marginal_price
+
+
+class TestPricing(TestCase):
+
+    def test_calc_lmsr_marginal_prices(self):
+        funding = int(1e18)
+        net_outcome_tokens_sold = [int(2e18), 0, int(-1e18)]
+        marginal_prices = calc_lmsr_marginal_prices(net_outcome_tokens_sold, funding)
+        self.assertEqual(len(marginal_prices), 3)
+        self.assertAlmostEqual(sum(marginal_prices), 1.0)
+        self.assertTrue(marginal_prices[0] > marginal_prices[1] > marginal_prices[2])
+
+        # Float and mpmath paths must agree
+        mp_marginal_prices = _calc_mp_marginal_prices(net_outcome_tokens_sold, funding)
+        for marginal_price, mp_marginal_price in zip(marginal_prices, mp_marginal_prices):
+            self.assertAlmostEqual(marginal_price, mp_marginal_price, places=12)
+
+        # Every single price matches the vectorized calculation
+        for index, marginal_price in enumerate(marginal_prices):
+            self.assertEqual(calc_lmsr_marginal_price(index, net_outcome_tokens_sold, funding), marginal_price)
+
+    def test_calc_lmsr_marginal_prices_big_exponents(self):
+        # Exponents would overflow a naive exp-sum
+        marginal_prices = calc_lmsr_marginal_prices([int(1e70), 0], int(1e18))
+        self.assertListEqual(marginal_prices, [1.0, 0.0])
+
+    def test_calc_initial_marginal_prices(self):
+        marginal_prices = calc_initial_marginal_prices(4)
+        self.assertEqual(len(marginal_prices), 4)
+        self.assertEqual(marginal_prices[0], marginal_prices[3])
+        self.assertAlmostEqual(float(sum(marginal_prices)), 1.0)
@@ -1,4 +1,4 @@
-from mpmath import mp, mpf
+from .pricing import calc_lmsr_marginal_prices
 
 
 def singleton(clazz):
@@ -44,9 +44,7 @@ def add_0x_prefix(value):
 
 
 def calc_lmsr_marginal_price(token_index, net_outcome_tokens_sold, funding):
-    b = mpf(funding) / mp.log(len(net_outcome_tokens_sold))
-    return float(mp.exp(net_outcome_tokens_sold[token_index] / b) / sum(mp.exp(share_count / b)
-                 for share_count in net_outcome_tokens_sold))
+    return calc_lmsr_marginal_prices(net_outcome_tokens_sold, funding)[token_index]
 
 
 def get_order_type(order):
@@ -55,29 +53,18 @@ def get_order_type(order):
     :param order: See models.Order
     :return: String
     """
-    if hasattr(order, 'sellorder'):
-        return 'SELL'
-    elif hasattr(order, 'shortsellorder'):
-        return 'SHORT SELL'
-    elif hasattr(order, 'buyorder'):
-        return 'BUY'
-    else:
-        return 'UNKNOWN'
+    return order.order_type or 'UNKNOWN'
 
 
 def get_order_cost(order):
-    order_type = get_order_type(order)
-    if order_type == 'BUY':
-        return order.buyorder.cost
-    elif order_type == 'SHORT SELL':
-        return order.shortsellorder.cost
+    if order.order_type in ('BUY', 'SHORT SELL'):
+        return order.cost
     else:
         return None
 
 
 def get_order_profit(order):
-    order_type = get_order_type(order)
-    if order_type == 'SELL':
-        return order.sellorder.profit
+    if order.order_type == 'SELL':
+        return order.profit
     else:
         return None
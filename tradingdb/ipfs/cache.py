@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Optional
+
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+# Base58 CIDv0, hashes come from chain data and are used as file names
+IPFS_HASH_RE = re.compile(r'^Qm[1-9A-HJ-NP-Za-km-z]{44}$')
+
+
+class IpfsCache:
+    """
+    On-disk content-addressed cache for IPFS json objects. IPFS objects are immutable, so they never expire.
+    Files are sharded in subfolders by the last 2 chars of the hash: `<path>/<shard>/<ipfs_hash>.json`.
+    When the cache is bigger than `max_size` bytes, the least recently used files are evicted.
+    Hashes that are not valid CIDv0 are never read or written, they bypass the cache
+    """
+    evict_ratio = 0.9  # Evict until the cache is 90% of `max_size`, so eviction doesn't run on every `set`
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_hash(ipfs_hash) -> bool:
+        return isinstance(ipfs_hash, str) and IPFS_HASH_RE.match(ipfs_hash) is not None
+
+    def _file_path(self, ipfs_hash: str) -> Optional[str]:
+        """
+        :return: path of the file of the hash, `None` if the hash is not valid
+        """
+        if not self.is_valid_hash(ipfs_hash):
+            return None
+        return os.path.join(self.path, ipfs_hash[-2:], ipfs_hash + '.json')
+
+    def _files(self):
+        for root, _, file_names in os.walk(self.path):
+            for file_name in file_names:
+                if file_name.endswith('.json'):
+                    yield os.path.join(root, file_name)
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = sum(os.path.getsize(file_path) for file_path in self._files())
+        return self._size
+
+    def get(self, ipfs_hash: str) -> Optional[Any]:
+        """
+        :return: json object, `None` if not cached
+        """
+        file_path = self._file_path(ipfs_hash)
+        if not file_path:
+            return None
+        try:
+            with open(file_path) as f:
+                ipfs_object = json.load(f)
+            # Modification time is used to track usage, access time is not reliable (e.g. noatime)
+            os.utime(file_path)
+            return ipfs_object
+        except (OSError, ValueError):
+            return None
+
+    def __contains__(self, ipfs_hash: str) -> bool:
+        file_path = self._file_path(ipfs_hash)
+        return bool(file_path) and os.path.exists(file_path)
+
+    def set(self, ipfs_hash: str, ipfs_object: Any) -> bool:
+        """
+        :return: `True` if the object is stored, `False` if it was already cached or the hash is not valid
+        """
+        file_path = self._file_path(ipfs_hash)
+        if not file_path:
+            logger.warning('IPFS hash %r is not valid, it is not cached', ipfs_hash)
+            return False
+        if os.path.exists(file_path):
+            return False
+
+        data = json.dumps(ipfs_object, separators=(',', ':'))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+        with self._lock:
+            self._size = self.size + len(data.encode())
+            if self._size > self.max_size:
+                self._evict()
+        return True
+
+    def _evict(self):
+        files = []
+        for file_path in self._files():
+            try:
+                stat = os.stat(file_path)
+                files.append((stat.st_mtime, stat.st_size, file_path))
+            except OSError:
+                pass
+
+        size = sum(file_size for _, file_size, _ in files)
+        target_size = self.max_size * self.evict_ratio
+        for _, file_size, file_path in sorted(files):
+            if size <= target_size:
+                break
+            try:
+                os.remove(file_path)
+                size -= file_size
+            except OSError:
+                pass
+        logger.debug('IPFS cache evicted to %d bytes', size)
+        self._size = size
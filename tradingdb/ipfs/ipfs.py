@@ -6,6 +6,8 @@ from json import dumps
 
 from gnosis.utils import singleton
 
+from .cache import IpfsCache
+
 
 logger = get_task_logger(__name__)
 
@@ -23,6 +25,9 @@ class Ipfs:
         self.api = connect(settings.IPFS_HOST, settings.IPFS_PORT)
         logger.debug('Connection to IPFS (%s : %s) established.' % (settings.IPFS_HOST, settings.IPFS_PORT))
 
+        self.cache = IpfsCache(settings.IPFS_CACHE_DIR,
+                               settings.IPFS_CACHE_MAX_SIZE) if settings.IPFS_CACHE_DIR else None
+
     def get(self, ipfs_hash):
         """Returns ipfs_hash's json related object
         :param ipfs_hash:
@@ -30,8 +35,16 @@ class Ipfs:
         :raise AttributeError
         """
         logger.debug('Get JSON for IPFS HASH %s' % ipfs_hash)
+        if self.cache:
+            json = self.cache.get(ipfs_hash)
+            if json is not None:
+                logger.debug('Got JSON from IPFS cache')
+                return json
+
         json = self.api.get_json(ipfs_hash, **self._defaults)
         logger.debug('Got JSON from IPFS: {}'.format(dumps(json, indent=4)))
+        if self.cache:
+            self.cache.set(ipfs_hash, json)
         return json
 
     def post(self, python_object):
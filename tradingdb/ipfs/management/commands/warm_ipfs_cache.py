@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from tradingdb.relationaldb.models import EventDescription
+
+from ...ipfs import Ipfs
+
+
+class Command(BaseCommand):
+    help = 'Imports the stored event descriptions into the local IPFS cache'
+
+    @staticmethod
+    def to_ipfs_json(event_description):
+        """
+        Builds the IPFS json object an event description was created from
+        :return: json object, `None` if the description is neither categorical nor scalar
+        """
+        ipfs_json = {
+            'title': event_description.title,
+            'description': event_description.description,
+            'resolutionDate': event_description.resolution_date.isoformat(),
+        }
+        if event_description.description_type == 'CATEGORICAL':
+            ipfs_json['outcomes'] = event_description.get_subclass_instance().outcomes
+        elif event_description.description_type == 'SCALAR':
+            scalar_event_description = event_description.get_subclass_instance()
+            ipfs_json['unit'] = scalar_event_description.unit
+            ipfs_json['decimals'] = scalar_event_description.decimals
+        else:
+            return None
+        return ipfs_json
+
+    def handle(self, *args, **options):
+        cache = Ipfs().cache
+        if not cache:
+            self.stdout.write(self.style.WARNING('IPFS cache is disabled, set IPFS_CACHE_DIR to enable it'))
+            return
+
+        imported = 0
+        event_descriptions = EventDescription.objects.select_related('categoricaleventdescription',
+                                                                     'scalareventdescription')
+        for event_description in event_descriptions.iterator():
+            if event_description.ipfs_hash not in cache:
+                ipfs_json = self.to_ipfs_json(event_description)
+                if ipfs_json:
+                    if cache.set(event_description.ipfs_hash, ipfs_json):
+                        imported += 1
+                    else:
+                        self.stdout.write(self.style.WARNING('Event description {!r} has not a valid IPFS '
+                                                             'hash'.format(event_description.ipfs_hash)))
+                else:
+                    self.stdout.write(self.style.WARNING('Event description {} is neither categorical nor '
+                                                         'scalar'.format(event_description.ipfs_hash)))
+
+        self.stdout.write(self.style.SUCCESS('Imported {} event descriptions into the IPFS cache'.format(imported)))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Any, Dict, Iterable
+
+from celery.utils.log import get_task_logger
+from django.conf import settings
+
+from .ipfs import Ipfs
+
+logger = get_task_logger(__name__)
+
+
+class IpfsPrefetcher:
+    """
+    Fetches IPFS json objects in parallel using a bounded thread pool.
+    `stats` keeps process-wide counters: `fetched`, `failed` and `seconds` spent waiting for IPFS
+    """
+    stats = Counter()
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or settings.IPFS_PREFETCH_WORKERS
+
+    def _fetch(self, ipfs_hash):
+        start = monotonic()
+        try:
+            return ipfs_hash, Ipfs().get(ipfs_hash), None, monotonic() - start
+        except Exception as e:
+            return ipfs_hash, None, e, monotonic() - start
+
+    def fetch(self, ipfs_hashes: Iterable[str]) -> Dict[str, Any]:
+        """
+        :param ipfs_hashes: IPFS hashes to fetch, duplicates are fetched only once
+        :return: dictionary {ipfs_hash: json object} with the objects successfully fetched
+        """
+        ipfs_hashes = list(dict.fromkeys(ipfs_hashes))
+        if not ipfs_hashes:
+            return {}
+
+        ipfs_objects = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ipfs_hashes))) as executor:
+            for ipfs_hash, ipfs_object, error, latency in executor.map(self._fetch, ipfs_hashes):
+                self.stats['seconds'] += latency
+                if error:
+                    self.stats['failed'] += 1
+                    logger.warning('Prefetch of IPFS hash %s failed after %.3f seconds: %s', ipfs_hash, latency, error)
+                else:
+                    self.stats['fetched'] += 1
+                    ipfs_objects[ipfs_hash] = ipfs_object
+                    logger.info('Prefetched IPFS hash %s in %.3f seconds', ipfs_hash, latency)
+
+        logger.info('IPFS prefetch stats: %d fetched, %d failed, %.3f seconds',
+                    self.stats['fetched'], self.stats['failed'], self.stats['seconds'])
+        return ipfs_objects
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+from django.test import TestCase
+
+from ..cache import IpfsCache
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+class TestIpfsCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = IpfsCache(self.tmp_dir.name, max_size=1024)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_set(self):
+        ipfs_hash = 'QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPbdG'
+        json_object = {"name": "giacomo", "index": 1}
+        self.assertIsNone(self.cache.get(ipfs_hash))
+        self.assertNotIn(ipfs_hash, self.cache)
+
+        self.cache.set(ipfs_hash, json_object)
+        self.assertIn(ipfs_hash, self.cache)
+        self.assertDictEqual(self.cache.get(ipfs_hash), json_object)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, 'dG', ipfs_hash + '.json')))
+
+        # A new instance reads the objects stored on disk
+        self.assertDictEqual(IpfsCache(self.tmp_dir.name, max_size=1024).get(ipfs_hash), json_object)
+
+    def test_eviction(self):
+        ipfs_hashes = ['Qm{}{}'.format('x' * 43, BASE58_ALPHABET[index]) for index in range(20)]
+        for index, ipfs_hash in enumerate(ipfs_hashes):
+            self.cache.set(ipfs_hash, {"text": 'x' * 100})
+            # Make sure modification times are ordered
+            os.utime(self.cache._file_path(ipfs_hash), (index, index))
+
+        self.assertLessEqual(self.cache.size, self.cache.max_size)
+        self.assertIn(ipfs_hashes[-1], self.cache)
+        self.assertNotIn(ipfs_hashes[0], self.cache)
+
+    def test_invalid_hash(self):
+        # Hashes come from chain data, they must not read or write files out of the cache folder
+        outside_path = os.path.join(self.tmp_dir.name, 'outside.json')
+        with open(outside_path, 'w') as f:
+            f.write('{"secret": 1}')
+        cache = IpfsCache(os.path.join(self.tmp_dir.name, 'cache'), max_size=1024)
+        traversal_hash = '../../' + os.path.join(self.tmp_dir.name, 'outside').lstrip('/')
+        for ipfs_hash in (traversal_hash, '../outside', 'QmYwAPJzv5CZsnA625s3Xf2nemtYgPpHdWEz79ojWnPb/G'):
+            self.assertIsNone(cache.get(ipfs_hash))
+            self.assertNotIn(ipfs_hash, cache)
+            self.assertFalse(cache.set(ipfs_hash, {"name": "giacomo"}))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir.name, 'cache')))
+        with open(outside_path) as f:
+            self.assertEqual(f.read(), '{"secret": 1}')
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from ..ipfs import Ipfs
+from ..prefetch import IpfsPrefetcher
+
+
+class TestIpfsPrefetcher(TestCase):
+
+    def test_fetch(self):
+        ipfs = Ipfs()
+        json_objects = [{"name": "giacomo", "index": index} for index in range(5)]
+        ipfs_hashes = [ipfs.post(json_object) for json_object in json_objects]
+
+        prefetcher = IpfsPrefetcher(max_workers=2)
+        fetched = prefetcher.stats['fetched']
+        failed = prefetcher.stats['failed']
+        ipfs_objects = prefetcher.fetch(ipfs_hashes + [ipfs_hashes[0], 'invalidhash'])
+
+        self.assertEqual(len(ipfs_objects), len(json_objects))
+        for ipfs_hash, json_object in zip(ipfs_hashes, json_objects):
+            self.assertDictEqual(ipfs_objects[ipfs_hash], json_object)
+
+        self.assertEqual(prefetcher.stats['fetched'], fetched + len(json_objects))
+        self.assertEqual(prefetcher.stats['failed'], failed + 1)
+        self.assertDictEqual(prefetcher.fetch([]), {})
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RelationalDbConfig(AppConfig):
     name = 'tradingdb.relationaldb'
+
+    def ready(self):
+        from .journal import connect_journal
+        connect_journal()
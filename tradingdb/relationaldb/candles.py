@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from django.utils import timezone
+
+from . import models
+from .entity_cache import delete_entity, get_entity, save_entity
+from .journal import record_created, record_instance
+
+RESOLUTIONS = [resolution for resolution, _ in models.PriceCandle.resolutions]
+
+
+def get_candle_start(date_time: datetime, resolution: int) -> datetime:
+    """
+    :return: start of the candle of `resolution` seconds containing `date_time`, candles are aligned to the epoch
+    """
+    if timezone.is_naive(date_time):
+        date_time = timezone.make_aware(date_time)
+    timestamp = int(date_time.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % resolution, timezone.utc)
+
+
+def update_price_candles(order: models.Order):
+    """
+    Adds a new buy or sell order to the candles of every outcome of its market, creating them if needed, with
+    one upsert per resolution. The previous values returned by the upserts are recorded in the active journal.
+    Orders must be added in chain order, the price of the order becomes the close price
+    """
+    for resolution in RESOLUTIONS:
+        start_date_time = get_candle_start(order.creation_date_time, resolution)
+        prices = {}
+        for outcome_index, price in enumerate(order.marginal_prices):
+            volume = order.outcome_token_count if outcome_index == order.outcome_token.index else 0
+            prices[outcome_index] = (price, volume)
+
+        created = []
+        for (pk, outcome_index, *previous_values) in models.PriceCandle.objects.add_prices(
+                order.market_id, resolution, start_date_time, prices):
+            candle = models.PriceCandle(id=pk, market_id=order.market_id, resolution=resolution,
+                                        outcome_index=outcome_index, start_date_time=start_date_time)
+            if previous_values[0] is None:
+                created.append(candle)
+            else:
+                (candle.open, candle.high, candle.low, candle.close, candle.volume,
+                 candle.trades) = previous_values
+                record_instance(candle)
+        record_created(created)
+
+
+def build_price_candles(orders: Iterable[tuple]) -> Dict[int, List]:
+    """
+    :param orders: tuples (marginal_prices, outcome_token_index, outcome_token_count) of the orders of one candle
+    period, in chain order
+    :return: dictionary outcome index -> [open, high, low, close, volume, trades]
+    """
+    candles = {}
+    for marginal_prices, outcome_token_index, outcome_token_count in orders:
+        for outcome_index, price in enumerate(marginal_prices):
+            volume = outcome_token_count if outcome_index == outcome_token_index else Decimal(0)
+            candle = candles.get(outcome_index)
+            if candle is None:
+                candles[outcome_index] = [price, price, price, price, volume, 1]
+            else:
+                candle[1] = max(candle[1], price)
+                candle[2] = min(candle[2], price)
+                candle[3] = price
+                candle[4] += volume
+                candle[5] += 1
+    return candles
+
+
+def rebuild_price_candles(market_id: str, date_time: datetime):
+    """
+    Builds again the candles of the market containing `date_time` from the buy and sell orders left. Used when an
+    order is rolled back, the high and low prices can't be restored removing only that order
+    """
+    for resolution in RESOLUTIONS:
+        start_date_time = get_candle_start(date_time, resolution)
+        orders = models.Order.objects.filter(
+            order_type__in=('BUY', 'SELL'),
+            market=market_id,
+            creation_date_time__gte=start_date_time,
+            creation_date_time__lt=start_date_time + timedelta(seconds=resolution),
+        ).order_by('creation_block', 'id').values_list('marginal_prices', 'outcome_token__index',
+                                                       'outcome_token_count')
+        values = build_price_candles(orders)
+
+        candle_ids = models.PriceCandle.objects.filter(market=market_id, resolution=resolution,
+                                                       start_date_time=start_date_time).values_list('pk', flat=True)
+        for candle_id in candle_ids:
+            candle = get_entity(models.PriceCandle, pk=candle_id)
+            if candle.outcome_index not in values:
+                delete_entity(candle)
+            else:
+                (candle.open, candle.high, candle.low, candle.close, candle.volume,
+                 candle.trades) = values[candle.outcome_index]
+                save_entity(candle)
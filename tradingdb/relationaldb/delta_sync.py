@@ -0,0 +1,162 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django_eth_events.models import Daemon
+
+from . import models
+
+ROLLBACK_STATE_ID = 1
+
+_local = threading.local()
+
+# Models with a `last_modified_block` column, stamped by the event serializers
+BLOCK_MODIFIED_MODELS = (models.Market, models.CentralizedOracle, models.OutcomeTokenBalance,
+                         models.TournamentParticipant, models.Order)
+
+# Key of the tombstones of every model -> field attname, rows are identified as clients identify them in the API
+TOMBSTONE_KEYS = {
+    models.Market: {'address': 'address'},
+    models.CentralizedOracle: {'address': 'address'},
+    models.TournamentParticipant: {'address': 'address'},
+    models.OutcomeTokenBalance: {'owner': 'owner', 'outcome_token': 'outcome_token_id'},
+    # Orders of a transaction are always rolled back together
+    models.Order: {'transaction_hash': 'transaction_hash'},
+}
+
+
+def get_tombstone_key(model, values: Dict) -> Dict:
+    """
+    :param values: dictionary attname -> value of the row
+    :return: tombstone key of the row
+    """
+    return {key: values[attname] for key, attname in TOMBSTONE_KEYS[model].items()}
+
+
+def add_tombstones(model, rows: Iterable[Dict], block_number: Optional[int]):
+    """
+    Records the rows of `model` deleted rolling back `block_number`. Nothing is recorded for models without
+    tombstones or if the block is not known
+    :param rows: dictionaries attname -> value of the deleted rows
+    """
+    # Orders are loaded as `BuyOrder`/`SellOrder`/`ShortSellOrder` proxies
+    model = model._meta.concrete_model
+    if block_number is None or model not in TOMBSTONE_KEYS:
+        return
+    keys = []
+    for row in rows:
+        key = get_tombstone_key(model, row)
+        if key not in keys:
+            keys.append(key)
+    block_number = get_change_block(block_number)
+    models.Tombstone.objects.bulk_create([models.Tombstone(block_number=block_number, model=model._meta.label_lower,
+                                                           key=key) for key in keys])
+
+
+def add_instance_tombstone(instance, block_number: Optional[int]):
+    """Records a row deleted rolling back `block_number`, it must be called before deleting it"""
+    model = instance._meta.concrete_model
+    if model in TOMBSTONE_KEYS:
+        add_tombstones(model, [{attname: getattr(instance, attname) for attname in TOMBSTONE_KEYS[model].values()}],
+                       block_number)
+
+
+def add_queryset_tombstones(queryset, block_number: Optional[int]):
+    """Records the rows of the queryset deleted rolling back `block_number`, it must be called before deleting them"""
+    model = queryset.model._meta.concrete_model
+    if model in TOMBSTONE_KEYS:
+        add_tombstones(model, queryset.values(*TOMBSTONE_KEYS[model].values()), block_number)
+
+
+def get_tombstones(model, since_block: int) -> List[Dict]:
+    """
+    :return: keys of the rows of `model` deleted by the rollbacks stamped after `since_block`
+    """
+    return list(models.Tombstone.objects.filter(
+        model=model._meta.label_lower,
+        block_number__gt=since_block
+    ).order_by('id').values_list('key', flat=True))
+
+
+def count_rollback(block_number: Optional[int] = None):
+    """
+    Counts a rolled back log and raises the change block above the last block processed and `block_number`, so
+    the rows restored or deleted by the rollback, and the ones saved again for the same blocks, are stamped after
+    any block a client may have synced. It must be called in the transaction of the rollback
+    :param block_number: block rolled back, if known
+    """
+    last_block_number = max(Daemon.get_solo().block_number, block_number or 0)
+    models.RollbackState.objects.get_or_create(pk=ROLLBACK_STATE_ID)
+    models.RollbackState.objects.filter(pk=ROLLBACK_STATE_ID).update(
+        rollbacks=F('rollbacks') + 1,
+        change_block=Greatest(F('change_block'), Value(last_block_number + 1)),
+    )
+    end_block_stamping()
+
+
+def get_rollback_count() -> int:
+    """
+    :return: number of logs rolled back, data stored for the same block number changes when it moves
+    """
+    return models.RollbackState.objects.filter(pk=ROLLBACK_STATE_ID).values_list('rollbacks', flat=True).first() or 0
+
+
+def load_change_block() -> int:
+    """
+    :return: lowest block changes are stamped with, raised by the rollbacks
+    """
+    return models.RollbackState.objects.filter(pk=ROLLBACK_STATE_ID).values_list('change_block',
+                                                                                 flat=True).first() or 0
+
+
+def get_change_block(block_number: Optional[int]) -> Optional[int]:
+    """
+    :return: block to stamp a change of `block_number` with, never lower than the change block raised by the
+    rollbacks. Clients use the last block processed as `since_block`, so a rollback can't hide changes from them
+    """
+    if block_number is None:
+        return None
+    if getattr(_local, 'stamping', False):
+        if _local.change_block is None:
+            _local.change_block = load_change_block()
+        change_block = _local.change_block
+    else:
+        change_block = load_change_block()
+    return max(block_number, change_block)
+
+
+def get_next_change_block() -> int:
+    """
+    :return: block to stamp the rows changed out of the event listener with (like the scoreboard), the one after
+    the last block processed. Clients that already synced the last block processed get them
+    """
+    return get_change_block(Daemon.get_solo().block_number + 1)
+
+
+@contextmanager
+def block_stamping(block_key):
+    """
+    Keeps the change block loaded between the logs of the same block saved one by one, like `block_unit_of_work`
+    keeps the rows. It is loaded again when the block changes, on errors, on rollbacks and calling
+    `end_block_stamping`
+    :param block_key: hashable identifying the block
+    """
+    if getattr(_local, 'stamping_key', None) != block_key:
+        _local.stamping_key = block_key
+        _local.change_block = None
+    _local.stamping = True
+    try:
+        yield
+    except Exception:
+        end_block_stamping()
+        raise
+    finally:
+        _local.stamping = False
+
+
+def end_block_stamping():
+    """Forgets the change block kept by `block_stamping`"""
+    _local.stamping_key = None
+    _local.change_block = None
@@ -0,0 +1,401 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import deepcopy
+
+from celery.utils.log import get_task_logger
+from django.db import connection, transaction
+from django.db.models import Case, ExpressionWrapper, F, Value, When
+from django.db.models.functions import Cast
+
+from . import models
+from .delta_sync import get_change_block
+from .journal import get_active_journal, record_instance
+
+logger = get_task_logger(__name__)
+
+# Models loaded and updated many times while ingesting the logs of a block
+CACHED_MODELS = (models.Market, models.MarketSummary, models.Event, models.OutcomeToken, models.OutcomeTokenBalance,
+                 models.PriceCandle)
+
+# Fields only changed adding deltas with `increment_entity`/`update_counters`, they are always written
+# as `field = field + delta` so concurrent writers don't lose updates
+COUNTER_FIELDS = {
+    models.Market: ('collected_fees', 'withdrawn_fees', 'trading_volume'),
+    models.MarketSummary: ('trading_volume',),
+    models.Event: ('redeemed_winnings',),
+    models.OutcomeToken: ('total_supply',),
+    models.OutcomeTokenBalance: ('balance',),
+    models.TournamentParticipantBalance: ('balance',),
+}
+
+_local = threading.local()
+
+
+class EntityCache:
+    """
+    Identity map for the rows mutated by the event serializers. Every row is loaded only once, updates are kept
+    in memory and counter deltas are added up. When the cache is flushed only the changed fields of dirty rows
+    and the deltas are written, with only one `UPDATE` per model, counters as `field = field + delta`. New rows
+    and deletions go to the database straight away
+    """
+
+    def __init__(self):
+        self._entities = {}  # (model, lookup) -> instance
+        self._originals = {}  # (model, pk) -> {attname: value} when loaded or last flushed
+        self._dirty = OrderedDict()  # (model, pk) -> instance
+        self._deltas = OrderedDict()  # (model, pk) -> {field: delta}
+
+    @staticmethod
+    def _normalize_lookup(model, lookup):
+        normalized = {}
+        for name, value in lookup.items():
+            if name == model._meta.pk.name:
+                name = 'pk'
+            elif '__' not in name and name != 'pk':
+                field = model._meta.get_field(name)
+                if field.is_relation:
+                    name = field.attname
+                    value = getattr(value, 'pk', value)
+            normalized[name] = value
+        return tuple(sorted(normalized.items()))
+
+    @staticmethod
+    def _written_fields(model):
+        counter_fields = COUNTER_FIELDS.get(model, ())
+        return [field for field in model._meta.concrete_fields
+                if not field.primary_key and field.name not in counter_fields]
+
+    def _snapshot(self, instance):
+        model = instance.__class__
+        self._originals[(model, instance.pk)] = {
+            field.attname: deepcopy(getattr(instance, field.attname)) for field in self._written_fields(model)
+        }
+
+    def _changed_fields(self, instance):
+        """
+        :return: attnames of the fields changed since the row was loaded or flushed, every written field if the
+        row was not loaded by the cache
+        """
+        model = instance.__class__
+        original = self._originals.get((model, instance.pk))
+        return {field.attname for field in self._written_fields(model)
+                if original is None or getattr(instance, field.attname) != original[field.attname]}
+
+    def _store(self, instance, lookup=None, snapshot=True):
+        model = instance.__class__
+        pk_key = (model, (('pk', instance.pk),))
+        # Keep only one instance per row
+        cached = self._entities.setdefault(pk_key, instance)
+        if cached is instance and snapshot and (model, instance.pk) not in self._originals:
+            self._snapshot(instance)
+        if lookup:
+            self._entities[(model, lookup)] = cached
+        return cached
+
+    def get(self, model, **lookup):
+        key = self._normalize_lookup(model, lookup)
+        instance = self._entities.get((model, key))
+        if instance is None:
+            instance = self._store(model.objects.get(**dict(key)), key)
+        return instance
+
+    def peek(self, model, **lookup):
+        """
+        :return: instance if it's already loaded, `None` otherwise
+        """
+        return self._entities.get((model, self._normalize_lookup(model, lookup)))
+
+    def add(self, instance):
+        return self._store(instance)
+
+    def save(self, instance):
+        # Rows not loaded by the cache may have been changed already, all their fields are written
+        self._dirty[(instance.__class__, instance.pk)] = self._store(instance, snapshot=False)
+
+    def increment(self, instance, deltas):
+        row_deltas = self._deltas.setdefault((instance.__class__, instance.pk), {})
+        for field_name, delta in deltas.items():
+            row_deltas[field_name] = row_deltas.get(field_name, 0) + delta
+
+    def delete(self, instance):
+        model = instance.__class__
+        self._dirty.pop((model, instance.pk), None)
+        self._deltas.pop((model, instance.pk), None)
+        self._originals.pop((model, instance.pk), None)
+        for key in [key for key, cached in self._entities.items() if cached is instance]:
+            del self._entities[key]
+        instance.delete()
+
+    def flush(self):
+        dirty_by_model = OrderedDict()
+        for (model, pk), instance in self._dirty.items():
+            changed_fields = self._changed_fields(instance)
+            if changed_fields:
+                dirty_by_model.setdefault(model, OrderedDict())[pk] = (instance, changed_fields)
+        deltas_by_model = OrderedDict()
+        for (model, pk), row_deltas in self._deltas.items():
+            deltas_by_model.setdefault(model, OrderedDict())[pk] = row_deltas
+
+        for model in OrderedDict.fromkeys(list(dirty_by_model) + list(deltas_by_model)):
+            self._update(model, dirty_by_model.get(model, {}), deltas_by_model.get(model, {}))
+        for instance in self._dirty.values():
+            self._snapshot(instance)
+        self._dirty.clear()
+        self._deltas.clear()
+
+    @staticmethod
+    def _update(model, instances, deltas):
+        """
+        Writes the changed fields of the dirty rows and adds the counter deltas of a model with only one
+        `UPDATE`, every changed column gets the value of its rows with a `CASE` like `bulk_update` does
+        :param instances: dictionary pk -> (dirty instance, attnames of its changed fields)
+        :param deltas: dictionary pk -> {field: delta}
+        """
+        updates = {}
+        for field in EntityCache._written_fields(model):
+            whens = [When(pk=pk, then=Value(getattr(instance, field.attname), output_field=field))
+                     for pk, (instance, changed_fields) in instances.items() if field.attname in changed_fields]
+            if whens:
+                case = Case(*whens, default=F(field.attname), output_field=field)
+                if connection.features.requires_casted_case_in_updates:
+                    case = Cast(case, output_field=field)
+                updates[field.attname] = case
+
+        field_names = {field_name for row_deltas in deltas.values() for field_name in row_deltas}
+        for field_name in field_names:
+            field = model._meta.get_field(field_name)
+            updates[field_name] = Case(*[When(pk=pk, then=ExpressionWrapper(F(field_name) +
+                                                                             Value(row_deltas[field_name]),
+                                                                             output_field=field))
+                                         for pk, row_deltas in deltas.items() if field_name in row_deltas],
+                                       default=F(field_name), output_field=field)
+        model.objects.filter(pk__in=list(OrderedDict.fromkeys(list(instances) + list(deltas)))).update(**updates)
+
+    def clear(self):
+        """Flushes the dirty rows and forgets every loaded row, so they are loaded again from database"""
+        self.flush()
+        self._entities.clear()
+        self._originals.clear()
+
+
+def get_active_cache():
+    return getattr(_local, 'cache', None)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Runs the block inside a transaction with an active `EntityCache`, flushing it at the end.
+    Nested calls reuse the outer cache
+    """
+    cache = get_active_cache()
+    if cache:
+        yield cache
+        return
+
+    with transaction.atomic():
+        cache = EntityCache()
+        _local.cache = cache
+        try:
+            yield cache
+            cache.flush()
+        finally:
+            _local.cache = None
+
+
+@contextmanager
+def block_unit_of_work(block_key):
+    """
+    `unit_of_work` for the logs of a block saved one by one, like the event listener does. The `EntityCache` is kept
+    between calls with the same `block_key`, so every row is loaded only once per block. Changes are flushed at
+    the end of every call as the caller may commit after any of them. Loaded rows are forgotten when the block
+    changes, on errors and calling `end_block_unit_of_work`
+    :param block_key: hashable identifying the block, a plain `unit_of_work` is used if `None`
+    """
+    if block_key is None or get_active_cache():
+        with unit_of_work() as cache:
+            yield cache
+        return
+
+    cache = getattr(_local, 'block_cache', None)
+    if cache is None or _local.block_key != block_key:
+        cache = EntityCache()
+        _local.block_cache = cache
+        _local.block_key = block_key
+
+    with transaction.atomic():
+        _local.cache = cache
+        try:
+            yield cache
+            cache.flush()
+        except Exception:
+            # Rows in memory may not match the database after the transaction is rolled back
+            end_block_unit_of_work()
+            raise
+        finally:
+            _local.cache = None
+
+
+def end_block_unit_of_work():
+    """Forgets the rows kept by `block_unit_of_work`, they are loaded again from database"""
+    _local.block_cache = None
+    _local.block_key = None
+
+
+def get_entity(model, **lookup):
+    """
+    Loads a row from the active cache if any, from the database otherwise.
+    Rows are loaded to be changed, so their current state is recorded in the active journal if any
+    """
+    cache = get_active_cache()
+    if cache and model in CACHED_MODELS:
+        instance = cache.get(model, **lookup)
+    else:
+        instance = model.objects.get(**lookup)
+    record_instance(instance)
+    return instance
+
+
+def add_entity(instance):
+    """Registers an already saved row in the active cache if any"""
+    cache = get_active_cache()
+    if cache and instance.__class__ in CACHED_MODELS:
+        return cache.add(instance)
+    return instance
+
+
+def save_entity(instance, block_number: int = None, **deltas):
+    """
+    Marks the row as dirty in the active cache if any, saves it otherwise. Counter fields are not written,
+    `deltas` are added to them like `increment_entity` does but in the same `UPDATE` that saves the row
+    :param block_number: block the row is changed in, stored as `last_modified_block` if provided
+    """
+    if block_number is not None:
+        instance.last_modified_block = get_change_block(block_number)
+    model = instance.__class__
+    cache = get_active_cache()
+    if cache and model in CACHED_MODELS:
+        cache.save(instance)
+        if deltas:
+            increment_entity(instance, **deltas)
+    elif model in COUNTER_FIELDS:
+        update_fields = [field.name for field in model._meta.concrete_fields
+                         if not field.primary_key and field.name not in COUNTER_FIELDS[model]]
+        values = {field_name: getattr(instance, field_name) + delta for field_name, delta in deltas.items()}
+        for field_name, delta in deltas.items():
+            setattr(instance, field_name, F(field_name) + delta)
+        try:
+            instance.save(update_fields=update_fields + list(deltas))
+        finally:
+            for field_name, value in values.items():
+                setattr(instance, field_name, value)
+    else:
+        instance.save()
+        if deltas:
+            increment_entity(instance, **deltas)
+    return instance
+
+
+def increment_entity(instance, **deltas):
+    """
+    Adds `deltas` to the counter fields of a loaded row, in memory and in database with only one
+    `UPDATE ... SET field = field + delta` (added up in the active cache if any)
+    """
+    cache = get_active_cache()
+    if cache and instance.__class__ in CACHED_MODELS:
+        instance = cache.add(instance)
+    record_instance(instance)
+    for field_name, delta in deltas.items():
+        setattr(instance, field_name, getattr(instance, field_name) + delta)
+
+    if cache and instance.__class__ in CACHED_MODELS:
+        cache.increment(instance, deltas)
+    else:
+        instance.__class__.objects.filter(pk=instance.pk).update(**{field_name: F(field_name) + delta
+                                                                    for field_name, delta in deltas.items()})
+    return instance
+
+
+def update_counters(model, lookup, block_number: int = None, **deltas) -> int:
+    """
+    Adds `deltas` to the counter fields of the row matching `lookup`. If there is no active cache or journal the
+    row is not loaded, only one `UPDATE ... SET field = field + delta` is executed
+    :param block_number: block the row is changed in, stored as `last_modified_block` if provided
+    :return: number of rows updated
+    """
+    if (get_active_cache() and model in CACHED_MODELS) or get_active_journal():
+        try:
+            instance = get_entity(model, **lookup)
+        except model.DoesNotExist:
+            logger.warning('Cannot update counters %s of %s %s, it does not exist', deltas, model.__name__, lookup)
+            return 0
+        touch_entity(increment_entity(instance, **deltas), block_number)
+        return 1
+    updates = {field_name: F(field_name) + delta for field_name, delta in deltas.items()}
+    if block_number is not None:
+        updates['last_modified_block'] = get_change_block(block_number)
+    updated = model.objects.filter(**lookup).update(**updates)
+    if not updated:
+        logger.warning('Cannot update counters %s of %s %s, it does not exist', deltas, model.__name__, lookup)
+    return updated
+
+
+def touch_entity(instance, block_number: int = None):
+    """
+    Stores `block_number` as the `last_modified_block` of the row, so clients syncing the changes since a
+    block get it. Only the stamp is written (as a dirty row in the active cache if any)
+    """
+    if block_number is None:
+        return instance
+
+    block_number = get_change_block(block_number)
+    model = instance.__class__
+    cache = get_active_cache()
+    if cache and model in CACHED_MODELS:
+        instance = cache.add(instance)
+    record_instance(instance)
+    instance.last_modified_block = block_number
+    if cache and model in CACHED_MODELS:
+        cache.save(instance)
+    else:
+        model.objects.filter(pk=instance.pk).update(last_modified_block=block_number)
+    return instance
+
+
+def add_outcome_token_balance(owner: str, outcome_token_id: str, amount: int,
+                              block_number: int = None) -> models.OutcomeTokenBalance:
+    """
+    Adds `amount` to an outcome token balance, creating it if needed. Balances already loaded in the active cache
+    are incremented there, otherwise an upsert is executed without loading the row
+    :param block_number: block the balance is changed in, stored as `last_modified_block` if provided
+    :return: outcome token balance
+    """
+    block_number = get_change_block(block_number)
+    cache = get_active_cache()
+    if cache:
+        outcome_token_balance = cache.peek(models.OutcomeTokenBalance, owner=owner, outcome_token=outcome_token_id)
+        if outcome_token_balance:
+            return touch_entity(increment_entity(outcome_token_balance, balance=amount), block_number)
+
+    pk, balance, created = models.OutcomeTokenBalance.objects.add_balance(owner, outcome_token_id, amount,
+                                                                          block_number)
+    journal = get_active_journal()
+    if journal:
+        # The previous `last_modified_block` is not needed, reverted rows are stamped again
+        if created:
+            journal.record_created([models.OutcomeTokenBalance(id=pk, owner=owner, outcome_token_id=outcome_token_id,
+                                                               balance=balance)])
+        else:
+            journal.record(models.OutcomeTokenBalance(id=pk, owner=owner, outcome_token_id=outcome_token_id,
+                                                      balance=balance - amount))
+    return models.OutcomeTokenBalance(id=pk, owner=owner, outcome_token_id=outcome_token_id, balance=balance,
+                                      last_modified_block=block_number)
+
+
+def delete_entity(instance):
+    cache = get_active_cache()
+    if cache and instance.__class__ in CACHED_MODELS:
+        cache.delete(instance)
+    else:
+        instance.delete()
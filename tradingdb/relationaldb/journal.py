@@ -0,0 +1,319 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterable
+
+from celery.utils.log import get_task_logger
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from . import models
+from .delta_sync import (BLOCK_MODIFIED_MODELS, add_queryset_tombstones,
+                         get_change_block)
+
+logger = get_task_logger(__name__)
+
+# Models changed when ingesting logs (subclasses included). Event descriptions are not journaled, they are
+# content addressed and don't depend on the chain
+JOURNALED_MODELS = (models.Oracle, models.Event, models.OutcomeToken, models.OutcomeTokenBalance, models.Market,
+                    models.MarketSummary, models.Order, models.PriceCandle, models.TournamentParticipant,
+                    models.TournamentParticipantBalance)
+
+# Columns written by other processes (scoreboard, tournament token issuance), reverted blocks don't restore them
+UNJOURNALED_FIELDS = {
+    models.TournamentParticipant: ('current_rank', 'past_rank', 'diff_rank', 'score', 'predicted_profit',
+                                   'predictions', 'tokens_issued'),
+}
+
+# Field (attname) with the tournament participant whose scoreboard values depend on the row, participants of
+# reverted rows are marked as dirty
+PARTICIPANT_FIELDS = {
+    models.OutcomeTokenBalance: 'owner',
+    models.Order: 'sender',
+    models.TournamentParticipant: 'address',
+    models.TournamentParticipantBalance: 'participant_id',
+}
+
+_local = threading.local()
+
+
+def is_journaled(model) -> bool:
+    return issubclass(model, JOURNALED_MODELS)
+
+
+def snapshot(instance) -> dict:
+    """
+    :return: json serializable dictionary with the concrete fields of the instance
+    """
+    data = {}
+    for field in instance._meta.concrete_fields:
+        value = field.value_from_object(instance)
+        if value is not None and not isinstance(value, (bool, int, float, str)):
+            value = field.value_to_string(instance)
+        data[field.attname] = value
+    return data
+
+
+def restore(model, data: dict):
+    """
+    :return: unsaved instance built from a `snapshot`
+    """
+    return model(**{field.attname: field.to_python(data[field.attname])
+                    for field in model._meta.concrete_fields if field.attname in data})
+
+
+class BlockJournal:
+    """
+    Records the state of every row before it is first changed in a block, or that it was created in the block.
+    Replaying the journal of a block in reverse restores the database without running any serializer logic.
+    Rows recorded more than once for the same block are harmless, the first entry is the one restored
+    """
+
+    def __init__(self):
+        self.block_number = None
+        self._recorded = set()  # (model label, object id) recorded for the current block
+        self._entries = []
+        self._blocks = set()
+        self._flushed_blocks = set()  # Blocks already stored as `JournaledBlock`
+
+    def start_block(self, block_number: int):
+        if block_number != self.block_number:
+            self.block_number = block_number
+            self._recorded = set()
+
+    def _record(self, model, pk, data_getter):
+        if self.block_number is None or pk is None or not is_journaled(model):
+            return
+        key = (model._meta.label_lower, str(pk))
+        if key not in self._recorded:
+            self._recorded.add(key)
+            self._blocks.add(self.block_number)
+            self._entries.append(models.JournalEntry(block_number=self.block_number, model=key[0],
+                                                     object_id=key[1], data=data_getter()))
+
+    def record(self, instance):
+        """Records the current (unchanged) state of the instance"""
+        self._record(instance.__class__, instance.pk, lambda: snapshot(instance))
+
+    def record_from_database(self, model, pk):
+        """Records the state stored in database, for instances already changed in memory"""
+        def data_getter():
+            instance = model.objects.filter(pk=pk).first()
+            return snapshot(instance) if instance else None
+        self._record(model, pk, data_getter)
+
+    def record_created(self, instances: Iterable):
+        for instance in instances:
+            self._record(instance.__class__, instance.pk, lambda: None)
+
+    def flush(self):
+        """
+        Writes the entries recorded since the last flush. Blocks are stored and the journal is pruned only once per
+        block, the journal is flushed after every log when the logs of a block are saved one by one
+        """
+        if self._entries:
+            models.JournalEntry.objects.bulk_create(self._entries)
+            self._entries = []
+        new_blocks = self._blocks - self._flushed_blocks
+        for block_number in sorted(new_blocks):
+            models.JournaledBlock.objects.update_or_create(block_number=block_number, defaults={'reverted': False})
+        if new_blocks:
+            prune_journal(max(new_blocks) - settings.ETH_BACKUP_BLOCKS)
+            self._flushed_blocks |= new_blocks
+        self._blocks = set()
+
+
+def get_active_journal():
+    return getattr(_local, 'journal', None)
+
+
+@contextmanager
+def journaling(block_number: int = None):
+    """
+    Runs the block inside a transaction with an active `BlockJournal`, writing the entries at the end.
+    Nested calls reuse the outer journal, switching it to `block_number` if provided
+    """
+    journal = get_active_journal()
+    if journal:
+        if block_number is not None:
+            journal.start_block(block_number)
+        yield journal
+        return
+
+    with transaction.atomic():
+        journal = BlockJournal()
+        if block_number is not None:
+            journal.start_block(block_number)
+        _local.journal = journal
+        try:
+            yield journal
+            journal.flush()
+        finally:
+            _local.journal = None
+
+
+@contextmanager
+def block_journaling(block_number: int, block_hash=None):
+    """
+    `journaling` for the logs of a block saved one by one. The `BlockJournal` is kept between calls for the same
+    block, so every row is recorded only once per block. Entries are written at the end of every call. The journal
+    is forgotten when the block changes, on errors and calling `end_block_journaling`
+    :param block_number: block the changes belong to, a plain `journaling` is used if `None`
+    :param block_hash: hash of the block, so a block replaced by a reorg gets a new journal
+    """
+    if block_number is None or get_active_journal():
+        with journaling(block_number) as journal:
+            yield journal
+        return
+
+    journal = getattr(_local, 'block_journal', None)
+    if journal is None or _local.block_journal_key != (block_number, block_hash):
+        journal = BlockJournal()
+        journal.start_block(block_number)
+        _local.block_journal = journal
+        _local.block_journal_key = (block_number, block_hash)
+
+    with transaction.atomic():
+        _local.journal = journal
+        try:
+            yield journal
+            journal.flush()
+        except Exception:
+            end_block_journaling()
+            raise
+        finally:
+            _local.journal = None
+
+
+def end_block_journaling():
+    """Forgets the journal kept by `block_journaling`"""
+    _local.block_journal = None
+    _local.block_journal_key = None
+
+
+def record_instance(instance):
+    journal = get_active_journal()
+    if journal:
+        journal.record(instance)
+
+
+def record_created(instances: Iterable):
+    """Records rows created without triggering `post_save` (e.g. `bulk_create`)"""
+    journal = get_active_journal()
+    if journal:
+        journal.record_created(instances)
+
+
+def _journal_pre_save(sender, instance, raw, **kwargs):
+    journal = get_active_journal()
+    if journal and not raw and not instance._state.adding:
+        journal.record_from_database(sender, instance.pk)
+
+
+def _journal_post_save(sender, instance, created, raw, **kwargs):
+    journal = get_active_journal()
+    if journal and created and not raw:
+        journal.record_created([instance])
+
+
+def _journal_pre_delete(sender, instance, **kwargs):
+    record_instance(instance)
+
+
+def connect_journal():
+    """
+    Connects the signals recording the rows changed with `save` and `delete`, only for the journaled models so the
+    rest of models keep their fast deletes
+    """
+    for model in apps.get_models():
+        if is_journaled(model):
+            label = model._meta.label_lower
+            pre_save.connect(_journal_pre_save, sender=model, dispatch_uid='journal_pre_save_{}'.format(label))
+            post_save.connect(_journal_post_save, sender=model, dispatch_uid='journal_post_save_{}'.format(label))
+            pre_delete.connect(_journal_pre_delete, sender=model, dispatch_uid='journal_pre_delete_{}'.format(label))
+
+
+def revert_block(block_number: int) -> bool:
+    """
+    Restores the database to the state before `block_number` replaying the journal of that block and the
+    following ones, in only one transaction. Blocks are marked as reverted, so calling it again for the same
+    block does nothing. Restored rows are stamped with `get_change_block` as `last_modified_block` and deleted rows
+    leave tombstones. Columns in `UNJOURNALED_FIELDS` keep their current value. Tournament participants of the
+    reverted rows are marked as dirty, so the incremental scoreboard recalculates them
+    :return: `True` if the block was journaled and is now reverted, `False` if it must be reverted using the
+    serializers
+    """
+    journaled_block = models.JournaledBlock.objects.filter(block_number=block_number).first()
+    if not journaled_block:
+        return False
+    if journaled_block.reverted:
+        return True
+
+    with transaction.atomic():
+        change_block = get_change_block(block_number)
+        # Restore the first state recorded for every row
+        first_entries = OrderedDict()
+        for entry in models.JournalEntry.objects.filter(block_number__gte=block_number).order_by('id').iterator():
+            first_entries.setdefault((entry.model, entry.object_id), entry)
+
+        to_delete = OrderedDict()  # model -> [pk]
+        to_restore = OrderedDict()  # model -> {pk: data}
+        participants = set()
+        for (label, object_id), entry in first_entries.items():
+            model = apps.get_model(label)
+            pk = model._meta.pk.to_python(object_id)
+            participant_field = PARTICIPANT_FIELDS.get(model._meta.concrete_model)
+            if participant_field and entry.data:
+                participants.add(entry.data.get(participant_field))
+            if entry.data is None:
+                to_delete.setdefault(model, []).append(pk)
+            elif model in BLOCK_MODIFIED_MODELS:
+                # Restored rows changed for the clients that got the reverted blocks
+                to_restore.setdefault(model, OrderedDict())[pk] = dict(entry.data, last_modified_block=change_block)
+            else:
+                to_restore.setdefault(model, OrderedDict())[pk] = entry.data
+
+        for model, pks in reversed(list(to_delete.items())):
+            queryset = model.objects.filter(pk__in=pks)
+            participant_field = PARTICIPANT_FIELDS.get(model._meta.concrete_model)
+            if participant_field:
+                participants.update(queryset.values_list(participant_field, flat=True))
+            add_queryset_tombstones(queryset, block_number)
+            queryset.delete()
+
+        for model, rows in to_restore.items():
+            # Parent rows of a multi-table inheritance child are restored with the child
+            pks = [pk for pk in rows
+                   if not any(issubclass(other, model) and other is not model and pk in other_rows
+                              for other, other_rows in to_restore.items())]
+            existing = set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+            instances = [restore(model, rows[pk]) for pk in pks if pk in existing]
+            if instances:
+                unjournaled_fields = UNJOURNALED_FIELDS.get(model._meta.concrete_model, ())
+                fields = [field.name for field in model._meta.concrete_fields
+                          if not field.primary_key and field.name not in unjournaled_fields]
+                model.objects.bulk_update(instances, fields)
+            for pk in pks:
+                if pk not in existing:
+                    restore(model, rows[pk]).save(force_insert=True)
+
+        participants.discard(None)
+        if participants:
+            models.DirtyTournamentParticipant.objects.mark(
+                models.TournamentParticipant.objects.filter(address__in=participants), timezone.now())
+
+        models.JournaledBlock.objects.filter(block_number__gte=block_number).update(reverted=True)
+        models.JournalEntry.objects.filter(block_number__gte=block_number).delete()
+
+    logger.info('Block %d reverted from journal: %d rows deleted, %d rows restored', block_number,
+                sum(len(pks) for pks in to_delete.values()), sum(len(rows) for rows in to_restore.values()))
+    return True
+
+
+def prune_journal(block_number: int):
+    """Removes the journal of the blocks older than `block_number`, they can not be reverted anymore"""
+    models.JournalEntry.objects.filter(block_number__lt=block_number).delete()
+    models.JournaledBlock.objects.filter(block_number__lt=block_number).delete()
@@ -1,6 +1,8 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
-from ...models import (EventDescription, TournamentParticipant,
+from ...models import (EventDescription, JournaledBlock, JournalEntry,
+                       Tombstone, TournamentParticipant,
                        TournamentParticipantBalance,
                        TournamentWhitelistedCreator)
 
@@ -9,8 +11,14 @@ class Command(BaseCommand):
     help = 'Cleans the Relational Database'
 
     def handle(self, *args, **options):
+        # Keep event descriptions in the local IPFS cache so resyncs don't need to fetch them again
+        call_command('warm_ipfs_cache')
         EventDescription.objects.all().delete()
         TournamentParticipant.objects.all().delete()
         TournamentParticipantBalance.objects.all().delete()
         TournamentWhitelistedCreator.objects.all().delete()
+        # Journal and tombstones refer to rows that don't exist anymore
+        JournalEntry.objects.all().delete()
+        JournaledBlock.objects.all().delete()
+        Tombstone.objects.all().delete()
         self.stdout.write(self.style.SUCCESS('DB Successfully cleaned'))
@@ -0,0 +1,73 @@
+from django.core.exceptions import ObjectDoesNotExist
+
+from . import models
+from .entity_cache import (add_entity, get_entity, increment_entity,
+                           save_entity)
+
+
+def build_market_summary(market: models.Market) -> models.MarketSummary:
+    """
+    :return: unsaved summary with the current fields of the market, its event, oracle and event description
+    """
+    event = market.event
+    oracle = event.oracle
+    summary = models.MarketSummary(market=market,
+                                   creation_date_time=market.creation_date_time,
+                                   creation_block=market.creation_block,
+                                   creator=market.creator,
+                                   market_maker=market.market_maker,
+                                   stage=market.stage,
+                                   marginal_prices=market.marginal_prices,
+                                   trading_volume=market.trading_volume,
+                                   event=event.address,
+                                   event_type='CATEGORICAL' if event.is_categorical() else 'SCALAR',
+                                   collateral_token=event.collateral_token.lower(),
+                                   oracle=oracle.address,
+                                   oracle_factory=oracle.factory,
+                                   oracle_creator=oracle.creator,
+                                   oracle_creation_date_time=oracle.creation_date_time,
+                                   oracle_is_outcome_set=oracle.is_outcome_set)
+    try:
+        event_description = oracle.centralizedoracle.event_description
+    except ObjectDoesNotExist:
+        event_description = None
+    if event_description:
+        summary.title = event_description.title
+        summary.resolution_date = event_description.resolution_date
+        if event_description.description_type == 'CATEGORICAL':
+            summary.outcomes = event_description.get_subclass_instance().outcomes
+    return summary
+
+
+def create_market_summary(market: models.Market) -> models.MarketSummary:
+    summary = build_market_summary(market)
+    summary.save(force_insert=True)
+    return add_entity(summary)
+
+
+def update_market_summary(market: models.Market, *field_names, **deltas) -> models.MarketSummary:
+    """
+    Copies `field_names` from the market to its summary and adds `deltas` to the summary counters.
+    Summaries missing (e.g. markets created by fixtures) are created from the current market
+    """
+    try:
+        summary = get_entity(models.MarketSummary, market=market.pk)
+    except models.MarketSummary.DoesNotExist:
+        return create_market_summary(market)
+
+    if field_names:
+        for field_name in field_names:
+            setattr(summary, field_name, getattr(market, field_name))
+        save_entity(summary, **deltas)
+    elif deltas:
+        increment_entity(summary, **deltas)
+    return summary
+
+
+def update_oracle_market_summaries(oracle: models.Oracle):
+    """Copies the outcome of the oracle to the summaries of its markets"""
+    summary_ids = models.MarketSummary.objects.filter(oracle=oracle.address).values_list('pk', flat=True)
+    for summary_id in summary_ids:
+        summary = get_entity(models.MarketSummary, pk=summary_id)
+        summary.oracle_is_outcome_set = oracle.is_outcome_set
+        save_entity(summary)
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.13 on 2026-10-18 09:12
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0011_order_transaction_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournaledBlock',
+            fields=[
+                ('block_number', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('reverted', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.PositiveIntegerField(db_index=True)),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.CharField(max_length=100)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.13 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicated_balances(apps, schema_editor):
+    """Balances created twice for the same owner and outcome token are merged into the oldest one"""
+    OutcomeTokenBalance = apps.get_model('relationaldb', 'OutcomeTokenBalance')
+    duplicates = OutcomeTokenBalance.objects.values('owner', 'outcome_token').annotate(
+        count=Count('id'), first_id=Min('id'), total=Sum('balance')
+    ).filter(count__gt=1)
+    for duplicate in duplicates:
+        OutcomeTokenBalance.objects.filter(id=duplicate['first_id']).update(balance=duplicate['total'])
+        OutcomeTokenBalance.objects.filter(owner=duplicate['owner'],
+                                           outcome_token=duplicate['outcome_token']
+                                           ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0012_journal'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicated_balances, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='outcometokenbalance',
+            constraint=models.UniqueConstraint(fields=('owner', 'outcome_token'), name='unique_owner_outcome_token'),
+        ),
+        migrations.AddIndex(
+            model_name='outcometokenbalance',
+            index=models.Index(condition=models.Q(balance__gt=0), fields=['owner', 'outcome_token'],
+                               name='positive_balance_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 2.2.13 on 2026-10-18 14:05
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_market_summaries(apps, schema_editor):
+    Market = apps.get_model('relationaldb', 'Market')
+    MarketSummary = apps.get_model('relationaldb', 'MarketSummary')
+    CategoricalEvent = apps.get_model('relationaldb', 'CategoricalEvent')
+    CentralizedOracle = apps.get_model('relationaldb', 'CentralizedOracle')
+    CategoricalEventDescription = apps.get_model('relationaldb', 'CategoricalEventDescription')
+
+    categorical_events = set(CategoricalEvent.objects.values_list('address', flat=True))
+    outcomes = dict(CategoricalEventDescription.objects.values_list('eventdescription_ptr_id', 'outcomes'))
+    event_descriptions = {
+        centralized_oracle.address: centralized_oracle.event_description
+        for centralized_oracle in CentralizedOracle.objects.select_related('event_description')
+    }
+
+    summaries = []
+    for market in Market.objects.select_related('event', 'event__oracle').iterator():
+        event = market.event
+        oracle = event.oracle
+        event_description = event_descriptions.get(oracle.address)
+        summaries.append(MarketSummary(
+            market=market,
+            creation_date_time=market.creation_date_time,
+            creation_block=market.creation_block,
+            creator=market.creator,
+            market_maker=market.market_maker,
+            stage=market.stage,
+            marginal_prices=market.marginal_prices,
+            trading_volume=market.trading_volume,
+            event=event.address,
+            event_type='CATEGORICAL' if event.address in categorical_events else 'SCALAR',
+            collateral_token=event.collateral_token.lower(),
+            oracle=oracle.address,
+            oracle_factory=oracle.factory,
+            oracle_creator=oracle.creator,
+            oracle_creation_date_time=oracle.creation_date_time,
+            oracle_is_outcome_set=oracle.is_outcome_set,
+            title=event_description.title if event_description else None,
+            outcomes=outcomes.get(event_description.id) if event_description else None,
+            resolution_date=event_description.resolution_date if event_description else None,
+        ))
+    MarketSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0013_outcometokenbalance_unique_owner_outcome_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketSummary',
+            fields=[
+                ('market', models.OneToOneField(db_column='market_address', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='relationaldb.Market')),
+                ('creation_date_time', models.DateTimeField()),
+                ('creation_block', models.PositiveIntegerField()),
+                ('creator', models.CharField(db_index=True, max_length=40)),
+                ('market_maker', models.CharField(db_index=True, max_length=40)),
+                ('stage', models.PositiveIntegerField(choices=[(0, 'MarketCreated'), (1, 'MarketFunded'), (2, 'MarketClosed')], default=0)),
+                ('marginal_prices', django.contrib.postgres.fields.ArrayField(base_field=models.DecimalField(decimal_places=4, max_digits=5), size=None)),
+                ('trading_volume', models.DecimalField(decimal_places=0, default=0, max_digits=80)),
+                ('event', models.CharField(max_length=40)),
+                ('event_type', models.CharField(choices=[('CATEGORICAL', 'CATEGORICAL'), ('SCALAR', 'SCALAR')], max_length=11)),
+                ('collateral_token', models.CharField(db_index=True, max_length=40)),
+                ('oracle', models.CharField(db_index=True, max_length=40)),
+                ('oracle_factory', models.CharField(db_index=True, max_length=40)),
+                ('oracle_creator', models.CharField(db_index=True, max_length=40)),
+                ('oracle_creation_date_time', models.DateTimeField(db_index=True)),
+                ('oracle_is_outcome_set', models.BooleanField(default=False)),
+                ('title', models.TextField(null=True)),
+                ('outcomes', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), null=True, size=None)),
+                ('resolution_date', models.DateTimeField(db_index=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='marketsummary',
+            index=models.Index(fields=['creation_date_time', 'market'], name='market_summary_creation_idx'),
+        ),
+        migrations.RunPython(create_market_summaries, migrations.RunPython.noop),
+    ]
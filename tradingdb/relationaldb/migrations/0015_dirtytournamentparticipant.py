@@ -0,0 +1,21 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0014_marketsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyTournamentParticipant',
+            fields=[
+                ('participant', models.OneToOneField(db_column='participant_address', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='relationaldb.TournamentParticipant', to_field='address')),
+                ('marked', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
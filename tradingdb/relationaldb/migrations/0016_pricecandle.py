@@ -0,0 +1,68 @@
+# Generated by Django 2.2.13 on 2026-10-18 16:05
+
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def create_price_candles(apps, schema_editor):
+    Order = apps.get_model('relationaldb', 'Order')
+    PriceCandle = apps.get_model('relationaldb', 'PriceCandle')
+
+    orders = Order.objects.filter(
+        Q(buyorder__isnull=False) | Q(sellorder__isnull=False)
+    ).order_by('creation_block', 'id').values_list('market', 'creation_date_time', 'marginal_prices',
+                                                   'outcome_token__index', 'outcome_token_count')
+    candles = {}  # (market, resolution, outcome index, start) -> candle
+    for market, date_time, marginal_prices, outcome_token_index, outcome_token_count in orders.iterator():
+        timestamp = int(date_time.timestamp())
+        for resolution in (60, 3600, 86400):
+            start_date_time = datetime.fromtimestamp(timestamp - timestamp % resolution, timezone.utc)
+            for outcome_index, price in enumerate(marginal_prices):
+                volume = outcome_token_count if outcome_index == outcome_token_index else 0
+                key = (market, resolution, outcome_index, start_date_time)
+                candle = candles.get(key)
+                if candle is None:
+                    candles[key] = PriceCandle(market_id=market, resolution=resolution, outcome_index=outcome_index,
+                                               start_date_time=start_date_time, open=price, high=price, low=price,
+                                               close=price, volume=volume, trades=1)
+                else:
+                    candle.high = max(candle.high, price)
+                    candle.low = min(candle.low, price)
+                    candle.close = price
+                    candle.volume += volume
+                    candle.trades += 1
+    PriceCandle.objects.bulk_create(candles.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0015_dirtytournamentparticipant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceCandle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('outcome_index', models.PositiveIntegerField()),
+                ('resolution', models.PositiveIntegerField(choices=[(60, '1m'), (3600, '1h'), (86400, '1d')])),
+                ('start_date_time', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('high', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('low', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('close', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('volume', models.DecimalField(decimal_places=0, default=0, max_digits=80)),
+                ('trades', models.PositiveIntegerField(default=0)),
+                ('market', models.ForeignKey(db_column='market_address', on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='relationaldb.Market')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pricecandle',
+            constraint=models.UniqueConstraint(fields=('market', 'resolution', 'start_date_time', 'outcome_index'), name='unique_market_price_candle'),
+        ),
+        migrations.RunPython(create_price_candles, migrations.RunPython.noop),
+    ]
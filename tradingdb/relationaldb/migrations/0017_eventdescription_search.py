@@ -0,0 +1,42 @@
+# Generated by Django 2.2.13 on 2026-10-18 16:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def update_search_vectors(apps, schema_editor):
+    EventDescription = apps.get_model('relationaldb', 'EventDescription')
+    EventDescription.objects.update(search_vector=(SearchVector('title', weight='A', config='english') +
+                                                   SearchVector('description', weight='B', config='english')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0016_pricecandle'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='eventdescription',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(update_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='eventdescription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_desc_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventdescription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='event_desc_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='eventdescription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description'], name='event_desc_desc_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,155 @@
+# Generated by Django 2.2.13 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+COPY_ORDERS_SQL = """
+-- Foreign keys are checked now, so the tables can be altered later in the same transaction
+SET CONSTRAINTS ALL IMMEDIATE;
+
+UPDATE relationaldb_order o SET order_type = 'BUY', cost = b.cost, outcome_token_cost = b.outcome_token_cost,
+    fees = b.fees
+FROM relationaldb_buyorder b WHERE b.order_ptr_id = o.id;
+
+UPDATE relationaldb_order o SET order_type = 'SELL', profit = s.profit, outcome_token_profit = s.outcome_token_profit,
+    fees = s.fees
+FROM relationaldb_sellorder s WHERE s.order_ptr_id = o.id;
+
+UPDATE relationaldb_order o SET order_type = 'SHORT SELL', cost = s.cost
+FROM relationaldb_shortsellorder s WHERE s.order_ptr_id = o.id;
+
+-- Orders without child row were served as UNKNOWN, they keep being served the same way
+UPDATE relationaldb_order SET order_type = 'UNKNOWN' WHERE order_type IS NULL;
+"""
+
+REVERSE_COPY_ORDERS_SQL = """
+INSERT INTO relationaldb_buyorder (order_ptr_id, cost, outcome_token_cost, fees)
+SELECT id, cost, outcome_token_cost, fees FROM relationaldb_order WHERE order_type = 'BUY';
+
+INSERT INTO relationaldb_sellorder (order_ptr_id, profit, outcome_token_profit, fees)
+SELECT id, profit, outcome_token_profit, fees FROM relationaldb_order WHERE order_type = 'SELL';
+
+INSERT INTO relationaldb_shortsellorder (order_ptr_id, cost)
+SELECT id, cost FROM relationaldb_order WHERE order_type = 'SHORT SELL';
+"""
+
+
+# Journal labels of the order child models -> order type
+JOURNALED_ORDER_TYPES = {
+    'relationaldb.buyorder': 'BUY',
+    'relationaldb.sellorder': 'SELL',
+    'relationaldb.shortsellorder': 'SHORT SELL',
+}
+
+
+def convert_journal(apps, schema_editor):
+    """
+    Converts the journal entries of the buy, sell and short sell child rows to entries of the single order table
+    with their type, so the blocks still in the journal can be reverted
+    """
+    JournalEntry = apps.get_model('relationaldb', 'JournalEntry')
+    Order = apps.get_model('relationaldb', 'Order')
+    for entry in JournalEntry.objects.filter(model__in=JOURNALED_ORDER_TYPES).order_by('id').iterator():
+        # Child entries have the parent columns too, the parent entries of the same row and block are redundant
+        JournalEntry.objects.filter(model='relationaldb.order', block_number=entry.block_number,
+                                    object_id=entry.object_id).delete()
+        if entry.data is not None:
+            entry.data.pop('order_ptr_id', None)
+            entry.data['order_type'] = JOURNALED_ORDER_TYPES[entry.model]
+        entry.model = 'relationaldb.order'
+        entry.save(update_fields=['model', 'data'])
+
+    # Orders journaled without child row get the type they were copied with
+    for entry in JournalEntry.objects.filter(model='relationaldb.order').order_by('id').iterator():
+        if entry.data is not None and 'order_type' not in entry.data:
+            entry.data['order_type'] = Order.objects.filter(pk=entry.object_id).values_list(
+                'order_type', flat=True).first() or 'UNKNOWN'
+            entry.save(update_fields=['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0017_eventdescription_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='order_type',
+            field=models.CharField(choices=[('BUY', 'BUY'), ('SELL', 'SELL'), ('SHORT SELL', 'SHORT SELL'), ('UNKNOWN', 'UNKNOWN')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cost',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='outcome_token_cost',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='profit',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='outcome_token_profit',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='fees',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.RunSQL(COPY_ORDERS_SQL, REVERSE_COPY_ORDERS_SQL),
+        migrations.RunPython(convert_journal, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='BuyOrder',
+        ),
+        migrations.DeleteModel(
+            name='SellOrder',
+        ),
+        migrations.DeleteModel(
+            name='ShortSellOrder',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_type',
+            field=models.CharField(choices=[('BUY', 'BUY'), ('SELL', 'SELL'), ('SHORT SELL', 'SHORT SELL'), ('UNKNOWN', 'UNKNOWN')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='BuyOrder',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('relationaldb.order',),
+        ),
+        migrations.CreateModel(
+            name='SellOrder',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('relationaldb.order',),
+        ),
+        migrations.CreateModel(
+            name='ShortSellOrder',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('relationaldb.order',),
+        ),
+    ]
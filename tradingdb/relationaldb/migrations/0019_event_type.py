@@ -0,0 +1,38 @@
+# Generated by Django 2.2.13 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+SET_TYPES_SQL = """
+UPDATE relationaldb_event e SET event_type = 'CATEGORICAL'
+FROM relationaldb_categoricalevent c WHERE c.event_ptr_id = e.address;
+
+UPDATE relationaldb_event e SET event_type = 'SCALAR'
+FROM relationaldb_scalarevent s WHERE s.event_ptr_id = e.address;
+
+UPDATE relationaldb_eventdescription d SET description_type = 'CATEGORICAL'
+FROM relationaldb_categoricaleventdescription c WHERE c.eventdescription_ptr_id = d.id;
+
+UPDATE relationaldb_eventdescription d SET description_type = 'SCALAR'
+FROM relationaldb_scalareventdescription s WHERE s.eventdescription_ptr_id = d.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0018_single_table_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='event_type',
+            field=models.CharField(choices=[('CATEGORICAL', 'CATEGORICAL'), ('SCALAR', 'SCALAR')], max_length=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventdescription',
+            name='description_type',
+            field=models.CharField(choices=[('CATEGORICAL', 'CATEGORICAL'), ('SCALAR', 'SCALAR')], max_length=11, null=True),
+        ),
+        migrations.RunSQL(SET_TYPES_SQL, migrations.RunSQL.noop),
+    ]
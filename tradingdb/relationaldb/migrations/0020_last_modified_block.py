@@ -0,0 +1,62 @@
+# Generated by Django 2.2.13 on 2026-10-18 18:20
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+from django.db.models import F
+
+# Rows changed before the column existed get their creation block, clients start with a full sync anyway
+UPDATE_BALANCES_SQL = """
+UPDATE relationaldb_outcometokenbalance b SET last_modified_block = e.creation_block
+FROM relationaldb_outcometoken t JOIN relationaldb_event e ON e.address = t.event_address
+WHERE t.address = b.outcome_token_address;
+"""
+
+
+def update_last_modified_blocks(apps, schema_editor):
+    for model_name in ('Market', 'CentralizedOracle', 'TournamentParticipant'):
+        apps.get_model('relationaldb', model_name).objects.update(last_modified_block=F('creation_block'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0019_event_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.PositiveIntegerField()),
+                ('model', models.CharField(max_length=100)),
+                ('key', django.contrib.postgres.fields.jsonb.JSONField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'block_number'], name='tombstone_model_block_idx'),
+        ),
+        migrations.AddField(
+            model_name='centralizedoracle',
+            name='last_modified_block',
+            field=models.PositiveIntegerField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='market',
+            name='last_modified_block',
+            field=models.PositiveIntegerField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outcometokenbalance',
+            name='last_modified_block',
+            field=models.PositiveIntegerField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tournamentparticipant',
+            name='last_modified_block',
+            field=models.PositiveIntegerField(db_index=True, null=True),
+        ),
+        migrations.RunPython(update_last_modified_blocks, migrations.RunPython.noop),
+        migrations.RunSQL(UPDATE_BALANCES_SQL, migrations.RunSQL.noop),
+    ]
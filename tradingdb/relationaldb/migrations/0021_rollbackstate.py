@@ -0,0 +1,20 @@
+# Generated by Django 2.2.13 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0020_last_modified_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollbackState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rollbacks', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.13 on 2026-10-18 23:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def update_last_modified_blocks(apps, schema_editor):
+    apps.get_model('relationaldb', 'Order').objects.update(last_modified_block=F('creation_block'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0021_rollbackstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollbackstate',
+            name='change_block',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='last_modified_block',
+            field=models.PositiveIntegerField(db_index=True, null=True),
+        ),
+        migrations.RunPython(update_last_modified_blocks, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,12 @@
-from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.db import connection, models
 from model_utils.models import TimeStampedModel
 
 
@@ -7,6 +14,8 @@ from model_utils.models import TimeStampedModel
 ADDRESS_LENGTH: int = 40
 # Ethereum transactions have 64 chars (without 0x)
 TRANSACTION_LENGTH: int = 64
+# Text search configuration of the event description search vectors and queries
+SEARCH_CONFIG: str = 'english'
 
 # ==================================
 #       Abstract model classes
@@ -22,6 +31,14 @@ class BlockTimeStamped(models.Model):
         abstract = True
 
 
+class BlockModified(models.Model):
+    """Model listed by the block of its last change, so clients only fetch the rows changed since a block"""
+    last_modified_block = models.PositiveIntegerField(null=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
 class Contract(models.Model):
     """Represents the Ethereum smart contract instance"""
     address = models.CharField(max_length=ADDRESS_LENGTH, primary_key=True)
@@ -61,7 +78,15 @@ class Oracle(ContractCreatedByFactory):
 
 # Events
 class Event(ContractCreatedByFactory):
-    """Parent class of the event's classes."""
+    """Parent class of the event's classes. `event_type` tells which subclass the event is"""
+    event_types = (
+        ('CATEGORICAL', 'CATEGORICAL'),
+        ('SCALAR', 'SCALAR'),
+    )
+    # Set by the subclasses, so their instances are saved with their type
+    subclass_event_type = None
+
+    event_type = models.CharField(max_length=11, choices=event_types, null=True)  # null for plain events
     oracle = models.ForeignKey(Oracle,
                                related_name='event_oracle',
                                db_column='oracle_address',
@@ -78,16 +103,32 @@ class Event(ContractCreatedByFactory):
         else:
             return base
 
+    def save(self, *args, **kwargs):
+        if self.subclass_event_type:
+            self.event_type = self.subclass_event_type
+        super().save(*args, **kwargs)
+
     def is_categorical(self):
-        return hasattr(self, 'categoricalevent')
+        return self.event_type == 'CATEGORICAL'
 
     def is_scalar(self):
-        return hasattr(self, 'scalarevent')
+        return self.event_type == 'SCALAR'
+
+    def get_subclass_instance(self):
+        """
+        :return: `CategoricalEvent` or `ScalarEvent` instance of the event picked using `event_type`, the event
+        itself if it's already one or it's a plain event
+        """
+        if self.subclass_event_type or not self.event_type:
+            return self
+        return self.categoricalevent if self.is_categorical() else self.scalarevent
 
 
 class ScalarEvent(Event):
     """Events with continuous domain of possible outcomes
     between two boundaries: lower and upper bound"""
+    subclass_event_type = 'SCALAR'
+
     lower_bound = models.DecimalField(max_digits=80, decimal_places=0)
     upper_bound = models.DecimalField(max_digits=80, decimal_places=0)
 
@@ -98,7 +139,7 @@ class ScalarEvent(Event):
 
 class CategoricalEvent(Event):
     """Events with discrete domain of possible outcomes"""
-    pass
+    subclass_event_type = 'CATEGORICAL'
 
 
 # Tokens
@@ -124,7 +165,34 @@ class OutcomeToken(Contract):
                                                            self.total_supply)
 
 
-class OutcomeTokenBalance(models.Model):
+class OutcomeTokenBalanceManager(models.Manager):
+    def add_balance(self, owner: str, outcome_token_id: str, amount: int,
+                    block_number: int = None) -> Tuple[int, Decimal, bool]:
+        """
+        Adds `amount` to the balance of the owner, creating it if it doesn't exist, with only one
+        `INSERT ... ON CONFLICT DO UPDATE`
+        :param block_number: block the balance is changed in, stored as `last_modified_block` if provided
+        :return: tuple (id, balance, created)
+        """
+        opts = self.model._meta
+        query = ('INSERT INTO {table} ({owner}, {outcome_token}, {balance}, {last_modified_block}) '
+                 'VALUES (%s, %s, %s, %s) '
+                 'ON CONFLICT ({owner}, {outcome_token}) '
+                 'DO UPDATE SET {balance} = {table}.{balance} + EXCLUDED.{balance}, '
+                 '{last_modified_block} = COALESCE(EXCLUDED.{last_modified_block}, {table}.{last_modified_block}) '
+                 'RETURNING {id}, {balance}, (xmax = 0)').format(
+            table=connection.ops.quote_name(opts.db_table),
+            owner=opts.get_field('owner').column,
+            outcome_token=opts.get_field('outcome_token').column,
+            balance=opts.get_field('balance').column,
+            last_modified_block=opts.get_field('last_modified_block').column,
+            id=opts.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(query, [owner, outcome_token_id, amount, block_number])
+            return cursor.fetchone()
+
+
+class OutcomeTokenBalance(BlockModified):
     """Outcome token balance owned by an ethereum address owner"""
     owner = models.CharField(max_length=ADDRESS_LENGTH)
     outcome_token = models.ForeignKey(OutcomeToken,
@@ -132,18 +200,86 @@ class OutcomeTokenBalance(models.Model):
                                       on_delete=models.CASCADE)
     balance = models.DecimalField(max_digits=80, decimal_places=0, default=0)
 
+    objects = OutcomeTokenBalanceManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'outcome_token'], name='unique_owner_outcome_token'),
+        ]
+        indexes = [
+            # Most balances are zero once outcome tokens are sold or redeemed
+            models.Index(fields=['owner', 'outcome_token'], condition=models.Q(balance__gt=0),
+                         name='positive_balance_owner_idx'),
+        ]
+
     def __str__(self):
         return 'Owner {} with balance {}'.format(self.owner,
                                                  self.balance)
 
 
 # Event Descriptions
+class EventDescriptionQuerySet(models.QuerySet):
+    def matching(self, text: str):
+        """
+        Full text search on the title and description, titles containing `text` also match so words being typed
+        are found. Both conditions use GIN indexes
+        """
+        return self.filter(models.Q(search_vector=SearchQuery(text, config=SEARCH_CONFIG)) |
+                           models.Q(title__icontains=text))
+
+    def search(self, text: str):
+        """
+        :return: descriptions `matching` the text annotated with `rank`, best first
+        """
+        return self.matching(text).annotate(
+            rank=SearchRank(models.F('search_vector'), SearchQuery(text, config=SEARCH_CONFIG))
+        ).order_by('-rank', 'pk')
+
+
 class EventDescription(models.Model):
-    """Meta information of the event taken from IPFS"""
+    """Meta information of the event taken from IPFS. `description_type` tells which subclass the description is"""
+    # Set by the subclasses, so their instances are saved with their type
+    subclass_description_type = None
+
+    description_type = models.CharField(max_length=11, choices=Event.event_types, null=True)
     title = models.TextField()
     description = models.TextField()
     resolution_date = models.DateTimeField()
     ipfs_hash = models.CharField(max_length=46, unique=True)
+    # Title (weight A) and description (weight B) lexemes, set by `save`
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = EventDescriptionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='event_desc_search_idx'),
+            # Substring (LIKE/ILIKE) filters
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='event_desc_title_trgm_idx'),
+            GinIndex(fields=['description'], opclasses=['gin_trgm_ops'],
+                     name='event_desc_desc_trgm_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.subclass_description_type:
+            self.description_type = self.subclass_description_type
+        super().save(*args, **kwargs)
+        # Built by the database, with the same configuration used by the search queries
+        EventDescription.objects.filter(pk=self.pk).update(
+            search_vector=(SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+                           SearchVector('description', weight='B', config=SEARCH_CONFIG))
+        )
+
+    def get_subclass_instance(self):
+        """
+        :return: `CategoricalEventDescription` or `ScalarEventDescription` instance picked using `description_type`,
+        the description itself if it's already one or it's a plain description
+        """
+        if self.subclass_description_type or not self.description_type:
+            return self
+        if self.description_type == 'CATEGORICAL':
+            return self.categoricaleventdescription
+        return self.scalareventdescription
 
     def __str__(self):
         return '{} - {} - {}'.format(self.resolution_date,
@@ -153,6 +289,8 @@ class EventDescription(models.Model):
 
 class ScalarEventDescription(EventDescription):
     """Description for the Scalar Event"""
+    subclass_description_type = 'SCALAR'
+
     unit = models.TextField()  # Example. USD, EUR, ETH
     decimals = models.PositiveIntegerField()  # the unit precision
 
@@ -163,6 +301,8 @@ class ScalarEventDescription(EventDescription):
 
 class CategoricalEventDescription(EventDescription):
     """Description for the Categorical Event"""
+    subclass_description_type = 'CATEGORICAL'
+
     outcomes = ArrayField(models.TextField())  # List of outcomes
 
     def __str__(self):
@@ -171,7 +311,7 @@ class CategoricalEventDescription(EventDescription):
 
 
 # Oracles
-class CentralizedOracle(Oracle):
+class CentralizedOracle(Oracle, BlockModified):
     """Centralized oracle model"""
     owner = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)  # owner can be updated
     old_owner = models.CharField(max_length=ADDRESS_LENGTH, default=None, null=True)  # useful for rollback
@@ -186,7 +326,7 @@ class CentralizedOracle(Oracle):
 
 
 # Market
-class Market(ContractCreatedByFactory):
+class Market(ContractCreatedByFactory, BlockModified):
     """Market created by a the Gnosis standard market factory"""
     stages = (
         (0, 'MarketCreated'),
@@ -218,8 +358,66 @@ class Market(ContractCreatedByFactory):
                                        self.stages_dict.get(self.stage, 'INVALID STAGE'))
 
 
-class Order(BlockTimeStamped):
-    """Parent class defining a market related order"""
+class MarketSummary(models.Model):
+    """
+    Flat copy of the market, event, oracle and event description fields used to list and filter markets.
+    It's kept in sync by the event serializers, so markets are filtered and sorted without joining 8 tables
+    """
+    event_types = (
+        ('CATEGORICAL', 'CATEGORICAL'),
+        ('SCALAR', 'SCALAR'),
+    )
+
+    market = models.OneToOneField(Market,
+                                  primary_key=True,
+                                  related_name='summary',
+                                  db_column='market_address',
+                                  on_delete=models.CASCADE)
+    creation_date_time = models.DateTimeField()
+    creation_block = models.PositiveIntegerField()
+    creator = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)
+    market_maker = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)
+    stage = models.PositiveIntegerField(choices=Market.stages, default=0)
+    marginal_prices = ArrayField(models.DecimalField(max_digits=5, decimal_places=4))
+    trading_volume = models.DecimalField(max_digits=80, decimal_places=0, default=0)
+    event = models.CharField(max_length=ADDRESS_LENGTH)
+    event_type = models.CharField(max_length=11, choices=event_types)
+    collateral_token = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)  # lower case
+    oracle = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)
+    oracle_factory = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)
+    oracle_creator = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)
+    oracle_creation_date_time = models.DateTimeField(db_index=True)
+    oracle_is_outcome_set = models.BooleanField(default=False)
+    title = models.TextField(null=True)
+    outcomes = ArrayField(models.TextField(), null=True)  # Only for categorical events
+    resolution_date = models.DateTimeField(null=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Default ordering of the market list
+            models.Index(fields=['creation_date_time', 'market'], name='market_summary_creation_idx'),
+        ]
+
+    def __str__(self):
+        return 'Market summary {} - {}'.format(self.market_id, self.title)
+
+
+class Order(BlockTimeStamped, BlockModified):
+    """
+    Market related order. Buy, sell and short sell orders are stored in the same table, `order_type` tells them
+    apart and the fields of the other types are null
+    """
+    order_types = (
+        ('BUY', 'BUY'),
+        ('SELL', 'SELL'),
+        ('SHORT SELL', 'SHORT SELL'),
+        # Orders stored before the types shared the table, without buy, sell or short sell row
+        ('UNKNOWN', 'UNKNOWN'),
+    )
+    # Set by the proxy models, so their instances are saved with their type
+    proxy_order_type = None
+
+    order_type = models.CharField(max_length=10, choices=order_types)
     market = models.ForeignKey(Market,
                                related_name='orders',
                                db_column='market_address',
@@ -237,15 +435,38 @@ class Order(BlockTimeStamped):
     # represents the marginal price of each outcome at the time of the market order
     marginal_prices = ArrayField(models.DecimalField(max_digits=5, decimal_places=4))
     transaction_hash = models.CharField(max_length=TRANSACTION_LENGTH, default='')
+    # buy and short sell orders
+    cost = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    # buy orders
+    outcome_token_cost = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    # sell orders
+    profit = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    outcome_token_profit = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    # buy and sell orders
+    fees = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+
+    def save(self, *args, **kwargs):
+        if self.proxy_order_type:
+            self.order_type = self.proxy_order_type
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return 'Sender {} - Market {}'.format(self.sender, self.market_id)
 
 
+class OrderTypeManager(models.Manager):
+    """Returns only the orders of the `proxy_order_type` of the model"""
+    def get_queryset(self):
+        return super().get_queryset().filter(order_type=self.model.proxy_order_type)
+
+
 class BuyOrder(Order):
-    cost = models.DecimalField(max_digits=80, decimal_places=0)
-    outcome_token_cost = models.DecimalField(max_digits=80, decimal_places=0)
-    fees = models.DecimalField(max_digits=80, decimal_places=0)
+    proxy_order_type = 'BUY'
+
+    objects = OrderTypeManager()
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         base = super().__str__()
@@ -255,9 +476,12 @@ class BuyOrder(Order):
 
 
 class SellOrder(Order):
-    profit = models.DecimalField(max_digits=80, decimal_places=0)
-    outcome_token_profit = models.DecimalField(max_digits=80, decimal_places=0)
-    fees = models.DecimalField(max_digits=80, decimal_places=0)
+    proxy_order_type = 'SELL'
+
+    objects = OrderTypeManager()
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         base = super().__str__()
@@ -267,17 +491,104 @@ class SellOrder(Order):
 
 
 class ShortSellOrder(Order):
-    cost = models.DecimalField(max_digits=80, decimal_places=0)
+    proxy_order_type = 'SHORT SELL'
+
+    objects = OrderTypeManager()
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         base = super().__str__()
         return '{} - Cost {}'.format(base, self.cost)
 
 
+class PriceCandleManager(models.Manager):
+    def add_prices(self, market_id: str, resolution: int, start_date_time: datetime,
+                   prices: Dict[int, Tuple[Decimal, Decimal]]) -> List[tuple]:
+        """
+        Adds the prices of an order to the candles of a market period, creating the missing ones, with only one
+        `INSERT ... ON CONFLICT DO UPDATE`. High and low prices are kept with `GREATEST` and `LEAST`, the price
+        of the order becomes the close price
+        :param prices: dictionary outcome index -> (price, volume)
+        :return: list of tuples (id, outcome_index, open, high, low, close, volume, trades) with the values of
+        every candle before adding the prices, values are `None` for the created candles
+        """
+        opts = self.model._meta
+        columns = {name: opts.get_field(name).column
+                   for name in ('market', 'resolution', 'start_date_time', 'outcome_index', 'open', 'high', 'low',
+                                'close', 'volume', 'trades')}
+        # The `previous` snapshot is taken before the insert, both run in the same statement
+        query = ('WITH previous AS (SELECT {id}, {open}, {high}, {low}, {close}, {volume}, {trades} FROM {table} '
+                 'WHERE {market} = %s AND {resolution} = %s AND {start_date_time} = %s), '
+                 'upserted AS (INSERT INTO {table} ({market}, {resolution}, {start_date_time}, {outcome_index}, '
+                 '{open}, {high}, {low}, {close}, {volume}, {trades}) VALUES {values} '
+                 'ON CONFLICT ({market}, {resolution}, {start_date_time}, {outcome_index}) '
+                 'DO UPDATE SET {high} = GREATEST({table}.{high}, EXCLUDED.{high}), '
+                 '{low} = LEAST({table}.{low}, EXCLUDED.{low}), {close} = EXCLUDED.{close}, '
+                 '{volume} = {table}.{volume} + EXCLUDED.{volume}, {trades} = {table}.{trades} + 1 '
+                 'RETURNING {id}, {outcome_index}) '
+                 'SELECT upserted.{id}, upserted.{outcome_index}, previous.{open}, previous.{high}, previous.{low}, '
+                 'previous.{close}, previous.{volume}, previous.{trades} '
+                 'FROM upserted LEFT JOIN previous ON previous.{id} = upserted.{id}').format(
+            table=connection.ops.quote_name(opts.db_table),
+            id=opts.pk.column,
+            values=', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s, 1)'] * len(prices)),
+            **columns)
+        params = [market_id, resolution, start_date_time]
+        for outcome_index, (price, volume) in prices.items():
+            params += [market_id, resolution, start_date_time, outcome_index, price, price, price, price, volume]
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+
+class PriceCandle(models.Model):
+    """
+    Open, high, low and close marginal price of a market outcome during a period of `resolution` seconds,
+    built from the buy and sell orders of the market
+    """
+    resolutions = (
+        (60, '1m'),
+        (3600, '1h'),
+        (86400, '1d'),
+    )
+    resolutions_dict = {v: k for k, v in dict(resolutions).items()}
+
+    market = models.ForeignKey(Market,
+                               related_name='candles',
+                               db_column='market_address',
+                               on_delete=models.CASCADE)
+    outcome_index = models.PositiveIntegerField()
+    resolution = models.PositiveIntegerField(choices=resolutions)
+    start_date_time = models.DateTimeField()
+    open = models.DecimalField(max_digits=5, decimal_places=4)
+    high = models.DecimalField(max_digits=5, decimal_places=4)
+    low = models.DecimalField(max_digits=5, decimal_places=4)
+    close = models.DecimalField(max_digits=5, decimal_places=4)
+    # outcome tokens of this outcome bought and sold
+    volume = models.DecimalField(max_digits=80, decimal_places=0, default=0)
+    # orders of the market, every order changes the price of all the outcomes
+    trades = models.PositiveIntegerField(default=0)
+
+    objects = PriceCandleManager()
+
+    class Meta:
+        constraints = [
+            # Also used by the range queries of the candles endpoint
+            models.UniqueConstraint(fields=['market', 'resolution', 'start_date_time', 'outcome_index'],
+                                    name='unique_market_price_candle'),
+        ]
+
+    def __str__(self):
+        return 'Market {} - Outcome {} - {} {}'.format(self.market_id, self.outcome_index,
+                                                       self.get_resolution_display(), self.start_date_time)
+
+
 # ==================================
 #      Tournament classes
 # ==================================
-class TournamentParticipant(Contract, TimeStampedModel, BlockTimeStamped):
+class TournamentParticipant(Contract, TimeStampedModel, BlockTimeStamped, BlockModified):
     """Tournament participant"""
     current_rank = models.IntegerField()  # current rank position
     past_rank = models.IntegerField(default=0)  # previous rank position
@@ -308,6 +619,43 @@ class TournamentParticipantBalance(models.Model):
                                 self.balance)
 
 
+class DirtyTournamentParticipantManager(models.Manager):
+    def mark(self, participants: models.QuerySet, marked: datetime) -> int:
+        """
+        Marks the participants of the queryset as dirty with only one `INSERT ... SELECT ... ON CONFLICT DO UPDATE`,
+        participants already marked get the new `marked` date
+        :return: number of participants marked
+        """
+        opts = self.model._meta
+        participants_query, params = participants.values('address').query.sql_with_params()
+        query = ('INSERT INTO {table} ({participant}, {marked}) '
+                 'SELECT participants.address, %s FROM ({participants_query}) participants '
+                 'ON CONFLICT ({participant}) DO UPDATE SET {marked} = EXCLUDED.{marked}'
+                 ).format(table=connection.ops.quote_name(opts.db_table),
+                          participant=opts.get_field('participant').column,
+                          marked=opts.get_field('marked').column,
+                          participants_query=participants_query)
+        with connection.cursor() as cursor:
+            cursor.execute(query, [marked] + list(params))
+            return cursor.rowcount
+
+
+class DirtyTournamentParticipant(models.Model):
+    """Tournament participant whose scoreboard values changed since they were last calculated"""
+    participant = models.OneToOneField(TournamentParticipant,
+                                       primary_key=True,
+                                       to_field='address',
+                                       db_column='participant_address',
+                                       related_name='+',
+                                       on_delete=models.CASCADE)
+    marked = models.DateTimeField(db_index=True)
+
+    objects = DirtyTournamentParticipantManager()
+
+    def __str__(self):
+        return '{} - {}'.format(self.participant_id, self.marked)
+
+
 class TournamentWhitelistedCreator(models.Model):
     address = models.CharField(max_length=ADDRESS_LENGTH, primary_key=True)
     enabled = models.BooleanField(default=True)
@@ -315,3 +663,92 @@ class TournamentWhitelistedCreator(models.Model):
     def __str__(self):
         return '{} - {}'.format(self.address,
                                 self.enabled)
+
+
+# ==================================
+#       Block journal
+# ==================================
+
+
+class JournaledBlock(models.Model):
+    """Block whose changes were recorded in the journal, `reverted` once the journal was replayed"""
+    block_number = models.PositiveIntegerField(primary_key=True)
+    reverted = models.BooleanField(default=False)
+
+    def __str__(self):
+        return 'Block {}{}'.format(self.block_number, ' (reverted)' if self.reverted else '')
+
+
+class JournalEntry(models.Model):
+    """State of a row before it was first changed in a block, `data` is null if the row was created in the block"""
+    block_number = models.PositiveIntegerField(db_index=True)
+    model = models.CharField(max_length=100)  # model label, e.g. `relationaldb.market`
+    object_id = models.CharField(max_length=100)
+    data = JSONField(null=True)
+
+    def __str__(self):
+        return '{} - {} {}'.format(self.block_number, self.model, self.object_id)
+
+
+# ==================================
+#       Delta sync
+# ==================================
+
+
+class Tombstone(models.Model):
+    """Row deleted rolling back a block, `key` identifies it as the API does, e.g. `{"address": ...}`"""
+    block_number = models.PositiveIntegerField()
+    model = models.CharField(max_length=100)  # model label, e.g. `relationaldb.market`
+    key = JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'block_number'], name='tombstone_model_block_idx'),
+        ]
+
+    def __str__(self):
+        return '{} - {} {}'.format(self.block_number, self.model, self.key)
+
+
+class RollbackState(models.Model):
+    """
+    Only one row, `rollbacks` counts the logs rolled back so data cached before a rollback is not served.
+    Changes are stamped with `change_block` at least, rollbacks raise it above every block clients may have synced
+    """
+    rollbacks = models.PositiveIntegerField(default=0)
+    change_block = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '{} rollbacks'.format(self.rollbacks)
+
+
+class AddressRegistryVersionManager(models.Manager):
+    def increment(self, label: str) -> int:
+        """
+        Increments the version of the registry with only one `INSERT ... ON CONFLICT DO UPDATE`, creating it if
+        it doesn't exist
+        :return: new version
+        """
+        opts = self.model._meta
+        query = ('INSERT INTO {table} ({model}, {version}) VALUES (%s, 1) '
+                 'ON CONFLICT ({model}) DO UPDATE SET {version} = {table}.{version} + 1 '
+                 'RETURNING {version}').format(table=connection.ops.quote_name(opts.db_table),
+                                               model=opts.get_field('model').column,
+                                               version=opts.get_field('version').column)
+        with connection.cursor() as cursor:
+            cursor.execute(query, [label])
+            return cursor.fetchone()[0]
+
+
+class AddressRegistryVersion(models.Model):
+    """
+    Version of the contract addresses of a model watched by the event listener, incremented in the transaction
+    creating or deleting a contract so the processes keeping the addresses in memory load them again
+    """
+    model = models.CharField(max_length=100, unique=True)
+    version = models.PositiveIntegerField(default=0)
+
+    objects = AddressRegistryVersionManager()
+
+    def __str__(self):
+        return '{} - version {}'.format(self.model, self.version)
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.utils import timezone
+
+from . import models
+
+
+def _mark_on_commit(participants):
+    # Marked after commit, so a scoreboard calculated after the mark date always sees the changes
+    transaction.on_commit(lambda: models.DirtyTournamentParticipant.objects.mark(participants, timezone.now()))
+
+
+def mark_participants_dirty(*addresses):
+    """
+    Marks the tournament participants with the given addresses so the incremental scoreboard recalculates them.
+    Addresses that are not participants are ignored
+    """
+    addresses = [address for address in addresses if address]
+    if addresses:
+        _mark_on_commit(models.TournamentParticipant.objects.filter(address__in=addresses))
+
+
+def mark_event_participants_dirty(event_address: str):
+    """Marks the tournament participants holding outcome tokens of the event"""
+    owners = models.OutcomeTokenBalance.objects.filter(outcome_token__event=event_address,
+                                                       balance__gt=0).values('owner')
+    _mark_on_commit(models.TournamentParticipant.objects.filter(address__in=owners))
@@ -13,10 +13,19 @@ from rest_framework.fields import CharField
 from web3 import Web3
 
 from chainevents.abis import abi_file_path, load_json_file
-from gnosis.utils import calc_lmsr_marginal_price
+from gnosis.pricing import (calc_initial_marginal_prices,
+                            calc_lmsr_marginal_prices)
 from ipfs.ipfs import Ipfs
 
 from . import models
+from .candles import rebuild_price_candles, update_price_candles
+from .delta_sync import add_instance_tombstone, get_change_block
+from .entity_cache import (add_entity, add_outcome_token_balance,
+                           delete_entity, get_entity, increment_entity,
+                           save_entity, touch_entity, update_counters)
+from .market_summary import (create_market_summary, update_market_summary,
+                             update_oracle_market_summaries)
+from .scoreboard import mark_event_participants_dirty, mark_participants_dirty
 
 # Ethereum addresses have 40 chars (without 0x)
 ADDRESS_LENGTH = 40
@@ -54,6 +63,13 @@ class BaseEventSerializer(serializers.BaseSerializer):
 
         self.initial_data = self.parse_event_data(kwargs.pop('data'))
 
+    def get_block_number(self):
+        """
+        :return: number of the block of the log, `None` if the serializer didn't get the block
+        """
+        block = getattr(self, 'block', None)
+        return block.get('number') if block else None
+
     def parse_event_data(self, event_data):
         """
         Extract event_data and move event params moved to root object
@@ -133,6 +149,53 @@ class ContractCreatedByFactorySerializerTimestamped(ContractSerializer, BlockTim
         return parsed_event_data
 
 
+def create_event_description(ipfs_hash, event_description_json):
+    """
+    Creates a Categorical or Scalar EventDescription from the IPFS json object
+    :param ipfs_hash: hash of the IPFS object
+    :param event_description_json: IPFS json object
+    :return: EventDescription instance
+    :raise ValidationError
+    """
+    if not isinstance(event_description_json, dict):
+        raise serializers.ValidationError('Invalid json %s' % event_description_json)
+
+    if not event_description_json.get('title'):
+        raise serializers.ValidationError('Missing title field')
+
+    if not event_description_json.get('resolutionDate'):
+        raise serializers.ValidationError('Missing resolution date field')
+
+    if not event_description_json.get('description'):
+        raise serializers.ValidationError('Missing description field')
+
+    if 'outcomes' in event_description_json and type(event_description_json['outcomes']) is list \
+            and len(event_description_json['outcomes']) > 1:
+        categorical_json = {
+            'ipfs_hash': ipfs_hash,
+            'title': event_description_json['title'],
+            'description': event_description_json['description'],
+            'resolution_date': event_description_json['resolutionDate'],
+            'outcomes': event_description_json['outcomes']
+        }
+        # categorical
+        return models.CategoricalEventDescription.objects.create(**categorical_json)
+
+    elif 'decimals' in event_description_json and 'unit' in event_description_json:
+        scalar_json = {
+            'ipfs_hash': ipfs_hash,
+            'title': event_description_json['title'],
+            'description': event_description_json['description'],
+            'resolution_date': event_description_json['resolutionDate'],
+            'decimals': event_description_json['decimals'],
+            'unit': event_description_json['unit']
+        }
+        # scalar
+        return models.ScalarEventDescription.objects.create(**scalar_json)
+    else:
+        raise serializers.ValidationError('Event must be categorical or scalar')
+
+
 # ========================================================
 #                 Custom Fields
 # ========================================================
@@ -161,45 +224,7 @@ class IpfsHashField(CharField):
             except Exception as e:
                 raise serializers.ValidationError('IPFS hash must exist')
 
-            if not isinstance(event_description_json, dict):
-                raise serializers.ValidationError('Invalid json %s' % event_description_json)
-
-            if not event_description_json.get('title'):
-                raise serializers.ValidationError('Missing title field')
-
-            if not event_description_json.get('resolutionDate'):
-                raise serializers.ValidationError('Missing resolution date field')
-
-            if not event_description_json.get('description'):
-                raise serializers.ValidationError('Missing description field')
-
-            if 'outcomes' in event_description_json and type(event_description_json['outcomes']) is list \
-                    and len(event_description_json['outcomes']) > 1:
-                categorical_json = {
-                    'ipfs_hash': data,
-                    'title': event_description_json['title'],
-                    'description': event_description_json['description'],
-                    'resolution_date': event_description_json['resolutionDate'],
-                    'outcomes': event_description_json['outcomes']
-                }
-                # categorical
-                event_description = models.CategoricalEventDescription.objects.create(**categorical_json)
-
-            elif 'decimals' in event_description_json and 'unit' in event_description_json:
-                scalar_json = {
-                    'ipfs_hash': data,
-                    'title': event_description_json['title'],
-                    'description': event_description_json['description'],
-                    'resolution_date': event_description_json['resolutionDate'],
-                    'decimals': event_description_json['decimals'],
-                    'unit': event_description_json['unit']
-                }
-                # scalar
-                event_description = models.ScalarEventDescription.objects.create(**scalar_json)
-            else:
-                raise serializers.ValidationError('Event must be categorical or scalar')
-
-            return event_description
+            return create_event_description(data, event_description_json)
 
 
 class OracleField(CharField):
@@ -263,9 +288,11 @@ class CentralizedOracleSerializer(OracleSerializerTimestamped, serializers.Model
     def create(self, validated_data):
         validated_data['owner'] = validated_data['creator']
         validated_data['old_owner'] = validated_data['owner']
+        validated_data['last_modified_block'] = get_change_block(validated_data['creation_block'])
         return models.CentralizedOracle.objects.create(**validated_data)
 
     def rollback(self):
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
 
 
@@ -299,10 +326,10 @@ class ScalarEventSerializer(EventSerializerTimestamped, serializers.ModelSeriali
         # if so, check its event_description is a ScalarEventDescription
         attrs = super().validate(attrs=attrs)
         try:
-            centralized_oracle = models.CentralizedOracle.objects.get(address=attrs['oracle'].address)
-            models.ScalarEventDescription.objects.get(ipfs_hash=centralized_oracle.event_description.ipfs_hash)
-        except models.ScalarEventDescription.DoesNotExist:
-            raise serializers.ValidationError("Not existing ScalarEventDescription with oracle {}".format(attrs['oracle'].address))
+            centralized_oracle = models.CentralizedOracle.objects.select_related('event_description').get(
+                address=attrs['oracle'].address)
+            if centralized_oracle.event_description.description_type != 'SCALAR':
+                raise serializers.ValidationError("Not existing ScalarEventDescription with oracle {}".format(attrs['oracle'].address))
         except models.CentralizedOracle.DoesNotExist:
             pass
 
@@ -328,14 +355,16 @@ class CategoricalEventSerializer(EventSerializerTimestamped, serializers.ModelSe
         # if so, check its event_description is a CategoricalEventDescription
         attrs = super().validate(attrs=attrs)
         try:
-            centralized_oracle = models.CentralizedOracle.objects.get(address=attrs['oracle'].address)
-            description = models.CategoricalEventDescription.objects.get(ipfs_hash=centralized_oracle.event_description.ipfs_hash)
+            centralized_oracle = models.CentralizedOracle.objects.select_related(
+                'event_description', 'event_description__categoricaleventdescription'
+            ).get(address=attrs['oracle'].address)
+            if centralized_oracle.event_description.description_type != 'CATEGORICAL':
+                raise serializers.ValidationError(
+                    "Not existing CategoricalEventDescription with oracle {}".format(attrs['oracle'].address))
+            description = centralized_oracle.event_description.get_subclass_instance()
             if len(description.outcomes) != attrs['outcomeCount']:
                 raise serializers.ValidationError("Field outcomeCount does not match number of outcomes specified "
                                                   "in the event description.")
-        except models.ScalarEventDescription.DoesNotExist:
-            raise serializers.ValidationError(
-                "Not existing CategoricalEventDescription with oracle {}".format(attrs['oracle'].address))
         except models.CentralizedOracle.DoesNotExist:
             pass
 
@@ -376,28 +405,32 @@ class MarketSerializerTimestamped(ContractCreatedByFactorySerializerTimestamped,
 
     def create(self, validated_data):
         # Check event type (Categorical or Scalar)
-        try:
-            categorical_event = models.CategoricalEvent.objects.get(address=validated_data.get('event').address)
-            n_outcome_tokens = len(categorical_event.oracle.centralizedoracle.event_description.categoricaleventdescription.outcomes)
+        event = validated_data.get('event')
+        if event.is_categorical():
+            n_outcome_tokens = len(event.oracle.centralizedoracle.event_description.get_subclass_instance().outcomes)
             net_outcome_tokens_sold = [0] * n_outcome_tokens
-            marginal_prices = [str(1.0 / n_outcome_tokens) for _ in range(0, n_outcome_tokens)]
-        except models.CategoricalEvent.DoesNotExist:
-            scalar_event = models.ScalarEvent.objects.get(address=validated_data.get('event').address)
+            marginal_prices = calc_initial_marginal_prices(n_outcome_tokens)
+        elif event.is_scalar():
             # scalar, creating an array of size 2
             net_outcome_tokens_sold = [0, 0]
-            marginal_prices = ['0.5', '0.5']
+            marginal_prices = calc_initial_marginal_prices(2)
+        else:
+            raise serializers.ValidationError('Event {} is neither categorical nor scalar'.format(event.address))
 
         validated_data.update(
             {
                 'net_outcome_tokens_sold': net_outcome_tokens_sold,
                 'marginal_prices': marginal_prices,
-                'trading_volume': 0
+                'trading_volume': 0,
+                'last_modified_block': get_change_block(validated_data['creation_block']),
             }
         )
         market = models.Market.objects.create(**validated_data)
+        create_market_summary(market)
         return market
 
     def rollback(self):
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
 
 
@@ -505,39 +538,21 @@ class OutcomeTokenIssuanceSerializer(ContractSerializer, serializers.ModelSerial
     def create(self, validated_data):
         # Creates or updates an outcome token balance for the given outcome_token.
         # Returns the outcome_token
-        try:
-            outcome_token_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('owner'),
-                                                                           outcome_token__address=validated_data.get('outcome_token'))
-            outcome_token_balance.balance += validated_data.get('amount')
-            outcome_token_balance.outcome_token.total_supply += validated_data.get('amount')
-            outcome_token_balance.outcome_token.save()
-            outcome_token_balance.save()
-            return outcome_token_balance.outcome_token
-        except models.OutcomeTokenBalance.DoesNotExist:
-            outcome_token = models.OutcomeToken.objects.get(address=validated_data.get('outcome_token'))
-            outcome_token.total_supply += validated_data.get('amount')
-            outcome_token.save()
-
-            outcome_token_balance = models.OutcomeTokenBalance()
-            outcome_token_balance.balance = validated_data.get('amount')
-            outcome_token_balance.owner = validated_data.get('owner')
-            outcome_token_balance.outcome_token = outcome_token
-            outcome_token_balance.save()
-            return outcome_token
+        outcome_token = get_entity(models.OutcomeToken, address=validated_data.get('outcome_token'))
+        increment_entity(outcome_token, total_supply=validated_data.get('amount'))
+        add_outcome_token_balance(validated_data.get('owner'), outcome_token.address, validated_data.get('amount'),
+                                  self.get_block_number())
+        mark_participants_dirty(validated_data.get('owner'))
+        return outcome_token
 
     def rollback(self):
-        try:
-            outcome_token_balance = models.OutcomeTokenBalance.objects.get(
-                owner=self.validated_data.get('owner'),
-                outcome_token__address=self.validated_data.get('outcome_token')
-            )
-            outcome_token_balance.balance -= self.validated_data.get('amount')
-            outcome_token_balance.save()
-            self.instance.total_supply -= self.validated_data.get('amount')
-            self.instance.save()
-        except models.OutcomeTokenBalance.DoesNotExist:
-            self.instance.total_supply -= self.validated_data.get('amount')
-            self.instance.save()
+        update_counters(models.OutcomeTokenBalance,
+                        {'owner': self.validated_data.get('owner'),
+                         'outcome_token': self.validated_data.get('outcome_token')},
+                        block_number=self.get_block_number(),
+                        balance=-self.validated_data.get('amount'))
+        increment_entity(self.instance, total_supply=-self.validated_data.get('amount'))
+        mark_participants_dirty(self.validated_data.get('owner'))
 
 
 class OutcomeTokenRevocationSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -564,25 +579,23 @@ class OutcomeTokenRevocationSerializer(ContractSerializer, serializers.ModelSeri
             ))
 
     def create(self, validated_data):
-        outcome_token_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('owner'),
-                                                                       outcome_token__address=validated_data.get('outcome_token'))
-        outcome_token_balance.balance -= validated_data.get('amount')
-        outcome_token_balance.outcome_token.total_supply -= validated_data.get('amount')
-        # save the outcome_token
-        outcome_token_balance.outcome_token.save()
-        # save the outcome_token_balance
-        outcome_token_balance.save()
-        return outcome_token_balance.outcome_token
+        update_counters(models.OutcomeTokenBalance,
+                        {'owner': validated_data.get('owner'), 'outcome_token': validated_data.get('outcome_token')},
+                        block_number=self.get_block_number(),
+                        balance=-validated_data.get('amount'))
+        outcome_token = get_entity(models.OutcomeToken, address=validated_data.get('outcome_token'))
+        increment_entity(outcome_token, total_supply=-validated_data.get('amount'))
+        mark_participants_dirty(validated_data.get('owner'))
+        return outcome_token
 
     def rollback(self):
-        outcome_token_balance = models.OutcomeTokenBalance.objects.get(
-            owner=self.validated_data.get('owner'),
-            outcome_token__address=self.validated_data.get('outcome_token')
-        )
-        outcome_token_balance.balance += self.validated_data.get('amount')
-        outcome_token_balance.save()
-        self.instance.total_supply += self.validated_data.get('amount')
-        self.instance.save()
+        update_counters(models.OutcomeTokenBalance,
+                        {'owner': self.validated_data.get('owner'),
+                         'outcome_token': self.validated_data.get('outcome_token')},
+                        block_number=self.get_block_number(),
+                        balance=self.validated_data.get('amount'))
+        increment_entity(self.instance, total_supply=self.validated_data.get('amount'))
+        mark_participants_dirty(self.validated_data.get('owner'))
 
 
 class OutcomeAssignmentEventSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -600,18 +613,20 @@ class OutcomeAssignmentEventSerializer(ContractSerializer, serializers.ModelSeri
         # Updates the event outcome
         event = None
         try:
-            event = models.Event.objects.get(address=validated_data.get('address'))
+            event = get_entity(models.Event, address=validated_data.get('address'))
             event.is_winning_outcome_set = True
             event.outcome = validated_data.get('outcome')
-            event.save()
+            save_entity(event)
+            mark_event_participants_dirty(event.address)
             return event
-        except event.DoesNotExist:
+        except models.Event.DoesNotExist:
             raise serializers.ValidationError('Event {} does not exist'.format(validated_data.get('address')))
 
     def rollback(self):
         self.instance.is_winning_outcome_set = False
         self.instance.outcome = None
-        self.instance.save()
+        save_entity(self.instance)
+        mark_event_participants_dirty(self.instance.address)
 
 
 class OutcomeTokenTransferSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -632,46 +647,46 @@ class OutcomeTokenTransferSerializer(ContractSerializer, serializers.ModelSerial
     to = serializers.CharField(max_length=ADDRESS_LENGTH)
 
     def create(self, validated_data):
-        # Subtract balance from Outcome Token Balance
-        from_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('from_address'),
-                                                              outcome_token__address=validated_data.get('outcome_token'))
-        from_balance.balance -= validated_data.get('value')
-        from_balance.save()
+        # Subtract balance from Outcome Token Balance, the receiver is not credited if the sender has no balance
+        if not update_counters(models.OutcomeTokenBalance,
+                               {'owner': validated_data.get('from_address'),
+                                'outcome_token': validated_data.get('outcome_token')},
+                               block_number=self.get_block_number(),
+                               balance=-validated_data.get('value')):
+            raise serializers.ValidationError('OutcomeTokenBalance {} for owner {} doesn\'t exist'.format(
+                validated_data.get('outcome_token'),
+                validated_data.get('from_address')
+            ))
 
-        # Add balance to receiver
-        try:
-            to_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('to'),
-                                                                outcome_token__address=validated_data.get('outcome_token'))
-        except models.OutcomeTokenBalance.DoesNotExist:
-            to_balance = models.OutcomeTokenBalance.objects.create(owner=validated_data.get('to'),
-                                                                   outcome_token=from_balance.outcome_token)
-        to_balance.balance += validated_data.get('value')
-        to_balance.save()
+        mark_participants_dirty(validated_data.get('from_address'), validated_data.get('to'))
 
-        return to_balance
+        # Add balance to receiver
+        return add_outcome_token_balance(validated_data.get('to'), validated_data.get('outcome_token'),
+                                         validated_data.get('value'), self.get_block_number())
 
     def rollback(self):
         # got OutcomeTokenBalance by using 'From' property
-        self.instance.balance += self.validated_data.get('value')
-        self.instance.save()
+        increment_entity(self.instance, balance=self.validated_data.get('value'))
+        touch_entity(self.instance, self.get_block_number())
+        mark_participants_dirty(self.validated_data.get('from_address'), self.validated_data.get('to'))
 
-        # Add balance to receiver
+        # Subtract balance from receiver
         try:
-            to_balance = models.OutcomeTokenBalance.objects.get(
-                owner=self.validated_data.get('to'),
-                outcome_token__address=self.validated_data.get('outcome_token')
-            )
+            to_balance = get_entity(models.OutcomeTokenBalance,
+                                    owner=self.validated_data.get('to'),
+                                    outcome_token=self.validated_data.get('outcome_token'))
         except models.OutcomeTokenBalance.DoesNotExist:
-            to_balance = models.OutcomeTokenBalance.objects.create(
+            to_balance = add_entity(models.OutcomeTokenBalance.objects.create(
                 owner=self.validated_data.get('to'),
-                outcome_token=self.from_balance.outcome_token
-            )
+                outcome_token_id=self.instance.outcome_token_id
+            ))
 
         if to_balance.balance - self.validated_data.get('value') == 0:
-            to_balance.delete()
+            add_instance_tombstone(to_balance, self.get_block_number())
+            delete_entity(to_balance)
         else:
-            to_balance.balance -= self.validated_data.get('value')
-            to_balance.save()
+            increment_entity(to_balance, balance=-self.validated_data.get('value'))
+            touch_entity(to_balance, self.get_block_number())
 
 
 class WinningsRedemptionSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -689,16 +704,13 @@ class WinningsRedemptionSerializer(ContractSerializer, serializers.ModelSerializ
     def create(self, validated_data):
         # Sums the given winnings to the event redeemed_winnings
         try:
-            event = models.Event.objects.get(address=validated_data.get('address'))
-            event.redeemed_winnings += validated_data.get('winnings')
-            event.save()
-            return event
-        except event.DoesNotExist:
+            event = get_entity(models.Event, address=validated_data.get('address'))
+            return increment_entity(event, redeemed_winnings=validated_data.get('winnings'))
+        except models.Event.DoesNotExist:
             raise serializers.ValidationError('Event {} does not exist'.format(validated_data.get('address')))
 
     def rollback(self):
-        self.instance.redeemed_winnings -= self.validated_data.get('winnings')
-        self.instance.save()
+        increment_entity(self.instance, redeemed_winnings=-self.validated_data.get('winnings'))
 
 
 class CentralizedOracleInstanceSerializer(CentralizedOracleSerializer):
@@ -723,14 +735,14 @@ class OwnerReplacementSerializer(ContractSerializer, serializers.ModelSerializer
             centralized_oracle.old_owner = centralized_oracle.owner
             centralized_oracle.owner = validated_data.get('newOwner')
             centralized_oracle.save()
-            return centralized_oracle
+            return touch_entity(centralized_oracle, self.get_block_number())
         except models.CentralizedOracle.DoesNotExist:
             raise serializers.ValidationError('CentralizedOracle {} does not exist'.format(validated_data.get('address')))
 
     def rollback(self):
         self.instance.owner = self.instance.old_owner
         self.instance.save()
-        return self.instance
+        return touch_entity(self.instance, self.get_block_number())
 
 
 class OutcomeAssignmentOracleSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -751,7 +763,8 @@ class OutcomeAssignmentOracleSerializer(ContractSerializer, serializers.ModelSer
             centralized_oracle.is_outcome_set = True
             centralized_oracle.outcome = validated_data.get('outcome')
             centralized_oracle.save()
-            return centralized_oracle
+            update_oracle_market_summaries(centralized_oracle)
+            return touch_entity(centralized_oracle, self.get_block_number())
         except centralized_oracle.DoesNotExist:
             raise serializers.ValidationError('CentralizedOracle {} does not exist'.format(validated_data.get('address')))
 
@@ -759,7 +772,8 @@ class OutcomeAssignmentOracleSerializer(ContractSerializer, serializers.ModelSer
         self.instance.is_outcome_set = False
         self.instance.outcome = None
         self.instance.save()
-        return self.instance
+        update_oracle_market_summaries(self.instance)
+        return touch_entity(self.instance, self.get_block_number())
 
 
 class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, serializers.ModelSerializer):
@@ -781,18 +795,18 @@ class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, s
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_entity(models.Market, address=validated_data.get('address'))
             token_index = validated_data.get('outcomeTokenIndex')
             token_count = validated_data.get('outcomeTokenCount')
             market.net_outcome_tokens_sold[token_index] += token_count
-            market.collected_fees += validated_data.get('marketFees')
 
-            outcome_token = market.event.outcome_tokens.get(index=token_index)
+            outcome_token = get_entity(models.OutcomeToken, event=market.event_id, index=token_index)
 
             # Create Order
             order = models.BuyOrder()
             order.creation_date_time = validated_data.get('creation_date_time')
             order.creation_block = validated_data.get('creation_block')
+            order.last_modified_block = get_change_block(order.creation_block)
             order.market = market
             order.sender = validated_data.get('buyer')
             order.outcome_token = outcome_token
@@ -804,19 +818,19 @@ class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, s
             order.transaction_hash = validated_data.get('transaction_hash')
 
             # Calculate current marginal price
-            order.marginal_prices = list(map(
-                lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                                [int(x) for x in market.net_outcome_tokens_sold],
+            order.marginal_prices = [
+                Decimal(marginal_price)
+                for marginal_price in calc_lmsr_marginal_prices([int(x) for x in market.net_outcome_tokens_sold],
                                                                 int(market.funding))
-                                       ),
-                enumerate(market.net_outcome_tokens_sold)
-            ))
+            ]
 
             # Save order successfully, save market changes, then save the share entry
             order.save()
-            market.trading_volume += order.cost
             market.marginal_prices = order.marginal_prices
-            market.save()
+            save_entity(market, order.creation_block, collected_fees=order.fees, trading_volume=order.cost)
+            update_market_summary(market, 'marginal_prices', trading_volume=order.cost)
+            update_price_candles(order)
+            mark_participants_dirty(order.sender)
             return order
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.'.format(validated_data.get('address')))
@@ -824,21 +838,22 @@ class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, s
     def rollback(self):
         token_index = self.validated_data.get('outcomeTokenIndex')
         token_count = self.validated_data.get('outcomeTokenCount')
-        market = models.Market.objects.get(address=self.validated_data.get('address'))
+        market = get_entity(models.Market, address=self.validated_data.get('address'))
         market.net_outcome_tokens_sold[token_index] -= token_count
-        market.collected_fees -= self.validated_data.get('marketFees')
-        market.trading_volume -= self.instance.cost
-        market.marginal_prices = list(map(
-            lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                            [int(x) for x in market.net_outcome_tokens_sold],
+        market.marginal_prices = [
+            Decimal(marginal_price)
+            for marginal_price in calc_lmsr_marginal_prices([int(x) for x in market.net_outcome_tokens_sold],
                                                             int(market.funding))
-                                   ),
-            enumerate(market.net_outcome_tokens_sold)
-        ))
+        ]
 
         # Remove order
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
-        market.save()
+        save_entity(market, self.get_block_number(), collected_fees=-self.validated_data.get('marketFees'),
+                    trading_volume=-self.instance.cost)
+        update_market_summary(market, 'marginal_prices', trading_volume=-self.instance.cost)
+        rebuild_price_candles(market.address, self.instance.creation_date_time)
+        mark_participants_dirty(self.validated_data.get('buyer'))
 
 
 class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, serializers.ModelSerializer):
@@ -860,19 +875,19 @@ class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, seria
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_entity(models.Market, address=validated_data.get('address'))
             token_index = validated_data.get('outcomeTokenIndex')
             token_count = validated_data.get('outcomeTokenCount')
             market.net_outcome_tokens_sold[token_index] -= token_count
-            market.collected_fees += validated_data.get('marketFees')
 
             # Get outcome token
-            outcome_token = market.event.outcome_tokens.get(index=token_index)
+            outcome_token = get_entity(models.OutcomeToken, event=market.event_id, index=token_index)
 
             # Create Order
             order = models.SellOrder()
             order.creation_date_time = validated_data.get('creation_date_time')
             order.creation_block = validated_data.get('creation_block')
+            order.last_modified_block = get_change_block(order.creation_block)
             order.market = market
             order.sender = validated_data.get('seller')
             order.outcome_token = outcome_token
@@ -882,17 +897,18 @@ class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, seria
             order.fees = validated_data.get('marketFees')
             order.net_outcome_tokens_sold = market.net_outcome_tokens_sold
             order.transaction_hash = validated_data.get('transaction_hash')
-            order.marginal_prices = list(map(
-                lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                                [int(x) for x in market.net_outcome_tokens_sold],
+            order.marginal_prices = [
+                Decimal(marginal_price)
+                for marginal_price in calc_lmsr_marginal_prices([int(x) for x in market.net_outcome_tokens_sold],
                                                                 int(market.funding))
-                                       ),
-                enumerate(market.net_outcome_tokens_sold)
-            ))
+            ]
             # Save order successfully, save market changes, then save the share entry
             order.save()
             market.marginal_prices = order.marginal_prices
-            market.save()
+            save_entity(market, order.creation_block, collected_fees=order.fees)
+            update_market_summary(market, 'marginal_prices')
+            update_price_candles(order)
+            mark_participants_dirty(order.sender)
             return order
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.' % validated_data.get('address'))
@@ -900,21 +916,21 @@ class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, seria
     def rollback(self):
         token_index = self.validated_data.get('outcomeTokenIndex')
         token_count = self.validated_data.get('outcomeTokenCount')
-        market = models.Market.objects.get(address=self.validated_data.get('address'))
+        market = get_entity(models.Market, address=self.validated_data.get('address'))
         market.net_outcome_tokens_sold[token_index] += token_count
-        market.collected_fees -= self.validated_data.get('marketFees')
-
-        market.marginal_prices = list(map(
-            lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                            [int(x) for x in market.net_outcome_tokens_sold],
+        market.marginal_prices = [
+            Decimal(marginal_price)
+            for marginal_price in calc_lmsr_marginal_prices([int(x) for x in market.net_outcome_tokens_sold],
                                                             int(market.funding))
-                                   ),
-            enumerate(market.net_outcome_tokens_sold)
-        ))
+        ]
 
         # Remove order
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
-        market.save()
+        save_entity(market, self.get_block_number(), collected_fees=-self.validated_data.get('marketFees'))
+        update_market_summary(market, 'marginal_prices')
+        rebuild_price_candles(market.address, self.instance.creation_date_time)
+        mark_participants_dirty(self.validated_data.get('seller'))
 
 
 class OutcomeTokenShortSaleOrderSerializerTimestamped(ContractSerializerTimestamped, serializers.ModelSerializer):
@@ -941,6 +957,7 @@ class OutcomeTokenShortSaleOrderSerializerTimestamped(ContractSerializerTimestam
                 order = models.ShortSellOrder()
                 order.creation_date_time = validated_data.get('creation_date_time')
                 order.creation_block = validated_data.get('creation_block')
+                order.last_modified_block = get_change_block(order.creation_block)
                 order.market = market
                 order.sender = validated_data.get('buyer')
                 # order.outcome_token_index = validated_data.get('outcomeTokenIndex')
@@ -958,6 +975,7 @@ class OutcomeTokenShortSaleOrderSerializerTimestamped(ContractSerializerTimestam
 
     def rollback(self):
         # Remove order
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
 
 
@@ -974,10 +992,11 @@ class MarketFundingSerializer(ContractSerializer, serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_entity(models.Market, address=validated_data.get('address'))
             market.funding = validated_data.get('funding')
             market.stage = market.stages[1][0] # MarketFunded
-            market.save()
+            save_entity(market, self.get_block_number())
+            update_market_summary(market, 'stage')
             return market
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.' % validated_data.get('address'))
@@ -985,7 +1004,8 @@ class MarketFundingSerializer(ContractSerializer, serializers.ModelSerializer):
     def rollback(self):
         self.instance.funding = None
         self.instance.stage = self.instance.stages[0][0]  # Market created
-        self.instance.save()
+        save_entity(self.instance, self.get_block_number())
+        update_market_summary(self.instance, 'stage')
         return self.instance
 
 
@@ -1001,16 +1021,18 @@ class MarketClosingSerializer(ContractSerializer, serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_entity(models.Market, address=validated_data.get('address'))
             market.stage = market.stages[2][0] # MarketClosed
-            market.save()
+            save_entity(market, self.get_block_number())
+            update_market_summary(market, 'stage')
             return market
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.' % validated_data.get('address'))
 
     def rollback(self):
         self.instance.stage = self.instance.stages[1][0] # Market funded
-        self.instance.save()
+        save_entity(self.instance, self.get_block_number())
+        update_market_summary(self.instance, 'stage')
         return self.instance
 
 
@@ -1027,17 +1049,15 @@ class FeeWithdrawalSerializer(ContractSerializer, serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
-            market.withdrawn_fees += validated_data.get('fees')
-            market.save()
-            return market
+            market = get_entity(models.Market, address=validated_data.get('address'))
+            increment_entity(market, withdrawn_fees=validated_data.get('fees'))
+            return touch_entity(market, self.get_block_number())
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.' % validated_data.get('address'))
 
     def rollback(self):
-        self.instance.withdrawn_fees -= self.validated_data.get('fees')
-        self.instance.save()
-        return self.instance
+        increment_entity(self.instance, withdrawn_fees=-self.validated_data.get('fees'))
+        return touch_entity(self.instance, self.get_block_number())
 
 
 class UportTournamentParticipantSerializerEventSerializerTimestamped(ContractSerializerTimestamped,
@@ -1071,9 +1091,11 @@ class UportTournamentParticipantSerializerEventSerializerTimestamped(ContractSer
         validated_data['diff_rank'] = 0
         validated_data.update({
             'address': normalize_address_without_0x(validated_data.get('address')),
+            'last_modified_block': get_change_block(validated_data['creation_block']),
         })
 
         participant = models.TournamentParticipant.objects.create(**validated_data)
+        mark_participants_dirty(participant.address)
         participant_balance = models.TournamentParticipantBalance()
         participant_balance.balance = 0
         participant_balance.participant = participant
@@ -1081,6 +1103,7 @@ class UportTournamentParticipantSerializerEventSerializerTimestamped(ContractSer
         return participant
 
     def rollback(self):
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
 
 
@@ -1122,9 +1145,11 @@ class GenericTournamentParticipantEventSerializerTimestamped(ContractSerializerT
         validated_data.update({
             'address': normalize_address_without_0x(validated_data.get('address')),
             'mainnet_address': normalize_address_without_0x(validated_data.get('mainnet_address')),
+            'last_modified_block': get_change_block(validated_data['creation_block']),
         })
 
         participant = models.TournamentParticipant.objects.create(**validated_data)
+        mark_participants_dirty(participant.address)
         participant_balance = models.TournamentParticipantBalance()
         participant_balance.participant = participant
         try:
@@ -1145,9 +1170,22 @@ class GenericTournamentParticipantEventSerializerTimestamped(ContractSerializerT
         return participant
 
     def rollback(self):
+        add_instance_tombstone(self.instance, self.get_block_number())
         self.instance.delete()
 
 
+def touch_participants(block_number, *addresses):
+    """
+    Stores `block_number` as the `last_modified_block` of the participants whose tournament balance changed,
+    `None` addresses are ignored
+    """
+    if block_number is None:
+        return
+    for address in addresses:
+        if address:
+            touch_entity(get_entity(models.TournamentParticipant, address=address), block_number)
+
+
 class TournamentTokenIssuanceSerializer(ContractSerializer, serializers.ModelSerializer):
     """
     Serializes the issuance of new Tournament Tokens
@@ -1170,16 +1208,20 @@ class TournamentTokenIssuanceSerializer(ContractSerializer, serializers.ModelSer
     def create(self, validated_data):
         logger.info("issuance serializer")
         participant_balance, created = models.TournamentParticipantBalance.objects.get_or_create(
-            participant=validated_data.get('owner')
+            participant=validated_data.get('owner'),
+            defaults={'balance': validated_data.get('amount')}
         )
-        participant_balance.balance += validated_data.get('amount')
-        participant_balance.save()
+        if not created:
+            increment_entity(participant_balance, balance=validated_data.get('amount'))
 
+        mark_participants_dirty(validated_data.get('owner'))
+        touch_participants(self.get_block_number(), validated_data.get('owner'))
         return participant_balance
 
     def rollback(self):
-        self.instance.balance -= self.validated_data.get('amount')
-        return self.instance.save()
+        mark_participants_dirty(self.validated_data.get('owner'))
+        touch_participants(self.get_block_number(), self.validated_data.get('owner'))
+        return increment_entity(self.instance, balance=-self.validated_data.get('amount'))
 
 
 class TournamentTokenTransferSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -1236,22 +1278,22 @@ class TournamentTokenTransferSerializer(ContractSerializer, serializers.ModelSer
         :param validated_data:
         :return: TournamentParticipant istance
         """
+        mark_participants_dirty(validated_data.get('from_participant'), validated_data.get('to_participant'))
+        touch_participants(self.get_block_number(), validated_data.get('from_participant'),
+                           validated_data.get('to_participant'))
         if validated_data.get('from_participant'):
-            from_user = models.TournamentParticipantBalance.objects.get(participant=validated_data.get('from_participant'))
-            from_user.balance -= validated_data.get('value')
-            from_user.save()
+            from_user = get_entity(models.TournamentParticipantBalance,
+                                   participant=validated_data.get('from_participant'))
+            increment_entity(from_user, balance=-validated_data.get('value'))
             if validated_data.get('to_participant'):
-                to_user = models.TournamentParticipantBalance.objects.get(participant=validated_data.get('to_participant'))
-                to_user.balance += validated_data.get('value')
-                to_user.save()
-                return to_user
+                to_user = get_entity(models.TournamentParticipantBalance,
+                                     participant=validated_data.get('to_participant'))
+                return increment_entity(to_user, balance=validated_data.get('value'))
             else:
                 return from_user
         else:
-            to_user = models.TournamentParticipantBalance.objects.get(participant=validated_data.get('to_participant'))
-            to_user.balance += validated_data.get('value')
-            to_user.save()
-            return to_user
+            to_user = get_entity(models.TournamentParticipantBalance, participant=validated_data.get('to_participant'))
+            return increment_entity(to_user, balance=validated_data.get('value'))
 
     def rollback(self):
         """
@@ -1259,21 +1301,17 @@ class TournamentTokenTransferSerializer(ContractSerializer, serializers.ModelSer
         See validate(attrs)
         :return: TournamentParticipant instance
         """
+        mark_participants_dirty(self.validated_data.get('from_participant'),
+                                self.validated_data.get('to_participant'))
+        touch_participants(self.get_block_number(), self.validated_data.get('from_participant'),
+                           self.validated_data.get('to_participant'))
         if self.validated_data.get('from_participant'):
-            from_user = models.TournamentParticipantBalance.objects.get(participant=self.validated_data.get('from_participant'))
-            from_user.balance += self.validated_data.get('value')
-            from_user.save()
-
-            if self.validated_data.get('to_participant'):
-                to_user = models.TournamentParticipantBalance.objects.get(participant=self.validated_data.get('to_participant'))
-                to_user.balance -= self.validated_data.get('value')
-                to_user.save()
-                return to_user
-            else:
-                return from_user
-
-        else:
-            to_user = models.TournamentParticipantBalance.objects.get(participant=self.validated_data.get('to_participant'))
-            to_user.balance -= self.validated_data.get('value')
-            to_user.save()
-            return to_user
+            update_counters(models.TournamentParticipantBalance,
+                            {'participant': self.validated_data.get('from_participant')},
+                            balance=self.validated_data.get('value'))
+
+        if self.validated_data.get('to_participant'):
+            update_counters(models.TournamentParticipantBalance,
+                            {'participant': self.validated_data.get('to_participant')},
+                            balance=-self.validated_data.get('value'))
+        return self.instance
@@ -61,6 +61,18 @@ def calculate_scoreboard():
         send_email(traceback.format_exc())
 
 
+@shared_task
+def calculate_incremental_scoreboard():
+    """
+    The task recalculates the participants changed since the last calculation and updates the rankings
+    """
+    try:
+        call_command('calculate_scoreboard', incremental=True)
+    except Exception as err:
+        logger.error(str(err))
+        send_email(traceback.format_exc())
+
+
 @shared_task
 def db_dump():
     """
@@ -11,6 +11,7 @@ from faker import Factory as FakerFactory
 from faker import Faker
 
 from .. import models
+from ..market_summary import create_market_summary
 
 fakerFactory = FakerFactory.create()
 faker = Faker()
@@ -176,6 +177,11 @@ class MarketFactory(ContractCreatedByFactory):
     revenue = factory_boy.Sequence(lambda n: n)
     collected_fees = 0
 
+    @factory_boy.post_generation
+    def summary(self, create, extracted, **kwargs):
+        if create:
+            create_market_summary(self)
+
 
 class OrderFactory(BlockTimestampedFactory, factory_boy.DjangoModelFactory):
     transaction_hash = factory_boy.LazyFunction(generate_transaction_hash)
@@ -205,6 +211,13 @@ class SellOrderFactory(OrderFactory):
     fees = 0
 
 
+class ShortSellOrderFactory(OrderFactory):
+    class Meta:
+        model = models.ShortSellOrder
+
+    cost = factory_boy.Sequence(lambda n: n)
+
+
 class TournamentParticipantFactory(ContractFactory, BlockTimestampedFactory):
     class Meta:
         model = models.TournamentParticipant
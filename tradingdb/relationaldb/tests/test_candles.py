@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.test import TestCase
+
+from ..candles import (get_candle_start, rebuild_price_candles,
+                       update_price_candles)
+from ..entity_cache import unit_of_work
+from ..models import PriceCandle
+from .factories import BuyOrderFactory, MarketFactory, OutcomeTokenFactory
+
+
+class TestCandles(TestCase):
+
+    def test_get_candle_start(self):
+        date_time = datetime(2018, 5, 17, 10, 32, 45, tzinfo=timezone.utc)
+        self.assertEqual(get_candle_start(date_time, 60), datetime(2018, 5, 17, 10, 32, tzinfo=timezone.utc))
+        self.assertEqual(get_candle_start(date_time, 3600), datetime(2018, 5, 17, 10, tzinfo=timezone.utc))
+        self.assertEqual(get_candle_start(date_time, 86400), datetime(2018, 5, 17, tzinfo=timezone.utc))
+
+    def test_update_price_candles(self):
+        market = MarketFactory()
+        outcome_token = OutcomeTokenFactory(event=market.event, index=1)
+        orders = []
+        with unit_of_work():
+            for minute, price in enumerate(['0.6000', '0.8000', '0.3000', '0.7000']):
+                price = Decimal(price)
+                order = BuyOrderFactory(market=market, outcome_token=outcome_token, outcome_token_count=10,
+                                        creation_block=minute,
+                                        creation_date_time=datetime(2018, 5, 17, 10, minute, tzinfo=timezone.utc),
+                                        marginal_prices=[1 - price, price])
+                update_price_candles(order)
+                orders.append(order)
+
+        candle = PriceCandle.objects.get(market=market, resolution=3600, outcome_index=1)
+        self.assertEqual((candle.open, candle.high, candle.low, candle.close),
+                         (Decimal('0.6'), Decimal('0.8'), Decimal('0.3'), Decimal('0.7')))
+        self.assertEqual(candle.volume, 40)
+        self.assertEqual(candle.trades, 4)
+        self.assertEqual(PriceCandle.objects.get(market=market, resolution=3600, outcome_index=0).volume, 0)
+        self.assertEqual(PriceCandle.objects.filter(market=market, resolution=60).count(), 8)
+
+        # Rolling back the lowest price builds the candle again from the orders left
+        orders[2].delete()
+        rebuild_price_candles(market.address, orders[2].creation_date_time)
+        candle = PriceCandle.objects.get(market=market, resolution=3600, outcome_index=1)
+        self.assertEqual((candle.open, candle.high, candle.low, candle.close, candle.trades),
+                         (Decimal('0.6'), Decimal('0.8'), Decimal('0.6'), Decimal('0.7'), 3))
+        self.assertFalse(PriceCandle.objects.filter(market=market, resolution=60,
+                                                    start_date_time=orders[2].creation_date_time).exists())
@@ -0,0 +1,169 @@
+from django.db.models import F
+from django.test import TestCase
+
+from ..entity_cache import (add_outcome_token_balance, block_unit_of_work,
+                            end_block_unit_of_work, get_active_cache,
+                            get_entity, increment_entity, save_entity,
+                            unit_of_work, update_counters)
+from ..models import Market, OutcomeToken, OutcomeTokenBalance
+from .factories import (MarketFactory, OutcomeTokenBalanceFactory,
+                        OutcomeTokenFactory)
+
+
+class TestEntityCache(TestCase):
+
+    def test_identity_map(self):
+        outcome_token_balance = OutcomeTokenBalanceFactory()
+        outcome_token = outcome_token_balance.outcome_token
+        with unit_of_work() as cache:
+            self.assertIs(get_active_cache(), cache)
+            with self.assertNumQueries(1):
+                token_by_address = get_entity(OutcomeToken, address=outcome_token.address)
+                self.assertIs(token_by_address, get_entity(OutcomeToken, address=outcome_token.address))
+                self.assertIs(token_by_address, get_entity(OutcomeToken, pk=outcome_token.address))
+
+            balance = get_entity(OutcomeTokenBalance,
+                                 owner=outcome_token_balance.owner,
+                                 outcome_token=outcome_token.address)
+            self.assertIs(balance, get_entity(OutcomeTokenBalance,
+                                              owner=outcome_token_balance.owner,
+                                              outcome_token=outcome_token))
+
+            with self.assertRaises(OutcomeTokenBalance.DoesNotExist):
+                get_entity(OutcomeTokenBalance, owner='0' * 40, outcome_token=outcome_token.address)
+
+        self.assertIsNone(get_active_cache())
+
+    def test_flush(self):
+        market = MarketFactory()
+        outcome_token = OutcomeTokenFactory()
+        total_supply = outcome_token.total_supply
+        with unit_of_work():
+            for _ in range(10):
+                cached_market = get_entity(Market, address=market.address)
+                cached_market.stage = 1
+                save_entity(cached_market)
+                increment_entity(cached_market, collected_fees=1)
+                cached_outcome_token = get_entity(OutcomeToken, address=outcome_token.address)
+                increment_entity(cached_outcome_token, total_supply=2)
+            self.assertEqual(cached_outcome_token.total_supply, total_supply + 20)
+
+            # Nothing is written until the cache is flushed
+            self.assertEqual(Market.objects.get(address=market.address).collected_fees, market.collected_fees)
+            # Counters are added to the values in database, not overwritten
+            Market.objects.filter(address=market.address).update(collected_fees=F('collected_fees') + 5)
+
+        flushed_market = Market.objects.get(address=market.address)
+        self.assertEqual(flushed_market.stage, 1)
+        self.assertEqual(flushed_market.collected_fees, market.collected_fees + 15)
+        self.assertEqual(OutcomeToken.objects.get(address=outcome_token.address).total_supply, total_supply + 20)
+
+    def test_flush_changed_fields(self):
+        market = MarketFactory()
+        with unit_of_work():
+            cached_market = get_entity(Market, address=market.address)
+            cached_market.stage = 1
+            cached_market.net_outcome_tokens_sold[0] += 1
+            save_entity(cached_market)
+            # Fields not changed in memory are not overwritten
+            Market.objects.filter(address=market.address).update(fee=market.fee + 1, revenue=market.revenue + 1)
+
+        flushed_market = Market.objects.get(address=market.address)
+        self.assertEqual(flushed_market.stage, 1)
+        self.assertEqual(flushed_market.net_outcome_tokens_sold[0], market.net_outcome_tokens_sold[0] + 1)
+        self.assertEqual(flushed_market.fee, market.fee + 1)
+        self.assertEqual(flushed_market.revenue, market.revenue + 1)
+
+        with unit_of_work():
+            cached_market = get_entity(Market, address=market.address)
+            save_entity(cached_market)
+            # Nothing changed, nothing is written
+            with self.assertNumQueries(0):
+                get_active_cache().flush()
+
+    def test_block_unit_of_work(self):
+        market = MarketFactory()
+        with block_unit_of_work((1, 'hash')):
+            cached_market = get_entity(Market, address=market.address)
+            cached_market.stage = 1
+            save_entity(cached_market)
+        self.assertIsNone(get_active_cache())
+        # Changes are flushed at the end of every call
+        self.assertEqual(Market.objects.get(address=market.address).stage, 1)
+
+        # Rows are kept between calls for the same block
+        with block_unit_of_work((1, 'hash')):
+            with self.assertNumQueries(0):
+                self.assertIs(get_entity(Market, address=market.address), cached_market)
+
+        with block_unit_of_work((2, 'hash')):
+            with self.assertNumQueries(1):
+                self.assertIsNot(get_entity(Market, address=market.address), cached_market)
+
+        end_block_unit_of_work()
+        with block_unit_of_work((2, 'hash')):
+            with self.assertNumQueries(1):
+                get_entity(Market, address=market.address)
+        end_block_unit_of_work()
+
+    def test_save_entity_deltas(self):
+        market = MarketFactory()
+        collected_fees = market.collected_fees
+        market.stage = 1
+        # Row, counters and block are written with only one `UPDATE`
+        with self.assertNumQueries(1):
+            save_entity(market, 5, collected_fees=2)
+        self.assertEqual(market.collected_fees, collected_fees + 2)
+        saved_market = Market.objects.get(address=market.address)
+        self.assertEqual(saved_market.stage, 1)
+        self.assertEqual(saved_market.collected_fees, collected_fees + 2)
+        self.assertEqual(saved_market.last_modified_block, 5)
+
+        with unit_of_work():
+            cached_market = get_entity(Market, address=market.address)
+            cached_market.stage = 2
+            save_entity(cached_market, 6, collected_fees=3)
+        saved_market = Market.objects.get(address=market.address)
+        self.assertEqual(saved_market.stage, 2)
+        self.assertEqual(saved_market.collected_fees, collected_fees + 5)
+        self.assertEqual(saved_market.last_modified_block, 6)
+
+    def test_no_active_cache(self):
+        market = MarketFactory()
+        cached_market = get_entity(Market, address=market.address)
+        increment_entity(cached_market, collected_fees=1)
+        self.assertEqual(Market.objects.get(address=market.address).collected_fees, market.collected_fees + 1)
+
+    def test_update_counters(self):
+        outcome_token_balance = OutcomeTokenBalanceFactory()
+        lookup = {'owner': outcome_token_balance.owner, 'outcome_token': outcome_token_balance.outcome_token_id}
+        # Without active cache or journal rows are not loaded
+        with self.assertNumQueries(1):
+            self.assertEqual(update_counters(OutcomeTokenBalance, lookup, balance=3), 1)
+        self.assertEqual(OutcomeTokenBalance.objects.get(id=outcome_token_balance.id).balance,
+                         outcome_token_balance.balance + 3)
+        self.assertEqual(update_counters(OutcomeTokenBalance, dict(lookup, owner='0' * 40), balance=3), 0)
+
+        with unit_of_work():
+            self.assertEqual(update_counters(OutcomeTokenBalance, lookup, balance=-3), 1)
+            self.assertEqual(update_counters(OutcomeTokenBalance, dict(lookup, owner='0' * 40), balance=3), 0)
+        self.assertEqual(OutcomeTokenBalance.objects.get(id=outcome_token_balance.id).balance,
+                         outcome_token_balance.balance)
+
+    def test_add_outcome_token_balance(self):
+        outcome_token = OutcomeTokenFactory()
+        owner = '1' * 40
+        with self.assertNumQueries(1):
+            outcome_token_balance = add_outcome_token_balance(owner, outcome_token.address, 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(add_outcome_token_balance(owner, outcome_token.address, 3).pk, outcome_token_balance.pk)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner, outcome_token=outcome_token).balance, 8)
+
+        with unit_of_work():
+            cached_balance = get_entity(OutcomeTokenBalance, owner=owner, outcome_token=outcome_token.address)
+            # Balances loaded in the cache are incremented in memory
+            with self.assertNumQueries(0):
+                self.assertIs(add_outcome_token_balance(owner, outcome_token.address, 2), cached_balance)
+            self.assertEqual(cached_balance.balance, 10)
+        self.assertEqual(OutcomeTokenBalance.objects.filter(owner=owner).count(), 1)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner, outcome_token=outcome_token).balance, 10)
@@ -0,0 +1,87 @@
+from django.test import TestCase
+
+from ..entity_cache import (get_entity, increment_entity, save_entity,
+                            unit_of_work)
+from ..journal import journaling, revert_block
+from ..models import (CategoricalEvent, DirtyTournamentParticipant,
+                      JournaledBlock, JournalEntry, Market,
+                      OutcomeTokenBalance, TournamentParticipant)
+from .factories import (CategoricalEventFactory, MarketFactory,
+                        OutcomeTokenBalanceFactory,
+                        TournamentParticipantFactory)
+
+
+class TestJournal(TestCase):
+
+    def test_revert_block(self):
+        market = MarketFactory()
+        outcome_token_balance = OutcomeTokenBalanceFactory()
+        block_number = 10
+
+        with unit_of_work(), journaling(block_number):
+            for _ in range(3):
+                cached_market = get_entity(Market, address=market.address)
+                cached_market.marginal_prices = ['0.2500', '0.7500']
+                save_entity(cached_market)
+                increment_entity(cached_market, collected_fees=1)
+            outcome_token_balance.balance += 5
+            outcome_token_balance.save()
+            event = CategoricalEventFactory()
+
+        with journaling(block_number + 1):
+            cached_market = get_entity(Market, address=market.address)
+            increment_entity(cached_market, collected_fees=10)
+
+        # Only the first change of every row in a block is journaled: market, balance, event and its oracle
+        self.assertEqual(JournalEntry.objects.filter(block_number=block_number).count(), 4)
+        self.assertEqual(JournaledBlock.objects.count(), 2)
+
+        self.assertTrue(revert_block(block_number))
+        reverted_market = Market.objects.get(address=market.address)
+        self.assertEqual(reverted_market.collected_fees, market.collected_fees)
+        self.assertEqual([str(price) for price in reverted_market.marginal_prices], market.marginal_prices)
+        self.assertEqual(OutcomeTokenBalance.objects.get(id=outcome_token_balance.id).balance,
+                         outcome_token_balance.balance - 5)
+        self.assertFalse(CategoricalEvent.objects.filter(address=event.address).exists())
+        self.assertEqual(JournalEntry.objects.count(), 0)
+
+        # Blocks are reverted only once
+        self.assertTrue(revert_block(block_number + 1))
+        self.assertFalse(revert_block(block_number - 1))
+
+    def test_revert_block_keeps_unjournaled_fields(self):
+        participant = TournamentParticipantFactory(tokens_issued=False)
+        block_number = 10
+
+        with journaling(block_number):
+            participant.mainnet_address = '1' * 40
+            participant.save()
+
+        # Written by the scoreboard and the token issuance after the block was ingested
+        TournamentParticipant.objects.filter(address=participant.address).update(current_rank=1, score=5,
+                                                                                  tokens_issued=True)
+
+        self.assertTrue(revert_block(block_number))
+        reverted_participant = TournamentParticipant.objects.get(address=participant.address)
+        self.assertIsNone(reverted_participant.mainnet_address)
+        self.assertEqual(reverted_participant.current_rank, 1)
+        self.assertEqual(reverted_participant.score, 5)
+        self.assertTrue(reverted_participant.tokens_issued)
+
+    def test_revert_block_marks_participants_dirty(self):
+        participant = TournamentParticipantFactory()
+        other_participant = TournamentParticipantFactory()
+        deleted_balance = OutcomeTokenBalanceFactory(owner=other_participant.address)
+        block_number = 10
+
+        with journaling(block_number):
+            created_balance = OutcomeTokenBalanceFactory(owner=participant.address)
+            OutcomeTokenBalance.objects.get(id=deleted_balance.id).delete()
+
+        self.assertFalse(DirtyTournamentParticipant.objects.exists())
+        self.assertTrue(revert_block(block_number))
+        self.assertFalse(OutcomeTokenBalance.objects.filter(id=created_balance.id).exists())
+        self.assertTrue(OutcomeTokenBalance.objects.filter(id=deleted_balance.id).exists())
+        # Owners of the deleted and restored balances are recalculated by the incremental scoreboard
+        self.assertEqual(set(DirtyTournamentParticipant.objects.values_list('participant', flat=True)),
+                         {participant.address, other_participant.address})
@@ -0,0 +1,53 @@
+from django.test import TestCase
+
+from ..entity_cache import get_entity, increment_entity, unit_of_work
+from ..market_summary import (update_market_summary,
+                              update_oracle_market_summaries)
+from ..models import Market, MarketSummary
+from .factories import MarketFactory, ScalarEventFactory
+
+
+class TestMarketSummary(TestCase):
+
+    def test_create_market_summary(self):
+        market = MarketFactory()
+        summary = MarketSummary.objects.get(market=market)
+        description = market.event.oracle.centralizedoracle.event_description
+        self.assertEqual(summary.event_type, 'CATEGORICAL')
+        self.assertEqual(summary.title, description.title)
+        self.assertEqual(summary.outcomes, description.categoricaleventdescription.outcomes)
+        self.assertEqual(summary.resolution_date, description.resolution_date)
+        self.assertEqual(summary.collateral_token, market.event.collateral_token.lower())
+        self.assertEqual(summary.oracle, market.event.oracle_id)
+
+        scalar_market = MarketFactory(event=ScalarEventFactory())
+        self.assertEqual(MarketSummary.objects.get(market=scalar_market).event_type, 'SCALAR')
+
+    def test_update_market_summary(self):
+        market = MarketFactory()
+
+        with unit_of_work():
+            for _ in range(3):
+                cached_market = get_entity(Market, address=market.address)
+                cached_market.marginal_prices = ['0.2500', '0.7500']
+                cached_market.stage = 1
+                increment_entity(cached_market, trading_volume=5)
+                update_market_summary(cached_market, 'marginal_prices', 'stage', trading_volume=5)
+
+        summary = MarketSummary.objects.get(market=market)
+        self.assertEqual([str(price) for price in summary.marginal_prices], ['0.2500', '0.7500'])
+        self.assertEqual(summary.stage, 1)
+        self.assertEqual(summary.trading_volume, 15)
+
+        # Missing summaries are created again
+        summary.delete()
+        update_market_summary(Market.objects.get(address=market.address), 'stage')
+        self.assertEqual(MarketSummary.objects.get(market=market).trading_volume, 15)
+
+    def test_update_oracle_market_summaries(self):
+        market = MarketFactory()
+        oracle = market.event.oracle
+        oracle.is_outcome_set = True
+        oracle.save()
+        update_oracle_market_summaries(oracle)
+        self.assertTrue(MarketSummary.objects.get(market=market).oracle_is_outcome_set)
@@ -649,6 +649,14 @@ class TestSerializers(TestCase):
         self.assertEqual(instance.owner, event.address)
         self.assertEqual(instance.balance, 20)
 
+        # Transfers from an owner without balance don't credit the receiver
+        transfer_event['params'][0]['value'] = '{:040d}'.format(1)
+        s = OutcomeTokenTransferSerializer(data=transfer_event)
+        self.assertTrue(s.is_valid(), s.errors)
+        with self.assertRaises(ValidationError):
+            s.save()
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=event.address).balance, 20)
+
     def test_save_generic_tournament_participant(self):
         oracle = CentralizedOracleFactory()
         block = {
@@ -0,0 +1,67 @@
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django_eth_events.models import Daemon
+
+from tradingdb.relationaldb.delta_sync import get_rollback_count
+
+
+def get_last_block_number() -> int:
+    """
+    :return: last block processed by the event listener, data served by the API only changes when it moves
+    """
+    return Daemon.get_solo().block_number
+
+
+def get_response_cache_key(request, block_number: int, rollbacks: int) -> str:
+    """
+    :return: key built from the host (pagination links are absolute), the path, the normalized query params,
+    the accepted media types, the block number and the number of rollbacks (data of the same block number
+    changes after a reorg)
+    """
+    query_params = sorted((key, sorted(values)) for key, values in request.GET.lists())
+    key = '{}|{}|{}|{}|{}|{}'.format(request.get_host(), request.path, query_params,
+                                     request.META.get('HTTP_ACCEPT', ''), block_number, rollbacks)
+    return 'restapi:{}'.format(sha1(key.encode()).hexdigest())
+
+
+class BlockCacheMixin:
+    """
+    Caches GET responses until the event listener processes a new block or rolls back logs, and sends an `ETag` so
+    clients can revalidate with `If-None-Match` and get a `304 Not Modified`. Disabled if `REST_API_CACHE_TIMEOUT`
+    is 0
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not settings.REST_API_CACHE_TIMEOUT:
+            return super().dispatch(request, *args, **kwargs)
+
+        block_number = get_last_block_number()
+        rollbacks = get_rollback_count()
+        cache_key = get_response_cache_key(request, block_number, rollbacks)
+        etag = quote_etag('{}-{}-{}'.format(block_number, rollbacks, cache_key[-16:]))
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        cached = cache.get(cache_key)
+        if cached:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            patch_vary_headers(response, ('Accept',))
+        else:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            cache.set(cache_key, (response.content, response['Content-Type']), settings.REST_API_CACHE_TIMEOUT)
+
+        response['ETag'] = etag
+        return response
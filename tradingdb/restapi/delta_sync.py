@@ -0,0 +1,44 @@
+from rest_framework.exceptions import ValidationError
+
+from tradingdb.relationaldb.delta_sync import get_tombstones
+
+
+class DeltaSyncMixin:
+    """
+    List views accepting `?since_block=N`, only the rows changed after block N are returned and the response gets
+    a `deleted` list with the keys of the rows deleted rolling back blocks after N (of every market or account,
+    clients ignore the ones they don't have). Clients use as N the last block processed when they synced, rollbacks
+    stamp their changes after it (see `get_change_block`). Tombstones must be applied before the rows
+    """
+    since_block_query_param = 'since_block'
+    since_block_field = 'last_modified_block'
+    tombstone_model = None
+
+    def get_since_block(self):
+        """
+        :return: block number of the `since_block` query param, `None` if not provided
+        """
+        value = self.request.query_params.get(self.since_block_query_param)
+        if value is None:
+            return None
+        try:
+            since_block = int(value)
+        except ValueError:
+            since_block = -1
+        if since_block < 0:
+            raise ValidationError({self.since_block_query_param: 'A valid block number is required.'})
+        return since_block
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        since_block = self.get_since_block()
+        if since_block is not None:
+            queryset = queryset.filter(**{self.since_block_field + '__gt': since_block})
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        since_block = self.get_since_block()
+        if since_block is not None and self.tombstone_model and isinstance(response.data, dict):
+            response.data['deleted'] = get_tombstones(self.tombstone_model, since_block)
+        return response
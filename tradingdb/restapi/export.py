@@ -0,0 +1,96 @@
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views import View
+
+# Rows fetched from the server side cursor every time
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object returning what is written, so `csv.writer` builds the rows without buffering them"""
+
+    def write(self, value):
+        return value
+
+
+def get_ndjson_value(value):
+    if isinstance(value, Decimal):
+        return str(value)  # Values don't fit in a json number
+    elif isinstance(value, datetime):
+        return value.isoformat()
+    elif isinstance(value, list):
+        return [get_ndjson_value(element) for element in value]
+    return value
+
+
+def get_csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    elif isinstance(value, list):
+        return ';'.join(str(element) for element in value)
+    return value
+
+
+class ExportView(View):
+    """
+    Streams every row of `get_queryset()` as NDJSON (default) or CSV (`?format=csv`). Rows are built from the
+    `values_list` tuples of `fields`, read from a server side cursor in chunks, so memory doesn't depend on the
+    number of rows exported
+    """
+    queryset = None
+    fields = ()  # `values_list` lookups
+    columns = ()  # names of the exported columns, `get_row` returns them in this order
+    filename = 'export'
+    filterset_class = None
+    formats = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def filter_queryset(self, queryset):
+        if self.filterset_class:
+            filterset = self.filterset_class(self.request.GET, queryset=queryset)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors.as_json())
+            return filterset.qs
+        return queryset
+
+    def get_row(self, values: tuple) -> tuple:
+        return values
+
+    def get_rows(self, queryset):
+        for values in queryset.values_list(*self.fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield self.get_row(values)
+
+    def stream_ndjson(self, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(self.columns, (get_ndjson_value(value) for value in row)))) + '\n'
+
+    def stream_csv(self, rows):
+        writer = csv.writer(Echo())
+        return chain([writer.writerow(self.columns)],
+                     (writer.writerow([get_csv_value(value) for value in row]) for row in rows))
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in self.formats:
+            return HttpResponseBadRequest('Format must be one of: {}'.format(', '.join(self.formats)))
+
+        # Queryset is built (and validated) before streaming, rows are read while the response is sent
+        try:
+            rows = self.get_rows(self.filter_queryset(self.get_queryset()))
+        except ValidationError as e:
+            return HttpResponseBadRequest(e.message, content_type='application/json')
+        content = self.stream_csv(rows) if export_format == 'csv' else self.stream_ndjson(rows)
+        response = StreamingHttpResponse(content, content_type=self.formats[export_format])
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(self.filename, export_format)
+        return response
@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from rest_framework.serializers import ListSerializer
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+def parse_names(value: Optional[str]) -> Optional[Set[str]]:
+    """
+    :return: set of the comma separated names, `None` if the query param is not provided
+    """
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_sparse_fieldsets(request) -> Tuple[Optional[Set[str]], Optional[Set[str]]]:
+    """
+    :return: tuple (fields, expand) with the names of the `fields` and `expand` query params, `None` if not provided
+    """
+    if request is None:
+        return None, None
+    return (parse_names(request.query_params.get(FIELDS_QUERY_PARAM)),
+            parse_names(request.query_params.get(EXPAND_QUERY_PARAM)))
+
+
+def is_field_included(name: str, expandable: bool, fields: Optional[Set[str]], expand: Optional[Set[str]]) -> bool:
+    """
+    Every field is included by default. Passing `fields` only the listed fields are included, passing `expand`
+    only the listed nested objects (`expandable` fields) are included
+    """
+    if fields is not None and name not in fields:
+        return False
+    if expandable and expand is not None and name not in expand:
+        return False
+    return True
+
+
+class SparseFieldsetsSerializerMixin:
+    """
+    Serializer returning only the fields requested with the `fields` and `expand` query params.
+    Only the root serializer (or the child of a root list) is trimmed, nested serializers keep all their fields
+    """
+    expandable_fields = ()  # fields with nested objects
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent.parent if isinstance(self.parent, ListSerializer) else self.parent
+        if parent is not None:
+            return fields
+
+        requested_fields, expand = get_sparse_fieldsets(self.context.get('request'))
+        for name in list(fields):
+            if not is_field_included(name, name in self.expandable_fields, requested_fields, expand):
+                del fields[name]
+        return fields
+
+
+class SparseFieldsetsViewMixin:
+    """
+    Views whose serializer uses `SparseFieldsetsSerializerMixin`, joining and prefetching only the relations
+    needed by the requested fields. `select_related_fields` and `prefetch_related_fields` map every field
+    to the relation paths it needs
+    """
+    select_related_fields: Dict[str, Iterable[str]] = {}
+    prefetch_related_fields: Dict[str, Iterable[str]] = {}
+
+    def is_field_included(self, name: str) -> bool:
+        fields, expand = get_sparse_fieldsets(getattr(self, 'request', None))
+        return is_field_included(name, name in self.get_serializer_class().expandable_fields, fields, expand)
+
+    def get_related_paths(self, related_fields: Dict[str, Iterable[str]]) -> list:
+        paths = []
+        for name, field_paths in related_fields.items():
+            if self.is_field_included(name):
+                paths.extend(path for path in field_paths if path not in paths)
+        return paths
+
+    def select_requested_related(self, queryset):
+        """
+        :return: queryset joining and prefetching only the relations of the requested fields
+        """
+        select_related = self.get_related_paths(self.select_related_fields)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = self.get_related_paths(self.prefetch_related_fields)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
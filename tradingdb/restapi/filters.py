@@ -1,12 +1,18 @@
+import json
 from datetime import timedelta
 
+from django.db import connection
 from django.utils import timezone
 from django_eth_events.utils import normalize_address_without_0x
 from django_filters import rest_framework as filters
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       LimitOffsetPagination)
 
-from tradingdb.relationaldb.models import (CentralizedOracle, Event, Market,
-                                           Order, OutcomeTokenBalance)
+from tradingdb.relationaldb.models import (CentralizedOracle, Event,
+                                           EventDescription, MarketSummary,
+                                           Order, OutcomeTokenBalance,
+                                           PriceCandle)
 
 
 class InvalidEthereumAddressForFilter(Exception):
@@ -25,6 +31,141 @@ class DefaultPagination(LimitOffsetPagination):
     default_limit = 100
 
 
+class KeysetPagination(CursorPagination):
+    """
+    Keyset pagination, pages are filtered comparing the `ordering` columns as a row with the key of the last row
+    of the previous page, e.g. `(creation_block, id) > (%s, %s)`, so there's no OFFSET and no COUNT(*).
+    `ordering` must be ascending and unique. Cursors are opaque, they encode the key and the direction
+    """
+    page_size = DefaultPagination.default_limit
+    max_page_size = DefaultPagination.max_limit
+    page_size_query_param = DefaultPagination.limit_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+        key = self.decode_key(queryset.model, self.cursor.position) if self.cursor else None
+
+        queryset = queryset.order_by(*[('-' + name) if reverse else name for name in self.ordering])
+        if key is not None:
+            queryset = self.filter_key(queryset, key, reverse)
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = key is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+
+        if self.page:
+            self.next_position = self.encode_key(queryset.model, self.page[-1])
+            self.previous_position = self.encode_key(queryset.model, self.page[0])
+        else:
+            # Empty page, moving in the other direction starts again from the same key
+            self.next_position = self.previous_position = self.cursor.position if self.cursor else None
+
+        if self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def filter_key(self, queryset, key, reverse: bool):
+        opts = queryset.model._meta
+        fields = [opts.get_field(name) for name in self.ordering]
+        columns = ['{}.{}'.format(connection.ops.quote_name(field.model._meta.db_table),
+                                  connection.ops.quote_name(field.column)) for field in fields]
+        where = '({}) {} ({})'.format(', '.join(columns), '<' if reverse else '>', ', '.join(['%s'] * len(columns)))
+        return queryset.extra(where=[where], params=key)
+
+    def encode_key(self, model, row) -> str:
+        """
+        :param row: model instance or `values()` dictionary
+        :return: json list with the `ordering` values of the row
+        """
+        key = []
+        for name in self.ordering:
+            value = row[name] if isinstance(row, dict) else getattr(row, model._meta.get_field(name).attname)
+            key.append(None if value is None else str(value))
+        return json.dumps(key)
+
+    def decode_key(self, model, position: str) -> list:
+        if position is None:
+            return None
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.ordering):
+                raise ValueError('Expected {} values'.format(len(self.ordering)))
+            return [model._meta.get_field(name).to_python(value) for name, value in zip(self.ordering, values)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+
+class OptionalKeysetPagination(DefaultPagination):
+    """
+    Limit/offset pagination by default. Passing the `cursor` query param (empty for the first page) switches to
+    `KeysetPagination` ordered by `keyset_ordering`, returning opaque `next` and `previous` cursors and no `count`
+    """
+    keyset_ordering = ('id',)
+
+    def __init__(self):
+        self.keyset_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset_paginator = KeysetPagination()
+            self.keyset_paginator.ordering = self.keyset_ordering
+            return self.keyset_paginator.paginate_queryset(queryset, request, view=view)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.keyset_paginator:
+            return self.keyset_paginator.get_html_context()
+        return super().get_html_context()
+
+    def get_schema_fields(self, view):
+        cursor_field = KeysetPagination().get_schema_fields(view)[0]
+        return super().get_schema_fields(view) + [cursor_field]
+
+
+class BlockKeysetPagination(OptionalKeysetPagination):
+    keyset_ordering = ('creation_block', 'id')
+
+
+class MarketSummaryKeysetPagination(OptionalKeysetPagination):
+    keyset_ordering = ('creation_date_time', 'market')
+
+
+class PriceCandleKeysetPagination(OptionalKeysetPagination):
+    keyset_ordering = ('start_date_time', 'outcome_index')
+
+
+def get_matching_oracles(text: str):
+    """
+    :return: queryset of the centralized oracles whose event description matches `text`, to be used as subquery
+    """
+    return CentralizedOracle.objects.filter(event_description__in=EventDescription.objects.matching(text).values('pk'))
+
+
 class CentralizedOracleFilter(filters.FilterSet):
     creator = filters.AllValuesMultipleFilter()
     creation_date_time = filters.DateTimeFromToRangeFilter()
@@ -33,6 +174,7 @@ class CentralizedOracleFilter(filters.FilterSet):
     title = filters.CharFilter(field_name='event_description__title', lookup_expr='contains')
     description = filters.CharFilter(field_name='event_description__description', lookup_expr='contains')
     resolution_date = filters.DateTimeFromToRangeFilter(field_name='event_description__resolution_date')
+    search = filters.CharFilter(method='filter_search')
 
     ordering = filters.OrderingFilter(
         fields=(
@@ -43,7 +185,11 @@ class CentralizedOracleFilter(filters.FilterSet):
 
     class Meta:
         model = CentralizedOracle
-        fields = ('creator', 'creation_date_time', 'is_outcome_set', 'owner', 'title', 'description', 'ordering')
+        fields = ('creator', 'creation_date_time', 'is_outcome_set', 'owner', 'title', 'description', 'search',
+                  'ordering')
+
+    def filter_search(self, queryset, name, value):
+        return queryset.filter(event_description__in=EventDescription.objects.matching(value).values('pk'))
 
 
 class EventFilter(filters.FilterSet):
@@ -54,6 +200,8 @@ class EventFilter(filters.FilterSet):
     oracle_creator = filters.AllValuesMultipleFilter(field_name='oracle__creator')
     oracle_creation_date_time = filters.DateTimeFromToRangeFilter(field_name='oracle__creation_date_time')
     oracle_is_outcome_set = filters.BooleanFilter(field_name='oracle__is_outcome_set')
+    event_type = filters.ChoiceFilter(choices=Event.event_types)
+    search = filters.CharFilter(method='filter_search')
 
     ordering = filters.OrderingFilter(
         fields=(
@@ -65,7 +213,10 @@ class EventFilter(filters.FilterSet):
     class Meta:
         model = Event
         fields = ('creator', 'creation_date_time', 'is_winning_outcome_set', 'oracle_factory', 'oracle_creator',
-                  'oracle_creation_date_time', 'oracle_is_outcome_set')
+                  'oracle_creation_date_time', 'oracle_is_outcome_set', 'event_type', 'search')
+
+    def filter_search(self, queryset, name, value):
+        return queryset.filter(oracle__in=get_matching_oracles(value).values('pk'))
 
 
 class AddressInFilter(filters.BaseInFilter, filters.CharFilter):
@@ -73,38 +224,46 @@ class AddressInFilter(filters.BaseInFilter, filters.CharFilter):
 
 
 class MarketFilter(filters.FilterSet):
+    """
+    Filters the market summaries, every field is in the same table
+    """
     creator = filters.CharFilter(method='filter_creator')  # Accept multiple creators split by comma
     creation_date_time = filters.DateTimeFromToRangeFilter()
     market_maker = filters.AllValuesMultipleFilter()
-    event_oracle_factory = filters.AllValuesMultipleFilter(field_name='event__oracle__factory')
-    event_oracle_creator = filters.AllValuesMultipleFilter(field_name='event__oracle__creator')
-    event_oracle_creation_date_time = filters.DateTimeFromToRangeFilter(field_name='event__oracle__creation_date_time')
-    # TODO refactor, maybe duplicate resolution_date from event_description to market
-    resolution_date_time = filters.DateTimeFromToRangeFilter(field_name='event__oracle__centralizedoracle__event_description__resolution_date')
-    event_oracle_is_outcome_set = filters.BooleanFilter(field_name='event__oracle__is_outcome_set')
-    collateral_token = filters.CharFilter(field_name='event__collateral_token', method='filter_collateral_token')
+    event_oracle_factory = filters.AllValuesMultipleFilter(field_name='oracle_factory')
+    event_oracle_creator = filters.AllValuesMultipleFilter(field_name='oracle_creator')
+    event_oracle_creation_date_time = filters.DateTimeFromToRangeFilter(field_name='oracle_creation_date_time')
+    resolution_date_time = filters.DateTimeFromToRangeFilter(field_name='resolution_date')
+    event_oracle_is_outcome_set = filters.BooleanFilter(field_name='oracle_is_outcome_set')
+    collateral_token = filters.CharFilter(method='filter_collateral_token')
+    search = filters.CharFilter(method='filter_search')
 
     ordering = filters.OrderingFilter(
         fields=(
             ('creation_date_time', 'creation_date_order'),
-            ('event__oracle__creation_date_time', 'event_oracle_creation_date_order'),
-            ('resolution_date_time', 'resolution_date_order'),
+            ('oracle_creation_date_time', 'event_oracle_creation_date_order'),
+            ('resolution_date', 'resolution_date_order'),
         )
     )
 
     class Meta:
-        model = Market
+        model = MarketSummary
         fields = ('creator', 'creation_date_time', 'market_maker', 'event_oracle_factory', 'event_oracle_creator',
                   'event_oracle_creation_date_time', 'event_oracle_is_outcome_set',
-                  'resolution_date_time', 'collateral_token',)
+                  'resolution_date_time', 'collateral_token', 'search',)
 
     def filter_creator(self, queryset, name, value):
         creators = [normalize_address_or_raise(creator) for creator in value.split(',')]
         return queryset.filter(creator__in=creators)
 
     def filter_collateral_token(self, queryset, name, value):
+        # Collateral tokens are stored in lower case, so the index can be used
         value = normalize_address_or_raise(value)
-        return queryset.filter(event__collateral_token__iexact=value)
+        return queryset.filter(collateral_token=value.lower())
+
+    def filter_search(self, queryset, name, value):
+        # Event descriptions are searched in a subquery, using their indexes
+        return queryset.filter(oracle__in=get_matching_oracles(value).values('pk'))
 
 
 class MarketTradesFilter(filters.FilterSet):
@@ -122,8 +281,9 @@ class MarketTradesFilter(filters.FilterSet):
         fields = ('creation_date_time', 'collateral_token',)
 
     def __init__(self, data=None, *args, **kwargs):
-        # if filterset is bound, use initial values as defaults
-        if data is not None and not 'creation_date_time_after' in data and not 'creation_date_time_before' in data:
+        # if filterset is bound, use initial values as defaults. Changes since a block are not limited by date
+        if (data is not None and not 'creation_date_time_after' in data and not 'creation_date_time_before' in data
+                and 'since_block' not in data):
             data = data.copy()
             data['creation_date_time_after'] = (timezone.now() - timedelta(days=14)).strftime('%Y-%m-%d %H:%M:%S')
             data['creation_date_time_before'] = timezone.now()
@@ -135,6 +295,15 @@ class MarketTradesFilter(filters.FilterSet):
         return queryset.filter(market__event__collateral_token__iexact=value)
 
 
+class TradesExportFilter(filters.FilterSet):
+    """Same as `MarketTradesFilter` without the default date range, exports return the whole history"""
+    creation_date_time = filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = Order
+        fields = ('creation_date_time',)
+
+
 class MarketSharesFilter(filters.FilterSet):
     creation_date_time = filters.DateTimeFromToRangeFilter()
     collateral_token = filters.CharFilter(method='filter_collateral_token')
@@ -152,3 +321,25 @@ class MarketSharesFilter(filters.FilterSet):
     def filter_collateral_token(self, queryset, name, value):
         value = normalize_address_or_raise(value)
         return queryset.filter(outcome_token__event__collateral_token__iexact=value)
+
+
+class PriceCandleFilter(filters.FilterSet):
+    """Candles of one resolution (`1h` by default), optionally for only one outcome and a date range"""
+    resolution = filters.ChoiceFilter(choices=[(name, name) for _, name in PriceCandle.resolutions],
+                                      method='filter_resolution')
+    outcome_index = filters.NumberFilter()
+    start_date_time = filters.DateTimeFromToRangeFilter()
+
+    class Meta:
+        model = PriceCandle
+        fields = ('resolution', 'outcome_index', 'start_date_time',)
+
+    def __init__(self, data=None, *args, **kwargs):
+        if data is not None and 'resolution' not in data:
+            data = data.copy()
+            data['resolution'] = '1h'
+
+        super().__init__(data, *args, **kwargs)
+
+    def filter_resolution(self, queryset, name, value):
+        return queryset.filter(resolution=PriceCandle.resolutions_dict[value])
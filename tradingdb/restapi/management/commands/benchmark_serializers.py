@@ -0,0 +1,66 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from tradingdb.relationaldb.models import Order, OutcomeTokenBalance
+
+from ...views import AccountSharesView, AccountTradesView, MarketListView
+
+
+class Command(BaseCommand):
+    help = ('Measures the rows per second serialized by the trades, shares and markets list serializers and by '
+            'their values serializers, using the rows in the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1000,
+            dest='rows',
+            help='Rows serialized every time',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            dest='repeat',
+            help='Times every serializer is run, the best time is used',
+        )
+
+    @staticmethod
+    def measure(serialize, repeat: int) -> (int, float):
+        """
+        :return: tuple with the number of rows serialized and the best time in seconds
+        """
+        best = None
+        rows = 0
+        for _ in range(repeat):
+            start = perf_counter()
+            rows = len(serialize())
+            elapsed = perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return rows, best
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        # Querysets loaded like the list views do, every field is included without request
+        benchmarks = (
+            ('trades', AccountTradesView(), AccountTradesView().select_requested_related(Order.objects.order_by('id'))),
+            ('shares', AccountSharesView(),
+             AccountSharesView().select_requested_related(OutcomeTokenBalance.objects.order_by('id'))),
+            ('markets', MarketListView(), MarketListView().get_markets_queryset().order_by('address')),
+        )
+        for name, view, queryset in benchmarks:
+            queryset = queryset[:rows]
+            values_serializer = view.values_serializer_class(view.values_serializer_class.fields)
+            serializer_rows, serializer_time = self.measure(
+                lambda: view.serializer_class(queryset.all(), many=True).data, repeat)
+            values_rows, values_time = self.measure(
+                lambda: values_serializer.to_representation(values_serializer.get_values(queryset.all())), repeat)
+            if not serializer_rows:
+                self.stdout.write(self.style.WARNING('{}: no rows'.format(name)))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                '{}: {} rows, serializer {:.0f} rows/s, values serializer {:.0f} rows/s ({:.1f}x)'.format(
+                    name, serializer_rows, serializer_rows / serializer_time, values_rows / values_time,
+                    serializer_time / values_time)))
@@ -0,0 +1,142 @@
+import datetime
+import decimal
+import re
+from collections import OrderedDict
+
+import msgpack
+from django.http.multipartparser import parse_header
+from django.utils.encoding import force_text
+from django.utils.functional import Promise
+from djangorestframework_camel_case.util import camelize as camelize_iterable
+from djangorestframework_camel_case.util import (camelize_re,
+                                                 underscore_to_camel)
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Keys converted to camelCase, they are the field names of the serializers so the cache stays small
+KEY_CACHE_SIZE = 10000
+_camel_case_keys = {}
+
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+# MessagePack extension type of the integers not fitting in 64 bits, its data is the big-endian two's complement
+BIG_INTEGER_EXT_TYPE = 1
+COLUMNS_LAYOUT = 'columns'
+
+
+def encode_datetime(value: datetime.datetime) -> str:
+    """Datetime encoded like `rest_framework.utils.encoders.JSONEncoder` does"""
+    representation = value.isoformat()
+    if representation.endswith('+00:00'):
+        representation = representation[:-6] + 'Z'
+    return representation
+
+
+def camelize_key(key: str) -> str:
+    camel_case_key = _camel_case_keys.get(key)
+    if camel_case_key is None:
+        camel_case_key = re.sub(camelize_re, underscore_to_camel, key) if '_' in key else key
+        if len(_camel_case_keys) < KEY_CACHE_SIZE:
+            _camel_case_keys[key] = camel_case_key
+    return camel_case_key
+
+
+def camelize(data, converters):
+    """
+    Converts the keys of the dictionaries to camelCase like `djangorestframework_camel_case.util.camelize`, and the
+    values with a type in `converters`
+    :param converters: dictionary type -> function converting the values of the type
+    """
+    data_type = type(data)
+    converter = converters.get(data_type)
+    if converter is not None:
+        return converter(data)
+    if data_type in SCALAR_TYPES:
+        return data
+    if isinstance(data, dict):
+        result = OrderedDict()
+        for key, value in data.items():
+            if isinstance(key, Promise):
+                key = force_text(key)
+            if isinstance(key, str):
+                key = camelize_key(key)
+            result[key] = camelize(value, converters)
+        return result
+    if isinstance(data, (list, tuple)):
+        return [camelize(item, converters) for item in data]
+    # Lazy strings, querysets and other iterables
+    return camelize_iterable(data)
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """
+    Renders the same bytes as `djangorestframework_camel_case.render.CamelCaseJSONRenderer`. Key conversions are
+    cached, and decimals and datetimes are converted while walking the data instead of by `JSONEncoder.default`,
+    so the JSON encoder doesn't call back Python for every one of them
+    """
+    value_converters = {
+        decimal.Decimal: float,  # Serializers coerce decimals to strings, the remaining ones are encoded as numbers
+        datetime.datetime: encode_datetime,
+    }
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(camelize(data, self.value_converters), accepted_media_type, renderer_context)
+
+
+def pack_integer(value: int):
+    """
+    :return: the integer if MessagePack can encode it, a `BIG_INTEGER_EXT_TYPE` extension otherwise
+    """
+    if -2 ** 63 <= value < 2 ** 64:
+        return value
+    return msgpack.ExtType(BIG_INTEGER_EXT_TYPE, value.to_bytes((value.bit_length() + 8) // 8, 'big', signed=True))
+
+
+def to_columns(rows: list):
+    """
+    :return: dictionary field -> list with the value of every row (`None` if the row doesn't have it), the rows
+    are returned unchanged if they are not dictionaries
+    """
+    if not all(isinstance(row, dict) for row in rows):
+        return rows
+    keys = OrderedDict.fromkeys(key for row in rows for key in row)
+    return OrderedDict((key, [row.get(key) for row in rows]) for key in keys)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack with the camelCase keys of the JSON responses. Amounts are integers when the view supports
+    it (`integer_amounts`), integers not fitting in 64 bits are encoded as `BIG_INTEGER_EXT_TYPE` extensions.
+    With the `layout=columns` media type param (`Accept: application/msgpack; layout=columns`) list results are
+    column oriented, a dictionary field -> list with the value of every row
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    integer_amounts = True
+    value_converters = {
+        int: pack_integer,
+        decimal.Decimal: float,
+        datetime.datetime: encode_datetime,
+    }
+
+    def get_layout(self, accepted_media_type):
+        if accepted_media_type:
+            _, params = parse_header(accepted_media_type.encode('ascii'))
+            layout = params.get('layout')
+            if layout:
+                return layout.decode('ascii')
+        return None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+        data = camelize(data, self.value_converters)
+        if self.get_layout(accepted_media_type) == COLUMNS_LAYOUT:
+            if isinstance(data, dict) and isinstance(data.get('results'), list):
+                data['results'] = to_columns(data['results'])
+            elif isinstance(data, list):
+                data = to_columns(data)
+        # Other types (dates, UUIDs...) are encoded like in the JSON responses
+        return msgpack.packb(data, use_bin_type=True, default=JSONEncoder().default)
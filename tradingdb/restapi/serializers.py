@@ -6,9 +6,12 @@ from tradingdb.relationaldb.models import (CategoricalEvent,
                                            CategoricalEventDescription,
                                            CentralizedOracle, Market, Order,
                                            OutcomeToken, OutcomeTokenBalance,
-                                           ScalarEvent, ScalarEventDescription,
+                                           PriceCandle, ScalarEvent,
+                                           ScalarEventDescription,
                                            TournamentParticipant)
 
+from .fieldsets import SparseFieldsetsSerializerMixin
+
 
 class ContractSerializer(serializers.BaseSerializer):
     def to_representation(self, instance):
@@ -34,22 +37,12 @@ class EventDescriptionSerializer(serializers.BaseSerializer):
             'resolution_date': instance.resolution_date,
             'ipfs_hash': instance.ipfs_hash
         }
-        if isinstance(instance, ScalarEventDescription):
-            scalar_event = instance
-            result['unit'] = scalar_event.unit
-            result['decimals'] = scalar_event.decimals
-            return remove_null_values(result)
-        elif isinstance(instance, CategoricalEventDescription):
-            categorical_event = instance
-            result['outcomes'] = categorical_event.outcomes
-            return remove_null_values(result)
-        try:
-            scalar_event = instance.scalareventdescription
-            result['unit'] = scalar_event.unit
-            result['decimals'] = scalar_event.decimals
-        except:
-            categorical_event = instance.categoricaleventdescription
-            result['outcomes'] = categorical_event.outcomes
+        event_description = instance.get_subclass_instance()
+        if isinstance(event_description, ScalarEventDescription):
+            result['unit'] = event_description.unit
+            result['decimals'] = event_description.decimals
+        elif isinstance(event_description, CategoricalEventDescription):
+            result['outcomes'] = event_description.outcomes
 
         return remove_null_values(result)
 
@@ -65,7 +58,7 @@ class OracleSerializer(serializers.Serializer):
         return remove_null_values(response)
 
 
-class CentralizedOracleSerializer(serializers.ModelSerializer):
+class CentralizedOracleSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     contract = ContractSerializer(source='*', many=False, read_only=True)
     is_outcome_set = serializers.BooleanField()
     outcome = serializers.IntegerField()
@@ -73,6 +66,8 @@ class CentralizedOracleSerializer(serializers.ModelSerializer):
     event_description = EventDescriptionSerializer(many=False, read_only=True)
     type = serializers.SerializerMethodField()
 
+    expandable_fields = ('event_description',)
+
     class Meta:
         model = CentralizedOracle
         fields = ('contract', 'is_outcome_set', 'outcome', 'owner', 'event_description', 'type',)
@@ -122,17 +117,15 @@ class ScalarEventSerializer(serializers.ModelSerializer):
 class EventSerializer(serializers.Serializer):
 
     def to_representation(self, instance):
-        try:
-            categorical_event = instance.categoricalevent
-            result = CategoricalEventSerializer(categorical_event).to_representation(categorical_event)
-            return remove_null_values(result)
-        except:
-            scalar_event = instance.scalarevent
-            result = ScalarEventSerializer(scalar_event).to_representation(scalar_event)
-            return remove_null_values(result)
+        event = instance.get_subclass_instance()
+        if event.is_categorical():
+            result = CategoricalEventSerializer(event).to_representation(event)
+        else:
+            result = ScalarEventSerializer(event).to_representation(event)
+        return remove_null_values(result)
 
 
-class MarketSerializer(serializers.ModelSerializer):
+class MarketSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     contract = ContractSerializer(source='*', many=False, read_only=True)
     event = EventSerializer(many=False, read_only=True)
     market_maker = serializers.CharField()
@@ -145,6 +138,8 @@ class MarketSerializer(serializers.ModelSerializer):
     collected_fees = serializers.DecimalField(max_digits=80, decimal_places=0)
     marginal_prices = serializers.ListField(child=serializers.DecimalField(max_digits=5, decimal_places=4))
 
+    expandable_fields = ('event',)
+
     class Meta:
         model = Market
         fields = ('contract', 'event', 'market_maker', 'fee', 'funding', 'net_outcome_tokens_sold',
@@ -165,7 +160,7 @@ class OutcomeTokenSerializer(serializers.ModelSerializer):
         fields = ('event', 'index', 'totalSupply', 'address')
 
 
-class MarketTradesSerializer(serializers.ModelSerializer):
+class MarketTradesSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
     """Serializes the list of orders (trades) for the given market"""
     date = serializers.DateTimeField(source="creation_date_time", read_only=True)
     net_outcome_tokens_sold = serializers.ListField(
@@ -181,11 +176,13 @@ class MarketTradesSerializer(serializers.ModelSerializer):
     owner = serializers.SerializerMethodField()
     collateral_token = serializers.SerializerMethodField()
 
+    expandable_fields = ('outcome_token', 'event_description',)
+
     class Meta:
         model = Order
         fields = ('date', 'net_outcome_tokens_sold', 'marginal_prices', 'outcome_token',
                   'outcome_token_count', 'order_type', 'cost', 'profit', 'event_description', 'owner',
-                  'collateral_token',)
+                  'collateral_token', 'transaction_hash',)
 
     def get_order_type(self, obj):
         return get_order_type(obj)
@@ -235,7 +232,7 @@ class MarketParticipantTradesSerializer(serializers.ModelSerializer):
         fields = ('date', 'outcome_token', 'outcome_token_count', 'market', 'owner', 'order_type', 'profit', 'cost', 'marginal_prices', )
 
     def get_market(self, obj):
-        return add_0x_prefix(obj.market.address)
+        return add_0x_prefix(obj.market_id)
 
     def get_owner(self, obj):
         return add_0x_prefix(obj.sender)
@@ -254,13 +251,15 @@ class MarketParticipantTradesSerializer(serializers.ModelSerializer):
         return remove_null_values(response)
 
 
-class OutcomeTokenBalanceSerializer(serializers.ModelSerializer):
+class OutcomeTokenBalanceSerializer(SparseFieldsetsSerializerMixin, serializers.ModelSerializer):
 
     outcome_token = OutcomeTokenSerializer()
     event_description = serializers.SerializerMethodField()
     marginal_price = serializers.SerializerMethodField()
     collateral_token = serializers.SerializerMethodField()
 
+    expandable_fields = ('outcome_token', 'event_description',)
+
     class Meta:
         model = OutcomeTokenBalance
         fields = ('outcome_token', 'owner', 'balance', 'event_description', 'marginal_price', 'collateral_token',)
@@ -297,3 +296,13 @@ class OlympiaScoreboardSerializer(serializers.ModelSerializer):
 
     def get_account(self, obj):
         return add_0x_prefix(obj.address)
+
+
+class PriceCandleSerializer(serializers.ModelSerializer):
+    """Serializes the candle of a market outcome"""
+    class Meta:
+        model = PriceCandle
+        fields = ('outcome_index', 'resolution', 'start_date', 'open', 'high', 'low', 'close', 'volume', 'trades',)
+
+    resolution = serializers.CharField(source='get_resolution_display')
+    start_date = serializers.DateTimeField(source='start_date_time')
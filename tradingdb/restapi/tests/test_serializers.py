@@ -3,13 +3,30 @@ import json
 
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 
-from tradingdb.relationaldb.tests.factories import (CategoricalEventFactory,
+from tradingdb.relationaldb.models import (Event, EventDescription, Market,
+                                           Order, OutcomeTokenBalance)
+from tradingdb.relationaldb.tests.factories import (BuyOrderFactory,
+                                                    CategoricalEventFactory,
                                                     CentralizedOracleFactory,
+                                                    MarketFactory,
+                                                    OracleFactory,
+                                                    OutcomeTokenBalanceFactory,
+                                                    OutcomeTokenFactory,
+                                                    ScalarEventDescriptionFactory,
                                                     ScalarEventFactory,
+                                                    SellOrderFactory,
+                                                    ShortSellOrderFactory,
                                                     TournamentParticipantBalanceFactory)
 
+from ..serializers import (MarketSerializer, MarketTradesSerializer,
+                           OutcomeTokenBalanceSerializer)
+from ..values_serializers import (MarketTradesValuesSerializer,
+                                  MarketValuesSerializer,
+                                  OutcomeTokenBalanceValuesSerializer)
+
 
 class TestSerializers(APITestCase):
 
@@ -25,6 +42,21 @@ class TestSerializers(APITestCase):
         events_response = self.client.get(reverse('api:events'), content_type='application/json')
         self.assertEqual(json.loads(events_response.content).get('results')[0]['type'], 'CATEGORICAL')
 
+    def test_event_types(self):
+        scalar_event = ScalarEventFactory(oracle__event_description=ScalarEventDescriptionFactory())
+        categorical_event = CategoricalEventFactory()
+        self.assertEqual(Event.objects.get(address=scalar_event.address).event_type, 'SCALAR')
+        self.assertEqual(Event.objects.get(address=categorical_event.address).event_type, 'CATEGORICAL')
+        event_description = EventDescription.objects.get(pk=scalar_event.oracle.event_description.pk)
+        self.assertEqual(event_description.description_type, 'SCALAR')
+        self.assertEqual(event_description.get_subclass_instance().unit,
+                         scalar_event.oracle.event_description.unit)
+
+        events_response = self.client.get(reverse('api:events') + '?event_type=SCALAR',
+                                          content_type='application/json')
+        events = json.loads(events_response.content).get('results')
+        self.assertEqual([event['type'] for event in events], ['SCALAR'])
+
     def test_oracle_types(self):
         centralized_oracle = CentralizedOracleFactory()
         centralized_response = self.client.get(reverse('api:centralized-oracles'), content_type='application/json')
@@ -38,3 +70,56 @@ class TestSerializers(APITestCase):
         self.assertEqual(scoreboard_response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(json.loads(scoreboard_response.content).get('results')), 2)
         self.assertTrue('account' in json.loads(scoreboard_response.content).get('results')[0])
+
+    def test_market_trades_serializer(self):
+        market = MarketFactory()
+        BuyOrderFactory(market=market, creation_block=1, cost=10)
+        SellOrderFactory(market=market, creation_block=2, profit=5)
+        ShortSellOrderFactory(market=market, creation_block=3, cost=7)
+
+        queryset = Order.objects.filter(market=market).order_by('creation_block').select_related(
+            'outcome_token',
+            'outcome_token__event',
+            'outcome_token__event__oracle',
+            'outcome_token__event__oracle__centralizedoracle',
+            'outcome_token__event__oracle__centralizedoracle__event_description',
+            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
+            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
+        )
+        # Order types are read from the orders table, no query is done per trade
+        with self.assertNumQueries(1):
+            trades = MarketTradesSerializer(queryset, many=True).data
+        self.assertEqual([(trade['order_type'], trade['cost'], trade['profit']) for trade in trades],
+                         [('BUY', '10', 'None'), ('SELL', 'None', '5'), ('SHORT SELL', '7', 'None')])
+
+    def assertValuesSerializerOutput(self, values_serializer_class, queryset):
+        """Asserts the values serializer renders the same JSON as its serializer, with every field and with some"""
+        serializer_class = values_serializer_class.serializer_class
+        for field_names in (values_serializer_class.fields, list(values_serializer_class.fields)[1::2]):
+            values_serializer = values_serializer_class(field_names)
+            expected = [{name: value for name, value in item.items() if name in field_names}
+                        for item in serializer_class(queryset, many=True).data]
+            data = values_serializer.to_representation(values_serializer.get_values(queryset))
+            self.assertEqual(json.loads(JSONRenderer().render(data)), json.loads(JSONRenderer().render(expected)))
+
+    def test_values_serializers(self):
+        scalar_event = ScalarEventFactory(oracle__event_description=ScalarEventDescriptionFactory())
+        categorical_event = CategoricalEventFactory()
+        scalar_market = MarketFactory(event=scalar_event, funding=None)
+        categorical_market = MarketFactory(event=categorical_event)
+        scalar_outcome_token = OutcomeTokenFactory(event=scalar_event, index=0)
+        categorical_outcome_token = OutcomeTokenFactory(event=categorical_event, index=1)
+        BuyOrderFactory(market=scalar_market, outcome_token=scalar_outcome_token, creation_block=1, cost=10)
+        SellOrderFactory(market=categorical_market, outcome_token=categorical_outcome_token, creation_block=2,
+                         profit=5)
+        ShortSellOrderFactory(market=categorical_market, outcome_token=categorical_outcome_token, creation_block=3,
+                              cost=7)
+        OutcomeTokenBalanceFactory(outcome_token=scalar_outcome_token)
+        OutcomeTokenBalanceFactory(outcome_token=categorical_outcome_token)
+        # Event without market and not centralized oracle
+        OutcomeTokenBalanceFactory(outcome_token__event=CategoricalEventFactory(oracle=OracleFactory()))
+
+        self.assertValuesSerializerOutput(MarketTradesValuesSerializer, Order.objects.order_by('creation_block'))
+        self.assertValuesSerializerOutput(OutcomeTokenBalanceValuesSerializer,
+                                          OutcomeTokenBalance.objects.order_by('id'))
+        self.assertValuesSerializerOutput(MarketValuesSerializer, Market.objects.order_by('address'))
@@ -1,15 +1,26 @@
 # -*- coding: utf-8 -*-
+import json
 from datetime import timedelta
+from decimal import Decimal
 
+import msgpack
+
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from djangorestframework_camel_case.render import \
+    CamelCaseJSONRenderer as PackageCamelCaseJSONRenderer
 from rest_framework import status
+from django_eth_events.models import Daemon
 from rest_framework.test import APITestCase
 
 from gnosis.utils import add_0x_prefix
+from tradingdb.relationaldb.delta_sync import count_rollback
 from tradingdb.relationaldb.models import (CentralizedOracle, Market,
-                                           ShortSellOrder,
-                                           TournamentParticipant)
+                                           PriceCandle, ShortSellOrder,
+                                           Tombstone, TournamentParticipant)
 from tradingdb.relationaldb.tests.factories import (BuyOrderFactory,
                                                     CategoricalEventFactory,
                                                     CentralizedOracleFactory,
@@ -18,6 +29,8 @@ from tradingdb.relationaldb.tests.factories import (BuyOrderFactory,
                                                     OutcomeTokenFactory,
                                                     TournamentParticipantBalanceFactory)
 
+from ..renderers import BIG_INTEGER_EXT_TYPE, CamelCaseJSONRenderer
+
 
 class TestViews(APITestCase):
 
@@ -241,6 +254,60 @@ class TestViews(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.json().get('results')), 1)
 
+    def test_since_block(self):
+        market = MarketFactory(last_modified_block=5)
+        changed_market = MarketFactory(last_modified_block=20)
+        outcome_token = OutcomeTokenFactory(event=market.event)
+        OutcomeTokenBalanceFactory(outcome_token=outcome_token, last_modified_block=5)
+        changed_balance = OutcomeTokenBalanceFactory(outcome_token=outcome_token, last_modified_block=20)
+        Tombstone.objects.create(block_number=5, model='relationaldb.outcometokenbalance',
+                                 key={'owner': '{:040d}'.format(1), 'outcome_token': outcome_token.address})
+        Tombstone.objects.create(block_number=15, model='relationaldb.outcometokenbalance',
+                                 key={'owner': '{:040d}'.format(2), 'outcome_token': outcome_token.address})
+
+        url = reverse('api:all-shares', kwargs={'market_address': market.address})
+        response = self.client.get(url + '?since_block=10', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['owner'] for result in response.json()['results']], [changed_balance.owner])
+        self.assertEqual(response.json()['deleted'], [{'owner': '{:040d}'.format(2),
+                                                       'outcome_token': outcome_token.address}])
+
+        # Without `since_block` every row is returned and there are no tombstones
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertNotIn('deleted', response.json())
+
+        response = self.client.get(reverse('api:markets') + '?since_block=10', content_type='application/json')
+        self.assertEqual([result['contract']['address'] for result in response.json()['results']],
+                         [add_0x_prefix(changed_market.address)])
+        self.assertEqual(response.json()['deleted'], [])
+
+        response = self.client.get(url + '?since_block=-1', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fieldsets(self):
+        market = MarketFactory()
+        BuyOrderFactory(market=market, creation_date_time=timezone.now())
+
+        url = reverse('api:markets') + '?fields=contract,marginal_prices,trading_volume'
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()['results'][0]), {'contract', 'marginal_prices', 'trading_volume'})
+
+        # Nested objects not listed in `expand` are dropped, with their joins
+        url = reverse('api:trades-by-market', kwargs={'market_address': market.address}) + '?expand='
+        with self.assertNumQueries(3):
+            response = self.client.get(url, content_type='application/json')
+        trade = response.json()['results'][0]
+        self.assertNotIn('outcome_token', trade)
+        self.assertNotIn('event_description', trade)
+        self.assertIn('collateral_token', trade)
+
+        url = reverse('api:trades-by-market', kwargs={'market_address': market.address}) + '?expand=event_description'
+        trade = self.client.get(url, content_type='application/json').json()['results'][0]
+        self.assertNotIn('outcome_token', trade)
+        self.assertIn('title', trade['event_description'])
+
     def test_market_trades(self):
         url = reverse('api:trades-by-market', kwargs={'market_address': '{:040d}'.format(1000)})
         trades_response = self.client.get(url, content_type='application/json')
@@ -365,6 +432,175 @@ class TestViews(APITestCase):
         trades_response = self.client.get(url, content_type='application/json')
         self.assertEqual(len(trades_response.json().get('results')), 0)
 
+    @override_settings(REST_API_CACHE_TIMEOUT=60, ALLOWED_HOSTS=['testserver', 'other.host'])
+    def test_block_cache(self):
+        cache.clear()
+        daemon = Daemon.get_solo()
+        MarketFactory()
+        url = reverse('api:markets')
+        markets_response = self.client.get(url, content_type='application/json')
+        self.assertEqual(markets_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(markets_response.json().get('results')), 1)
+        etag = markets_response['ETag']
+
+        # Responses don't change until a new block is processed
+        MarketFactory()
+        markets_response = self.client.get(url, content_type='application/json')
+        self.assertEqual(len(markets_response.json().get('results')), 1)
+        self.assertEqual(markets_response['ETag'], etag)
+        not_modified_response = self.client.get(url, content_type='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified_response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Query params are part of the key
+        self.assertNotEqual(self.client.get(url + '?limit=1', content_type='application/json')['ETag'], etag)
+
+        # Host is part of the key, pagination links are absolute
+        self.assertNotEqual(self.client.get(url, content_type='application/json', HTTP_HOST='other.host')['ETag'],
+                            etag)
+
+        daemon.block_number += 1
+        daemon.save()
+        markets_response = self.client.get(url, content_type='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(markets_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(markets_response.json().get('results')), 2)
+        self.assertNotEqual(markets_response['ETag'], etag)
+
+        # Data of the same block number changes after a rollback
+        etag = markets_response['ETag']
+        MarketFactory()
+        count_rollback()
+        markets_response = self.client.get(url, content_type='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(markets_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(markets_response.json().get('results')), 3)
+        self.assertNotEqual(markets_response['ETag'], etag)
+
+    def test_trades_by_account_cursor_pagination(self):
+        account = '{:040d}'.format(15)
+        buy_orders = [BuyOrderFactory(sender=account, creation_block=block_number, cost=block_number)
+                      for block_number in (3, 1, 2)]
+
+        url = reverse('api:trades-by-account', kwargs={'account_address': account}) + '?cursor=&limit=2'
+        trades_response = self.client.get(url, content_type='application/json')
+        self.assertEqual(trades_response.status_code, status.HTTP_200_OK)
+        trades_data = trades_response.json()
+        self.assertNotIn('count', trades_data)
+        self.assertIsNone(trades_data.get('previous'))
+        self.assertEqual([trade['cost'] for trade in trades_data.get('results')], ['1', '2'])
+
+        trades_data = self.client.get(trades_data.get('next'), content_type='application/json').json()
+        self.assertEqual([trade['cost'] for trade in trades_data.get('results')], ['3'])
+        self.assertIsNone(trades_data.get('next'))
+        self.assertIsNotNone(trades_data.get('previous'))
+
+        trades_data = self.client.get(trades_data.get('previous'), content_type='application/json').json()
+        self.assertEqual([trade['cost'] for trade in trades_data.get('results')], ['1', '2'])
+        self.assertIsNone(trades_data.get('previous'))
+
+        # Trades of the same block are paginated by id, without skipping or repeating any of them
+        tied_orders = [BuyOrderFactory(sender=account, creation_block=2, cost=cost) for cost in (4, 5)]
+        url = reverse('api:trades-by-account', kwargs={'account_address': account}) + '?cursor=&limit=2'
+        costs = []
+        while url:
+            trades_data = self.client.get(url, content_type='application/json').json()
+            costs.extend(trade['cost'] for trade in trades_data.get('results'))
+            url = trades_data.get('next')
+        self.assertEqual(costs, ['1', '2', '4', '5', '3'])
+
+        # Limit/offset pagination is still the default
+        buy_orders += tied_orders
+        url = reverse('api:trades-by-account', kwargs={'account_address': account})
+        self.assertEqual(self.client.get(url, content_type='application/json').json().get('count'), len(buy_orders))
+
+    def test_search(self):
+        ethereum_market = MarketFactory(event__oracle__event_description__title='Will Ethereum reach 1000 USD?',
+                                        event__oracle__event_description__description='Price at the end of the year')
+        bitcoin_market = MarketFactory(event__oracle__event_description__title='Bitcoin price',
+                                       event__oracle__event_description__description='Will Ethereum overtake it?')
+        MarketFactory(event__oracle__event_description__title='Election results')
+
+        search_response = self.client.get(reverse('api:search') + '?q=ethereum', content_type='application/json')
+        self.assertEqual(search_response.status_code, status.HTTP_200_OK)
+        search_data = search_response.json()
+        # Matches in the title are ranked first
+        self.assertEqual([market['contract']['address'] for market in search_data['markets']],
+                         [add_0x_prefix(ethereum_market.address), add_0x_prefix(bitcoin_market.address)])
+        self.assertEqual(len(search_data['events']), 2)
+        self.assertEqual(len(search_data['centralized_oracles']), 2)
+
+        # Titles containing partial words match too
+        search_data = self.client.get(reverse('api:search') + '?q=Elect', content_type='application/json').json()
+        self.assertEqual(len(search_data['markets']), 1)
+
+        self.assertEqual(self.client.get(reverse('api:search'), content_type='application/json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        # List endpoints can be filtered by the search too
+        markets_data = self.client.get(reverse('api:markets') + '?search=ethereum',
+                                       content_type='application/json').json()
+        self.assertEqual(len(markets_data.get('results')), 2)
+        oracles_data = self.client.get(reverse('api:centralized-oracles') + '?search=bitcoin',
+                                       content_type='application/json').json()
+        self.assertEqual(len(oracles_data.get('results')), 1)
+
+    def test_price_candles(self):
+        market = MarketFactory()
+        start_date_time = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        for hour in range(3):
+            for outcome_index in range(2):
+                for resolution in (60, 3600):
+                    PriceCandle.objects.create(market=market, outcome_index=outcome_index, resolution=resolution,
+                                               start_date_time=start_date_time + timedelta(hours=hour), open='0.5',
+                                               high='0.6', low='0.4', close='0.5', volume=10, trades=1)
+
+        url = reverse('api:candles-by-market', kwargs={'market_address': market.address})
+        candles_response = self.client.get(url, content_type='application/json')
+        self.assertEqual(candles_response.status_code, status.HTTP_200_OK)
+        candles = candles_response.json().get('results')
+        self.assertEqual(len(candles), 6)
+        self.assertEqual(candles[0]['resolution'], '1h')
+        self.assertEqual(candles[0]['close'], '0.5000')
+        self.assertEqual([candle['outcome_index'] for candle in candles[:2]], [0, 1])
+
+        after = (start_date_time + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+        candles = self.client.get(url + '?resolution=1m&outcome_index=1&start_date_time_after=' + after,
+                                  content_type='application/json').json().get('results')
+        self.assertEqual(len(candles), 2)
+        self.assertTrue(all(candle['resolution'] == '1m' and candle['outcome_index'] == 1 for candle in candles))
+
+        url = reverse('api:candles-by-market', kwargs={'market_address': '{:040d}'.format(99)})
+        self.assertEqual(self.client.get(url, content_type='application/json').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_trades_export(self):
+        market = MarketFactory()
+        outcome_token = OutcomeTokenFactory(event=market.event, index=0)
+        buy_orders = [BuyOrderFactory(market=market, outcome_token=outcome_token, creation_block=block_number,
+                                      cost=block_number) for block_number in (2, 1)]
+
+        url = reverse('api:trades-by-market-export', kwargs={'market_address': market.address})
+        export_response = self.client.get(url)
+        self.assertEqual(export_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(export_response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(export_response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['cost'] for row in rows], ['1', '2'])
+        self.assertEqual(rows[0]['order_type'], 'BUY')
+        self.assertEqual(rows[0]['market'], add_0x_prefix(market.address))
+
+        export_response = self.client.get(url + '?format=csv')
+        self.assertEqual(export_response['Content-Type'], 'text/csv')
+        lines = b''.join(export_response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(buy_orders) + 1)
+        self.assertTrue(lines[0].startswith('date,block,transaction_hash'))
+
+        self.assertEqual(self.client.get(url + '?format=xml').status_code, status.HTTP_400_BAD_REQUEST)
+
+        url = reverse('api:trades-by-account-export', kwargs={'account_address': buy_orders[0].sender})
+        rows = b''.join(self.client.get(url).streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 1)
+
+        url = reverse('api:trades-by-market-export', kwargs={'market_address': '{:040d}'.format(99)})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
     def test_shares_by_account(self):
         account1 = '{:040d}'.format(13)
         account2 = '{:040d}'.format(14)
@@ -432,3 +668,59 @@ class TestViews(APITestCase):
         scoreboard_response = self.client.get(reverse('api:scoreboard'), content_type='application/json')
         self.assertEqual(scoreboard_response.status_code, status.HTTP_200_OK)
         self.assertEqual(current_users + 2, len(scoreboard_response.json()['results']))
+
+    @override_settings(REST_API_CACHE_TIMEOUT=0)
+    def test_camel_case_renderer(self):
+        market = MarketFactory()
+        BuyOrderFactory(market=market)
+        OutcomeTokenBalanceFactory(outcome_token__event=market.event)
+        package_renderer = PackageCamelCaseJSONRenderer()
+        for url in (reverse('api:markets'), reverse('api:trades-by-market', kwargs={'market_address': market.address}),
+                    reverse('api:all-shares', kwargs={'market_address': market.address})):
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, package_renderer.render(response.data))
+
+        data = {
+            'total_supply': Decimal('1.5'),
+            'creation_date_time': timezone.now(),
+            'nested_list': ({'outcome_token_count': [Decimal(1), None, True]}, 'not_a_key'),
+            'lazy_text': gettext_lazy('lazy_text'),
+            gettext_lazy('lazy_key'): {1: 'one', 'a_1_b': 2.5},
+        }
+        renderer = CamelCaseJSONRenderer()
+        self.assertEqual(renderer.render(data), package_renderer.render(data))
+        self.assertEqual(renderer.render(data, 'application/json; indent=4'),
+                         package_renderer.render(data, 'application/json; indent=4'))
+
+    def test_message_pack_renderer(self):
+        def unpack(content):
+            def ext_hook(code, data):
+                self.assertEqual(code, BIG_INTEGER_EXT_TYPE)
+                return int.from_bytes(data, 'big', signed=True)
+            return msgpack.unpackb(content, raw=False, ext_hook=ext_hook)
+
+        market = MarketFactory(funding=10 ** 30, trading_volume=-10 ** 25)
+        BuyOrderFactory(market=market)
+        BuyOrderFactory(market=market)
+        for url in (reverse('api:markets'), reverse('api:trades-by-market', kwargs={'market_address': market.address})):
+            json_results = self.client.get(url, content_type='application/json').json()['results']
+            response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            results = unpack(response.content)['results']
+            self.assertEqual(len(results), len(json_results))
+            self.assertEqual(results[0].keys(), json_results[0].keys())
+
+        markets = unpack(self.client.get(reverse('api:markets'), HTTP_ACCEPT='application/msgpack').content)['results']
+        # Amounts are integers, the ones not fitting in 64 bits are extensions
+        self.assertEqual(markets[0]['funding'], 10 ** 30)
+        self.assertEqual(markets[0]['tradingVolume'], -10 ** 25)
+        self.assertEqual(markets[0]['netOutcomeTokensSold'], [0, 0])
+        self.assertEqual(markets[0]['marginalPrices'], ['0.5000', '0.5000'])
+
+        url = reverse('api:trades-by-market', kwargs={'market_address': market.address})
+        trades = self.client.get(url, content_type='application/json').json()['results']
+        columns = unpack(self.client.get(url, HTTP_ACCEPT='application/msgpack; layout=columns').content)['results']
+        self.assertEqual(columns['transactionHash'], [trade['transactionHash'] for trade in trades])
+        self.assertEqual(columns['outcomeTokenCount'], [int(trade['outcomeTokenCount']) for trade in trades])
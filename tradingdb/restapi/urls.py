@@ -15,11 +15,16 @@ urlpatterns = [
     url(r'^markets/$', views.MarketListView.as_view(), name='markets'),
     url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/$', views.MarketFetchView.as_view(), name='markets-by-name'),
     url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/shares/$', views.AllMarketSharesView.as_view(), name='all-shares'),
+    url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/shares/export/$', views.AllMarketSharesExportView.as_view(), name='all-shares-export'),
     url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/shares/(0x)?(?P<owner_address>[a-fA-F0-9]+)/$', views.MarketSharesView.as_view(), name='shares-by-owner'),
+    url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/candles/$', views.MarketPriceCandlesView.as_view(), name='candles-by-market'),
     url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/trades/$', views.MarketTradesView.as_view(), name='trades-by-market'),
+    url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/trades/export/$', views.TradesExportView.as_view(), name='trades-by-market-export'),
     url(r'^markets/(0x)?(?P<market_address>[a-fA-F0-9]+)/trades/(0x)?(?P<owner_address>[a-fA-F0-9]+)/$', views.MarketParticipantTradesView.as_view(), name='trades-by-owner'),
     url(r'^account/(0x)?(?P<account_address>[a-fA-F0-9]+)/trades/$', views.AccountTradesView.as_view(), name='trades-by-account'),
+    url(r'^account/(0x)?(?P<account_address>[a-fA-F0-9]+)/trades/export/$', views.TradesExportView.as_view(), name='trades-by-account-export'),
     url(r'^account/(0x)?(?P<account_address>[a-fA-F0-9]+)/shares/$', views.AccountSharesView.as_view(), name='shares-by-account'),
+    url(r'^search/$', views.SearchView.as_view(), name='search'),
     url(r'^factories/$', views.factories_view, name='factories'),
     url(r'^scoreboard/$', views.ScoreboardView.as_view(), name='scoreboard'),
     url(r'^scoreboard/(0x)?(?P<account_address>[a-fA-F0-9]+)$', views.ScoreboardUserView.as_view(), name='scoreboard'),
@@ -0,0 +1,361 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from gnosis.utils import add_0x_prefix, remove_null_values
+from tradingdb.relationaldb.models import Market
+
+from .fieldsets import get_sparse_fieldsets, is_field_included
+from .serializers import (MarketSerializer, MarketTradesSerializer,
+                          OutcomeTokenBalanceSerializer)
+
+# Fields used to convert the values like the serializers do, so the output is the same
+DATE_TIME_FIELD = serializers.DateTimeField()
+AMOUNT_FIELD = serializers.DecimalField(max_digits=80, decimal_places=0)
+PRICE_FIELD = serializers.DecimalField(max_digits=5, decimal_places=4)
+
+# A values field is a tuple (lookups, getter): the `values()` lookups it needs relative to a prefix, and a
+# function building its value from the row
+ValuesField = Tuple[Tuple[str, ...], Callable[..., object]]
+
+
+def list_of(convert: Callable) -> Callable[[List], List]:
+    """
+    :return: function converting the items of a list that are not null with `convert`
+    """
+    return lambda values: [convert(value) if value is not None else None for value in values]
+
+
+get_prices = list_of(PRICE_FIELD.to_representation)
+
+
+def column(lookup: str, convert: Callable = None) -> ValuesField:
+    """
+    :return: values field with the value of one column, converted with `convert` if not null
+    """
+    if convert is None:
+        return (lookup,), lambda row, prefix='': row[prefix + lookup]
+
+    def get(row, prefix=''):
+        value = row[prefix + lookup]
+        return convert(value) if value is not None else None
+
+    return (lookup,), get
+
+
+def constant(value) -> ValuesField:
+    return (), lambda row, prefix='': value
+
+
+def nested(prefix: str, fields: Dict[str, ValuesField], null_lookup: str = None) -> ValuesField:
+    """
+    :param fields: fields of the nested object, relative to `prefix`
+    :param null_lookup: lookup telling if the nested object exists, `None` is returned if it's null
+    :return: values field with the nested object, without null values
+    """
+    lookups = tuple(prefix + lookup for field_lookups, _ in fields.values() for lookup in field_lookups)
+    if null_lookup:
+        lookups += (prefix + null_lookup,)
+    getters = [(name, getter) for name, (_, getter) in fields.items()]
+
+    def get(row, parent_prefix=''):
+        row_prefix = parent_prefix + prefix
+        if null_lookup and row[row_prefix + null_lookup] is None:
+            return None
+        result = OrderedDict()
+        for name, getter in getters:
+            value = getter(row, row_prefix)
+            if value is not None:
+                result[name] = value
+        return result
+
+    return lookups, get
+
+
+def contract_fields() -> Dict[str, ValuesField]:
+    """Fields of `ContractSerializer` for contracts created by a factory"""
+    return OrderedDict((
+        ('address', column('address', add_0x_prefix)),
+        ('creation_date', column('creation_date_time')),
+        ('creation_block', column('creation_block')),
+        ('factory_address', column('factory', add_0x_prefix)),
+        ('creator', column('creator', add_0x_prefix)),
+    ))
+
+
+def event_description_field(prefix: str) -> ValuesField:
+    """Field of `EventDescriptionSerializer`, with the fields of the subclass picked by `description_type`"""
+    lookups = tuple(prefix + lookup for lookup in (
+        'id', 'title', 'description', 'resolution_date', 'ipfs_hash', 'description_type',
+        'scalareventdescription__unit', 'scalareventdescription__decimals', 'categoricaleventdescription__outcomes'
+    ))
+
+    def get(row, parent_prefix=''):
+        row_prefix = parent_prefix + prefix
+        if row[row_prefix + 'id'] is None:
+            return None
+        result = {
+            'title': row[row_prefix + 'title'],
+            'description': row[row_prefix + 'description'],
+            'resolution_date': row[row_prefix + 'resolution_date'],
+            'ipfs_hash': row[row_prefix + 'ipfs_hash'],
+        }
+        description_type = row[row_prefix + 'description_type']
+        if description_type == 'SCALAR':
+            result['unit'] = row[row_prefix + 'scalareventdescription__unit']
+            result['decimals'] = row[row_prefix + 'scalareventdescription__decimals']
+        elif description_type == 'CATEGORICAL':
+            result['outcomes'] = row[row_prefix + 'categoricaleventdescription__outcomes']
+        return remove_null_values(result)
+
+    return lookups, get
+
+
+def oracle_event_description_field() -> ValuesField:
+    """
+    Field with the event description of the centralized oracle of the outcome token event, `{}` if the oracle
+    is not centralized
+    """
+    lookups, get_event_description = event_description_field(
+        'outcome_token__event__oracle__centralizedoracle__event_description__')
+    return lookups, lambda row, prefix='': get_event_description(row, prefix) or {}
+
+
+def centralized_oracle_field(prefix: str) -> ValuesField:
+    """Field of `CentralizedOracleSerializer`, with all its fields"""
+    return nested(prefix, OrderedDict((
+        ('contract', nested('', contract_fields())),
+        ('is_outcome_set', column('is_outcome_set')),
+        ('outcome', column('outcome', int)),
+        ('owner', column('owner', add_0x_prefix)),
+        ('event_description', event_description_field('event_description__')),
+        ('type', constant('CENTRALIZED')),
+    )), null_lookup='address')
+
+
+def event_field(prefix: str, amount: Callable) -> ValuesField:
+    """Field of `EventSerializer`, scalar events get their bounds"""
+    categorical_fields = OrderedDict((
+        ('contract', nested('', contract_fields())),
+        ('collateral_token', column('collateral_token')),
+        ('oracle', centralized_oracle_field('oracle__centralizedoracle__')),
+        ('is_winning_outcome_set', column('is_winning_outcome_set')),
+        ('outcome', column('outcome', amount)),
+    ))
+    scalar_fields = OrderedDict(categorical_fields)
+    scalar_fields['lower_bound'] = column('scalarevent__lower_bound', amount)
+    scalar_fields['upper_bound'] = column('scalarevent__upper_bound', amount)
+    categorical_fields['type'] = constant('CATEGORICAL')
+    scalar_fields['type'] = constant('SCALAR')
+
+    # Scalar fields include every categorical one
+    _, get_categorical = nested(prefix, categorical_fields)
+    scalar_lookups, get_scalar = nested(prefix, scalar_fields)
+
+    def get(row, parent_prefix=''):
+        if row[parent_prefix + prefix + 'event_type'] == 'CATEGORICAL':
+            return get_categorical(row, parent_prefix)
+        return get_scalar(row, parent_prefix)
+
+    return (prefix + 'event_type',) + scalar_lookups, get
+
+
+def outcome_token_field(prefix: str, amount: Callable) -> ValuesField:
+    """Field of `OutcomeTokenSerializer`"""
+    return nested(prefix, OrderedDict((
+        ('event', column('event')),
+        ('index', column('index')),
+        ('totalSupply', column('total_supply', amount)),
+        ('address', column('address')),
+    )), null_lookup='address')
+
+
+def order_amount_field(lookup: str, order_types: Sequence[str]) -> ValuesField:
+    """Field with the cost or profit of the order as string, 'None' if it doesn't apply to the order type"""
+    return (lookup, 'order_type'), lambda row, prefix='': str(row[lookup] if row['order_type'] in order_types
+                                                              else None)
+
+
+def first_market_marginal_price(row, prefix=''):
+    """Marginal price of the outcome in the first market of the event, set in the row as `market_marginal_prices`"""
+    market_marginal_prices = row['market_marginal_prices']
+    if market_marginal_prices is None:
+        return None
+    return market_marginal_prices[row['outcome_token__index']]
+
+
+def market_trades_fields(amount: Callable) -> Dict[str, ValuesField]:
+    """Fields of `MarketTradesSerializer`, amounts are converted with `amount`"""
+    return OrderedDict((
+        ('date', column('creation_date_time', DATE_TIME_FIELD.to_representation)),
+        ('net_outcome_tokens_sold', column('net_outcome_tokens_sold', list_of(amount))),
+        ('marginal_prices', column('marginal_prices', get_prices)),
+        ('outcome_token', outcome_token_field('outcome_token__', amount)),
+        ('outcome_token_count', column('outcome_token_count', amount)),
+        ('order_type', column('order_type', lambda order_type: order_type or 'UNKNOWN')),
+        ('cost', order_amount_field('cost', ('BUY', 'SHORT SELL'))),
+        ('profit', order_amount_field('profit', ('SELL',))),
+        ('event_description', oracle_event_description_field()),
+        ('owner', column('sender', add_0x_prefix)),
+        ('collateral_token', column('outcome_token__event__collateral_token')),
+        ('transaction_hash', column('transaction_hash')),
+    ))
+
+
+def outcome_token_balance_fields(amount: Callable) -> Dict[str, ValuesField]:
+    """Fields of `OutcomeTokenBalanceSerializer`, amounts are converted with `amount`"""
+    return OrderedDict((
+        ('outcome_token', outcome_token_field('outcome_token__', amount)),
+        ('owner', column('owner')),
+        ('balance', column('balance', amount)),
+        ('event_description', oracle_event_description_field()),
+        ('marginal_price', (('outcome_token__event', 'outcome_token__index'), first_market_marginal_price)),
+        ('collateral_token', column('outcome_token__event__collateral_token')),
+    ))
+
+
+def market_fields(amount: Callable) -> Dict[str, ValuesField]:
+    """Fields of `MarketSerializer`, amounts are converted with `amount`"""
+    return OrderedDict((
+        ('contract', nested('', contract_fields())),
+        ('event', event_field('event__', amount)),
+        ('market_maker', column('market_maker')),
+        ('fee', column('fee', int)),
+        ('funding', column('funding', amount)),
+        ('net_outcome_tokens_sold', column('net_outcome_tokens_sold', list_of(amount))),
+        ('stage', column('stage', int)),
+        ('trading_volume', column('trading_volume', amount)),
+        ('withdrawn_fees', column('withdrawn_fees', amount)),
+        ('collected_fees', column('collected_fees', amount)),
+        ('marginal_prices', column('marginal_prices', get_prices)),
+    ))
+
+
+class ValuesSerializer:
+    """
+    Serializes `values()` rows with the same output as `serializer_class`, without building the model instances
+    nor the serializer fields of every row. `fields` maps every field of `serializer_class` to a values field,
+    the function converting the rows is built once for every set of requested fields.
+    With `integer_amounts` the amounts (decimals without decimal places) are integers instead of strings, for
+    renderers able to encode big integers (`integer_amounts` renderer attribute)
+    """
+    serializer_class = None
+    fields: Dict[str, ValuesField] = {}
+    integer_amount_fields: Dict[str, ValuesField] = {}  # `fields` with the amounts as integers
+    remove_null_values = True  # `serializer_class` removes the null values
+    _compiled = {}
+
+    def __init__(self, field_names: Iterable[str], integer_amounts: bool = False):
+        self.field_names = tuple(field_names)
+        self.integer_amounts = integer_amounts
+        self.lookups, self.to_dict = self.compile(self.field_names, integer_amounts)
+
+    @classmethod
+    def compile(cls, field_names: Tuple[str, ...],
+                integer_amounts: bool = False) -> Tuple[Tuple[str, ...], Callable[[Dict], Dict]]:
+        """
+        :return: tuple with the lookups needed by the fields and the function converting a row
+        """
+        key = (cls, field_names, integer_amounts)
+        if key not in cls._compiled:
+            fields = cls.integer_amount_fields if integer_amounts else cls.fields
+            lookups = []
+            for name in field_names:
+                lookups.extend(lookup for lookup in fields[name][0] if lookup not in lookups)
+            getters = [(name, fields[name][1]) for name in field_names]
+            if cls.remove_null_values:
+                def to_dict(row):
+                    result = OrderedDict()
+                    for name, getter in getters:
+                        value = getter(row)
+                        if value is not None:
+                            result[name] = value
+                    return result
+            else:
+                def to_dict(row):
+                    return OrderedDict([(name, getter(row)) for name, getter in getters])
+            cls._compiled[key] = (tuple(lookups), to_dict)
+        return cls._compiled[key]
+
+    @classmethod
+    def from_request(cls, request) -> 'ValuesSerializer':
+        """
+        :return: serializer of the fields requested with the `fields` and `expand` query params, with integer
+        amounts if the accepted renderer supports them
+        """
+        fields, expand = get_sparse_fieldsets(request)
+        return cls([name for name in cls.fields
+                    if is_field_included(name, name in cls.serializer_class.expandable_fields, fields, expand)],
+                   integer_amounts=getattr(getattr(request, 'accepted_renderer', None), 'integer_amounts', False))
+
+    def get_values(self, queryset, *lookups: str):
+        """
+        :param lookups: additional lookups, e.g. the ones needed by the pagination
+        :return: `values()` queryset with the lookups of the fields
+        """
+        return queryset.prefetch_related(None).values(*self.lookups,
+                                                      *(lookup for lookup in lookups if lookup not in self.lookups))
+
+    def to_representation(self, rows: Iterable[Dict]) -> List[Dict]:
+        return [self.to_dict(row) for row in rows]
+
+
+class MarketTradesValuesSerializer(ValuesSerializer):
+    serializer_class = MarketTradesSerializer
+    fields = market_trades_fields(AMOUNT_FIELD.to_representation)
+    integer_amount_fields = market_trades_fields(int)
+
+
+class OutcomeTokenBalanceValuesSerializer(ValuesSerializer):
+    """
+    The marginal price is taken from the first market of the event, loaded for the whole page with one query
+    """
+    serializer_class = OutcomeTokenBalanceSerializer
+    fields = outcome_token_balance_fields(AMOUNT_FIELD.to_representation)
+    integer_amount_fields = outcome_token_balance_fields(int)
+    remove_null_values = False
+
+    def to_representation(self, rows: Iterable[Dict]) -> List[Dict]:
+        if 'marginal_price' not in self.field_names:
+            return super().to_representation(rows)
+        rows = list(rows)
+        marginal_prices = {}
+        for event, market_marginal_prices in Market.objects.filter(
+                event__in={row['outcome_token__event'] for row in rows}).values_list('event', 'marginal_prices'):
+            marginal_prices.setdefault(event, market_marginal_prices)
+        for row in rows:
+            row['market_marginal_prices'] = marginal_prices.get(row['outcome_token__event'])
+        return super().to_representation(rows)
+
+
+class MarketValuesSerializer(ValuesSerializer):
+    serializer_class = MarketSerializer
+    fields = market_fields(AMOUNT_FIELD.to_representation)
+    integer_amount_fields = market_fields(int)
+
+
+class ValuesSerializerViewMixin:
+    """
+    List views rendering the page from `values()` rows with `values_serializer_class` instead of serializing
+    model instances, the response is the same
+    """
+    values_serializer_class = None
+
+    def get_values_serializer(self) -> ValuesSerializer:
+        return self.values_serializer_class.from_request(self.request)
+
+    def get_values_queryset(self, queryset):
+        """
+        :return: `values()` queryset with the lookups of the requested fields and the keyset pagination ordering
+        """
+        return self.values_serializer.get_values(queryset, *getattr(self.pagination_class, 'keyset_ordering', ()))
+
+    def list(self, request, *args, **kwargs):
+        self.values_serializer = self.get_values_serializer()
+        queryset = self.get_values_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.values_serializer.to_representation(page))
+        return Response(self.values_serializer.to_representation(queryset))
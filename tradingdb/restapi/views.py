@@ -2,25 +2,57 @@ import os
 
 import ethereum.utils
 from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_list_or_404, get_object_or_404
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from tradingdb.relationaldb.models import (CentralizedOracle, Event, Market,
-                                           Order, OutcomeTokenBalance,
+from gnosis.utils import add_0x_prefix
+from tradingdb.relationaldb.models import (CentralizedOracle, Event,
+                                           EventDescription, Market,
+                                           MarketSummary, Order,
+                                           OutcomeTokenBalance, PriceCandle,
                                            TournamentParticipant,
                                            TournamentWhitelistedCreator)
 from tradingdb.version import __git_info__, __version__
 
-from .filters import (CentralizedOracleFilter, DefaultPagination, EventFilter,
-                      MarketFilter, MarketSharesFilter, MarketTradesFilter)
+from .cache import BlockCacheMixin
+from .delta_sync import DeltaSyncMixin
+from .fieldsets import SparseFieldsetsViewMixin
+from .export import ExportView
+from .filters import (BlockKeysetPagination, CentralizedOracleFilter,
+                      DefaultPagination, EventFilter, MarketFilter,
+                      MarketSharesFilter, MarketSummaryKeysetPagination,
+                      MarketTradesFilter, OptionalKeysetPagination,
+                      PriceCandleFilter, PriceCandleKeysetPagination,
+                      TradesExportFilter)
 from .serializers import (CentralizedOracleSerializer, EventSerializer,
                           MarketSerializer, MarketTradesSerializer,
                           OlympiaScoreboardSerializer,
-                          OutcomeTokenBalanceSerializer)
+                          OutcomeTokenBalanceSerializer, PriceCandleSerializer)
+from .values_serializers import (MarketTradesValuesSerializer,
+                                 MarketValuesSerializer,
+                                 OutcomeTokenBalanceValuesSerializer,
+                                 ValuesSerializerViewMixin)
+
+# Relations joined for the fields of the orders (trades) and the outcome token balances (shares)
+OUTCOME_TOKEN_SELECT_RELATED_FIELDS = {
+    'outcome_token': ('outcome_token',),
+    'collateral_token': ('outcome_token', 'outcome_token__event',),
+    'marginal_price': ('outcome_token', 'outcome_token__event',),
+    'event_description': (
+        'outcome_token',
+        'outcome_token__event',
+        'outcome_token__event__oracle',
+        'outcome_token__event__oracle__centralizedoracle',
+        'outcome_token__event__oracle__centralizedoracle__event_description',
+        'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
+        'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
+    ),
+}
 
 
 class AboutView(APIView):
@@ -62,21 +94,24 @@ class AboutView(APIView):
         return Response(content)
 
 
-class CentralizedOracleListView(generics.ListAPIView):
+class CentralizedOracleListView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, generics.ListAPIView):
     serializer_class = CentralizedOracleSerializer
     filterset_class = CentralizedOracleFilter
     pagination_class = DefaultPagination
-
-    def get_queryset(self):
-        queryset = CentralizedOracle.objects.all().select_related(
+    tombstone_model = CentralizedOracle
+    select_related_fields = {
+        'event_description': (
             'event_description',
             'event_description__scalareventdescription',
-            'event_description__categoricaleventdescription'
-        )
-        return queryset
+            'event_description__categoricaleventdescription',
+        ),
+    }
+
+    def get_queryset(self):
+        return self.select_requested_related(CentralizedOracle.objects.all())
 
 
-class CentralizedOracleFetchView(generics.RetrieveAPIView):
+class CentralizedOracleFetchView(BlockCacheMixin, generics.RetrieveAPIView):
     queryset = CentralizedOracle.objects.all()
     serializer_class = CentralizedOracleSerializer
 
@@ -84,7 +119,7 @@ class CentralizedOracleFetchView(generics.RetrieveAPIView):
         return get_object_or_404(CentralizedOracle, address=self.kwargs['oracle_address'])
 
 
-class EventListView(generics.ListAPIView):
+class EventListView(BlockCacheMixin, generics.ListAPIView):
     serializer_class = EventSerializer
     filterset_class = EventFilter
     pagination_class = DefaultPagination
@@ -112,7 +147,7 @@ class EventListView(generics.ListAPIView):
         return queryset
 
 
-class EventFetchView(generics.RetrieveAPIView):
+class EventFetchView(BlockCacheMixin, generics.RetrieveAPIView):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
 
@@ -120,15 +155,20 @@ class EventFetchView(generics.RetrieveAPIView):
         return get_object_or_404(Event, address=self.kwargs['event_address'])
 
 
-class MarketListView(generics.ListAPIView):
+class MarketListView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                     generics.ListAPIView):
+    """
+    Markets are filtered, sorted and paginated using only the market summaries table, then the markets of the
+    page are loaded with their event, oracle and event description in one `values()` query
+    """
     serializer_class = MarketSerializer
+    values_serializer_class = MarketValuesSerializer
     filterset_class = MarketFilter
-    pagination_class = DefaultPagination
-
-    def get_queryset(self):
-        # Eager loading of related models
-        queryset = Market.objects.all()
-        queryset = queryset.select_related(
+    pagination_class = MarketSummaryKeysetPagination
+    since_block_field = 'market__last_modified_block'
+    tombstone_model = Market
+    select_related_fields = {
+        'event': (
             'event',
             'event__oracle',
             'event__scalarevent',
@@ -147,11 +187,28 @@ class MarketListView(generics.ListAPIView):
             'event__oracle__centralizedoracle__event_description',
             'event__oracle__centralizedoracle__event_description__categoricaleventdescription',
             'event__oracle__centralizedoracle__event_description__scalareventdescription',
-        )
+        ),
+    }
+
+    def get_queryset(self):
+        return MarketSummary.objects.all()
+
+    def get_values_queryset(self, queryset):
+        # Summaries are paginated, `paginate_queryset` loads the markets of the page
         return queryset
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        markets = {market['address']: market for market in self.values_serializer.get_values(
+            Market.objects.filter(address__in=[summary.pk for summary in page]), 'address')}
+        return [markets[summary.pk] for summary in page]
 
-class MarketFetchView(generics.RetrieveAPIView):
+    def get_markets_queryset(self):
+        # Eager loading of the related models of the requested fields
+        return self.select_requested_related(Market.objects.all())
+
+
+class MarketFetchView(BlockCacheMixin, generics.RetrieveAPIView):
     queryset = Market.objects.all()
     serializer_class = MarketSerializer
 
@@ -159,6 +216,45 @@ class MarketFetchView(generics.RetrieveAPIView):
         return get_object_or_404(Market, address=self.kwargs['market_address'])
 
 
+class SearchView(BlockCacheMixin, APIView):
+    """
+    Returns the centralized oracles, events and markets whose event description matches the `q` query param,
+    best ranked first. Only the `limit` best event descriptions are used
+    """
+
+    def get(self, request, format=None):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'q': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', DefaultPagination.default_limit)),
+                        DefaultPagination.max_limit)
+        except ValueError:
+            limit = DefaultPagination.default_limit
+
+        event_description_ids = EventDescription.objects.search(text).values_list('pk', flat=True)[:limit]
+        positions = {event_description_id: position
+                     for position, event_description_id in enumerate(event_description_ids)}
+
+        centralized_oracles = sorted(
+            CentralizedOracleListView().get_queryset().filter(event_description__in=list(positions)),
+            key=lambda centralized_oracle: positions[centralized_oracle.event_description_id]
+        )
+        oracle_positions = {centralized_oracle.address: positions[centralized_oracle.event_description_id]
+                            for centralized_oracle in centralized_oracles}
+        events = sorted(EventListView().get_queryset().filter(oracle__in=list(oracle_positions)),
+                        key=lambda event: oracle_positions[event.oracle_id])
+        event_positions = {event.address: oracle_positions[event.oracle_id] for event in events}
+        markets = sorted(MarketListView().get_markets_queryset().filter(event__in=list(event_positions)),
+                         key=lambda market: event_positions[market.event_id])
+
+        return Response({
+            'centralized_oracles': CentralizedOracleSerializer(centralized_oracles, many=True).data,
+            'events': EventSerializer(events, many=True).data,
+            'markets': MarketSerializer(markets, many=True).data,
+        })
+
+
 @api_view(['GET'])
 def factories_view(request):
     factories = {}
@@ -179,150 +275,196 @@ def factories_view(request):
     return Response(factories)
 
 
-class MarketSharesView(generics.ListAPIView):
+class MarketSharesView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                       generics.ListAPIView):
     serializer_class = OutcomeTokenBalanceSerializer
+    values_serializer_class = OutcomeTokenBalanceValuesSerializer
     pagination_class = DefaultPagination
+    tombstone_model = OutcomeTokenBalance
+    select_related_fields = OUTCOME_TOKEN_SELECT_RELATED_FIELDS
+    prefetch_related_fields = {'marginal_price': ('outcome_token__event__markets',)}
 
     def get_queryset(self):
         market = get_object_or_404(Market, address=self.kwargs['market_address'])
         outcome_tokens = market.event.outcome_tokens.values_list('address', flat=True)
-        return OutcomeTokenBalance.objects.filter(
+        return self.select_requested_related(OutcomeTokenBalance.objects.filter(
             owner=self.kwargs['owner_address'],
             outcome_token__address__in=list(outcome_tokens)
-        ).select_related(
-            'outcome_token',
-            'outcome_token__event',
-            'outcome_token__event__oracle',
-            'outcome_token__event__oracle__centralizedoracle',
-            'outcome_token__event__oracle__centralizedoracle__event_description',
-            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
-        )
+        ))
 
 
-class AllMarketSharesView(generics.ListAPIView):
+class AllMarketSharesView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                          generics.ListAPIView):
     """
     Returns all outcome token balances (market shares) for all users in a market
     """
     serializer_class = OutcomeTokenBalanceSerializer
-    pagination_class = DefaultPagination
+    values_serializer_class = OutcomeTokenBalanceValuesSerializer
+    pagination_class = OptionalKeysetPagination
+    tombstone_model = OutcomeTokenBalance
+    select_related_fields = OUTCOME_TOKEN_SELECT_RELATED_FIELDS
+    prefetch_related_fields = {'marginal_price': ('outcome_token__event__markets',)}
 
     def get_queryset(self):
-        return OutcomeTokenBalance.objects.filter(
+        return self.select_requested_related(OutcomeTokenBalance.objects.filter(
             outcome_token__address__in=list(
                 Market.objects.get(
                     address=self.kwargs['market_address']
                 ).event.outcome_tokens.values_list('address', flat=True)
             )
-        ).select_related(
-            'outcome_token',
-            'outcome_token__event',
-            'outcome_token__event__oracle',
-            'outcome_token__event__oracle__centralizedoracle',
-            'outcome_token__event__oracle__centralizedoracle__event_description',
-            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
-        ).prefetch_related('outcome_token__event__markets')
-
-
-class MarketParticipantTradesView(generics.ListAPIView):
+        ))
+
+
+class MarketPriceCandlesView(BlockCacheMixin, generics.ListAPIView):
+    """
+    Returns the open, high, low and close marginal prices of the outcomes of the given market address
+    """
+    serializer_class = PriceCandleSerializer
+    pagination_class = PriceCandleKeysetPagination
+    filterset_class = PriceCandleFilter
+
+    def get_queryset(self):
+        get_object_or_404(Market, address=self.kwargs['market_address'])
+        return PriceCandle.objects.filter(
+            market=self.kwargs['market_address']
+        ).order_by('start_date_time', 'outcome_index')
+
+
+class MarketParticipantTradesView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                                  generics.ListAPIView):
     serializer_class = MarketTradesSerializer
+    values_serializer_class = MarketTradesValuesSerializer
     pagination_class = DefaultPagination
     filterset_class = MarketTradesFilter
+    tombstone_model = Order
+    select_related_fields = OUTCOME_TOKEN_SELECT_RELATED_FIELDS
 
     def get_queryset(self):
-        return Order.objects.filter(
+        return self.select_requested_related(Order.objects.filter(
             market=self.kwargs['market_address'],
             sender=self.kwargs['owner_address']
-        ).select_related(
-            'outcome_token',
-            'outcome_token__event',
-            'outcome_token__event__oracle',
-            'outcome_token__event__oracle__centralizedoracle',
-            'outcome_token__event__oracle__centralizedoracle__event_description',
-            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
-        ).prefetch_related('outcome_token__event__markets')
-
-
-class MarketTradesView(generics.ListAPIView):
+        ))
+
+
+class MarketTradesView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                       generics.ListAPIView):
     """
     Returns the orders (trades) for the given market address
     """
     serializer_class = MarketTradesSerializer
-    pagination_class = DefaultPagination
+    values_serializer_class = MarketTradesValuesSerializer
+    pagination_class = BlockKeysetPagination
     filterset_class = MarketTradesFilter
+    tombstone_model = Order
+    select_related_fields = OUTCOME_TOKEN_SELECT_RELATED_FIELDS
 
     def get_queryset(self):
         # Check if Market exists
         get_list_or_404(Market, address=self.kwargs['market_address'])
         # return trades
-        return Order.objects.filter(
+        return self.select_requested_related(Order.objects.filter(
             market=self.kwargs['market_address'],
-        ).order_by('creation_block'
-        ).select_related(
-            'outcome_token',
-            'outcome_token__event',
-            'outcome_token__event__oracle',
-            'outcome_token__event__oracle__centralizedoracle',
-            'outcome_token__event__oracle__centralizedoracle__event_description',
-            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
-        ).prefetch_related('outcome_token__event__markets')
-
-
-class AccountTradesView(generics.ListAPIView):
+        ).order_by('creation_block'))
+
+
+class AccountTradesView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                        generics.ListAPIView):
     """
     Returns the orders (trades) for the given account address
     """
     serializer_class = MarketTradesSerializer
-    pagination_class = DefaultPagination
+    values_serializer_class = MarketTradesValuesSerializer
+    pagination_class = BlockKeysetPagination
     filterset_class = MarketTradesFilter
+    tombstone_model = Order
+    select_related_fields = OUTCOME_TOKEN_SELECT_RELATED_FIELDS
 
     def get_queryset(self):
-        return Order.objects.filter(
+        return self.select_requested_related(Order.objects.filter(
             sender=self.kwargs['account_address']
-        ).select_related(
-            'outcome_token',
-            'outcome_token__event',
-            'outcome_token__event__oracle',
-            'outcome_token__event__oracle__centralizedoracle',
-            'outcome_token__event__oracle__centralizedoracle__event_description',
-            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
-        ).prefetch_related('outcome_token__event__markets')
-
-
-class AccountSharesView(generics.ListAPIView):
+        ))
+
+
+class AccountSharesView(BlockCacheMixin, DeltaSyncMixin, SparseFieldsetsViewMixin, ValuesSerializerViewMixin,
+                        generics.ListAPIView):
     """
     Returns the shares for the given account address
     """
     serializer_class = OutcomeTokenBalanceSerializer
+    values_serializer_class = OutcomeTokenBalanceValuesSerializer
     pagination_class = DefaultPagination
     filterset_class = MarketSharesFilter
+    tombstone_model = OutcomeTokenBalance
+    select_related_fields = OUTCOME_TOKEN_SELECT_RELATED_FIELDS
+    prefetch_related_fields = {'marginal_price': ('outcome_token__event__markets',)}
 
     def get_queryset(self):
-        return OutcomeTokenBalance.objects.filter(
+        return self.select_requested_related(OutcomeTokenBalance.objects.filter(
             owner=self.kwargs['account_address'],
-        ).select_related(
-            'outcome_token',
-            'outcome_token__event',
-            'outcome_token__event__oracle',
-            'outcome_token__event__oracle__centralizedoracle',
-            'outcome_token__event__oracle__centralizedoracle__event_description',
-            'outcome_token__event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'outcome_token__event__oracle__centralizedoracle__event_description__scalareventdescription',
-        ).prefetch_related('outcome_token__event__markets')
+        ))
+
+
+class TradesExportView(ExportView):
+    """
+    Streams every order (trade) of the market or the account address of the url as NDJSON or CSV, with their type,
+    cost, profit and fees
+    """
+    fields = ('creation_date_time', 'creation_block', 'transaction_hash', 'market', 'sender', 'outcome_token',
+              'outcome_token__index', 'outcome_token_count', 'net_outcome_tokens_sold', 'marginal_prices',
+              'order_type', 'cost', 'profit', 'fees')
+    columns = ('date', 'block', 'transaction_hash', 'market', 'owner', 'outcome_token', 'outcome_token_index',
+               'outcome_token_count', 'net_outcome_tokens_sold', 'marginal_prices', 'order_type', 'cost', 'profit',
+               'fees')
+    filterset_class = TradesExportFilter
+
+    def get_queryset(self):
+        market_address = self.kwargs.get('market_address')
+        if market_address:
+            if not Market.objects.filter(address=market_address).exists():
+                raise Http404('Market not found')
+            self.filename = 'trades-{}'.format(market_address)
+            orders = Order.objects.filter(market=market_address)
+        else:
+            self.filename = 'trades-{}'.format(self.kwargs['account_address'])
+            orders = Order.objects.filter(sender=self.kwargs['account_address'])
+        return orders.order_by('creation_block', 'id')
+
+    def get_row(self, values):
+        (date, block, transaction_hash, market, sender, outcome_token, *values) = values
+        return (date, block, transaction_hash, add_0x_prefix(market), add_0x_prefix(sender),
+                add_0x_prefix(outcome_token) if outcome_token else None, *values)
+
+
+class AllMarketSharesExportView(ExportView):
+    """
+    Streams every outcome token balance (market share) of the given market address as NDJSON or CSV, with the
+    current marginal price of the outcome
+    """
+    fields = ('owner', 'outcome_token', 'outcome_token__index', 'balance')
+    columns = ('owner', 'outcome_token', 'outcome_token_index', 'balance', 'marginal_price')
+
+    def get_queryset(self):
+        market = get_object_or_404(Market, address=self.kwargs['market_address'])
+        self.marginal_prices = market.marginal_prices
+        self.filename = 'shares-{}'.format(market.address)
+        return OutcomeTokenBalance.objects.filter(outcome_token__event=market.event_id).order_by('id')
+
+    def get_row(self, values):
+        owner, outcome_token, outcome_token_index, balance = values
+        marginal_price = (self.marginal_prices[outcome_token_index]
+                          if outcome_token_index < len(self.marginal_prices) else None)
+        return add_0x_prefix(owner), add_0x_prefix(outcome_token), outcome_token_index, balance, marginal_price
 
 
 # ========================================================
 #                 Olympia
 # ========================================================
 
-class ScoreboardView(generics.ListAPIView):
+class ScoreboardView(DeltaSyncMixin, generics.ListAPIView):
     """Olympia tournament scoreboard view"""
     serializer_class = OlympiaScoreboardSerializer
     pagination_class = DefaultPagination
+    tombstone_model = TournamentParticipant
     queryset = TournamentParticipant.objects.all().order_by('current_rank').exclude(
         address__in=TournamentWhitelistedCreator.objects.all().values_list('address', flat=True)
     ).select_related('tournament_balance')